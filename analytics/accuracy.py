@@ -0,0 +1,179 @@
+# analytics/accuracy.py
+# Decryption accuracy for CKKS outputs. Values are compared a chunk at a time with NumPy and
+# folded into running totals, so memory is bounded by one chunk however many values pass
+# through; per-chunk records and a fixed error histogram keep the result compact.
+#   validator = AccuracyValidator()
+#   validator.update(original_chunk, decrypted_chunk, key="chunk_00000.bin", offset=0)
+#   validator.mark_failed("chunk_00001.bin", "NoSuchKey", offset=4096)  # never verified -> not passed
+#   print_summary(validator.summary())
+import base64
+import heapq
+import math
+import threading
+from array import array
+
+import numpy as np
+
+TOLERANCE = 1e-3
+MAX_CHUNK_VALUES = 1 << 16  # longer inputs are compared in slices of this many values
+WORST_VALUES = 5  # largest individual errors kept for the report
+# Absolute error histogram: [0, 1e-12), [1e-12, 1e-11), ..., [1e-1, 1), [1, inf)
+HISTOGRAM_EDGES = [0.0] + [10.0 ** e for e in range(-12, 1)] + [math.inf]
+
+def precision_bits(max_abs_error):
+    # Correct fractional bits implied by the largest error (None when exact)
+    return round(-math.log2(max_abs_error), 1) if max_abs_error > 0 else None
+
+def encode_values(values):
+    # Compact float64 wire form for decrypted values (8 bytes each instead of ~20 as JSON);
+    # app.py packs the same way without importing this module
+    return base64.b64encode(array("d", values).tobytes()).decode("ascii")
+
+def decode_values(data):
+    return np.frombuffer(base64.b64decode(data), dtype=np.float64)
+
+def chunk_errors(original, decrypted, tolerance=TOLERANCE):
+    # Error statistics for one chunk; decrypted values beyond the original length are ignored
+    original = np.asarray(original, dtype=np.float64)
+    decrypted = np.asarray(decrypted, dtype=np.float64)[:len(original)]
+    if len(decrypted) < len(original):
+        raise ValueError(f"{len(decrypted)} decrypted value(s) for {len(original)} original(s)")
+    errors = np.abs(decrypted - original)
+    magnitudes = np.abs(original)
+    relative = np.divide(errors, magnitudes, out=np.zeros_like(errors), where=magnitudes > 0)
+    counts, _ = np.histogram(errors, bins=HISTOGRAM_EDGES)
+    return errors, {
+        "count": len(errors),
+        "max_abs_error": float(errors.max(initial=0.0)),
+        "max_rel_error": float(relative.max(initial=0.0)),
+        "sum_sq_error": float(np.dot(errors, errors)),
+        "mismatches": int(np.count_nonzero(errors >= tolerance)),
+        "histogram": counts
+    }
+
+class AccuracyValidator:
+    # Thread-safe; chunks may arrive in any order (encrypt workers, Lambda batches).
+    # With expected_chunks set, the run only passes once that many chunks were verified.
+    def __init__(self, tolerance=TOLERANCE, max_chunk_values=MAX_CHUNK_VALUES, worst=WORST_VALUES,
+                 expected_chunks=None):
+        self.tolerance = tolerance
+        self.max_chunk_values = max_chunk_values
+        self.worst = worst
+        self.expected_chunks = expected_chunks
+        self.chunks = []  # one compact record per update()
+        self.failed = []  # chunks that could not be verified: {key, offset, error}
+        self._count = 0
+        self._sum_sq = 0.0
+        self._max_abs = 0.0
+        self._max_rel = 0.0
+        self._mismatches = 0
+        self._histogram = np.zeros(len(HISTOGRAM_EDGES) - 1, dtype=np.int64)
+        self._worst = []  # min-heap of (error, index, original, decrypted)
+        self._lock = threading.Lock()
+
+    def update(self, original, decrypted, key=None, offset=0):
+        original = np.asarray(original, dtype=np.float64)
+        decrypted = np.asarray(decrypted, dtype=np.float64)
+        record = {"key": key, "offset": offset, "count": 0, "max_abs_error": 0.0,
+                  "max_rel_error": 0.0, "sum_sq_error": 0.0, "mismatches": 0}
+        histogram = np.zeros_like(self._histogram)
+        worst = []
+        for start in range(0, len(original), self.max_chunk_values):
+            stop = start + self.max_chunk_values
+            errors, stats = chunk_errors(original[start:stop], decrypted[start:stop], self.tolerance)
+            for name in ("count", "sum_sq_error", "mismatches"):
+                record[name] += stats[name]
+            for name in ("max_abs_error", "max_rel_error"):
+                record[name] = max(record[name], stats[name])
+            histogram += stats["histogram"]
+            if self.worst and len(errors):
+                top = np.argpartition(errors, -min(self.worst, len(errors)))[-self.worst:]
+                worst.extend((float(errors[i]), offset + start + int(i), float(original[start + i]),
+                              float(decrypted[start + i])) for i in top)
+
+        record["rmse"] = math.sqrt(record["sum_sq_error"] / record["count"]) if record["count"] else 0.0
+        record["precision_bits"] = precision_bits(record["max_abs_error"])
+        with self._lock:
+            self._count += record["count"]
+            self._sum_sq += record.pop("sum_sq_error")
+            self._max_abs = max(self._max_abs, record["max_abs_error"])
+            self._max_rel = max(self._max_rel, record["max_rel_error"])
+            self._mismatches += record["mismatches"]
+            self._histogram += histogram
+            for item in worst:
+                if len(self._worst) < self.worst:
+                    heapq.heappush(self._worst, item)
+                elif item > self._worst[0]:
+                    heapq.heapreplace(self._worst, item)
+            self.chunks.append(record)
+        return record
+
+    def mark_failed(self, key, error, offset=None):
+        # A chunk whose values never arrived (decrypt error, missing object)
+        with self._lock:
+            self.failed.append({"key": key, "offset": offset, "error": str(error)})
+
+    def summary(self, worst_chunks=5):
+        with self._lock:
+            chunk_bits = [c["precision_bits"] for c in self.chunks if c["precision_bits"] is not None]
+            unverified = len(self.failed)
+            if self.expected_chunks is not None:
+                unverified = max(unverified, self.expected_chunks - len(self.chunks))
+            return {
+                "values": self._count,
+                "chunks": len(self.chunks),
+                "expected_chunks": self.expected_chunks,
+                "unverified_chunks": unverified,
+                "failed_chunks": sorted(self.failed, key=lambda c: (c["offset"] is None, c["offset"] or 0)),
+                "tolerance": self.tolerance,
+                "passed": self._mismatches == 0 and unverified == 0,
+                "mismatches": self._mismatches,
+                "max_abs_error": self._max_abs,
+                "max_rel_error": self._max_rel,
+                "rmse": math.sqrt(self._sum_sq / self._count) if self._count else 0.0,
+                "precision_bits": precision_bits(self._max_abs),
+                "min_chunk_precision_bits": min(chunk_bits, default=None),
+                "histogram": {
+                    "edges": [e if math.isfinite(e) else None for e in HISTOGRAM_EDGES],
+                    "counts": self._histogram.tolist()
+                },
+                "worst_values": [
+                    {"index": index, "original": o, "decrypted": d, "error": error}
+                    for error, index, o, d in sorted(self._worst, reverse=True)
+                ],
+                "worst_chunks": sorted(self.chunks, key=lambda c: c["max_abs_error"], reverse=True)[:worst_chunks]
+            }
+
+def validate(original, decrypted, chunk_values=MAX_CHUNK_VALUES, tolerance=TOLERANCE):
+    # One-shot summary for two whole sequences
+    validator = AccuracyValidator(tolerance, chunk_values)
+    original = np.asarray(original, dtype=np.float64)
+    decrypted = np.asarray(decrypted, dtype=np.float64)
+    for start in range(0, len(original), chunk_values):
+        validator.update(original[start:start + chunk_values], decrypted[start:start + chunk_values], offset=start)
+    return validator.summary()
+
+def print_summary(summary):
+    print("\n[🔍] Verifying decrypted HE output against original data...")
+    unverified = summary.get("unverified_chunks", 0)
+    if unverified:
+        print(f"[❌] {unverified} chunk(s) not verified ({summary['chunks']} of {summary['expected_chunks'] or '?'} checked):")
+        for item in summary.get("failed_chunks", [])[:WORST_VALUES]:
+            print(f" - {item['key']}: {item['error']}")
+    if not summary["values"]:
+        print("[i] No decrypted values to verify")
+        return
+    print(f"[i] {summary['values']} value(s) in {summary['chunks']} chunk(s): max abs error {summary['max_abs_error']:.3e}, "
+          f"max rel error {summary['max_rel_error']:.3e}, RMSE {summary['rmse']:.3e}, "
+          f"{summary['precision_bits']} bits of precision (worst chunk {summary['min_chunk_precision_bits']})")
+    if summary["passed"]:
+        print(f"[✅] Decryption verified: all values within {summary['tolerance']} of the original data.")
+        return
+    if not summary["mismatches"]:
+        print(f"[❌] Decryption not verified: checked values are within {summary['tolerance']}, but chunks are missing.")
+        return
+    print(f"[❌] Decryption mismatch: {summary['mismatches']} value(s) off by {summary['tolerance']} or more; largest:")
+    for item in summary["worst_values"]:
+        if item["error"] < summary["tolerance"]:
+            break
+        print(f" - Index {item['index']}: Original={item['original']}, Decrypted={item['decrypted']}")
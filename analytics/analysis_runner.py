@@ -1,4 +1,146 @@
-from seal_backend.evaluator import square_encrypted_vector
+import math
 
 def analyze_encrypted_data(context, encrypted_list):
+    from seal_backend.evaluator import square_encrypted_vector
     return square_encrypted_vector(context, encrypted_list)
+
+# --- Encrypted aggregations over packed CKKS chunks ---
+# CKKSVector.sum() reduces a packed vector with log2(n) rotate-and-add steps (needs
+# Galois keys). Per-chunk partials are added homomorphically, so each aggregation
+# leaves the server as a single small ciphertext holding the result in slot 0.
+
+def _add_all(partials):
+    total = None
+    for partial in partials:
+        total = partial if total is None else total + partial
+    if total is None:
+        raise ValueError("No encrypted chunks to aggregate")
+    return total
+
+def encrypted_sum(vectors):
+    return _add_all(vec.sum() for vec in vectors)
+
+def encrypted_mean(vectors, count):
+    # Each chunk's sum is scaled by 1/count before the chunks are added, so no ciphertext
+    # holds more than one chunk's sum at scale^2; scaling slots before sum() would add one
+    # rescale's rounding noise per value instead of one per chunk
+    return _add_all(vec.sum() * (1.0 / count) for vec in vectors)
+
+def encrypted_variance(vectors, count):
+    # E[x^2] - E[x]^2 with multiplicative depth 2. Chunks are scaled by sqrt(1/count) before
+    # squaring, so the largest intermediate is E[x^2] (not count * E[x^2]); it must still fit
+    # the integer bits left at level 2 (see OPERATION_MAGNITUDE)
+    scale = math.sqrt(1.0 / count)
+    mean = encrypted_mean(vectors, count)
+    mean_of_squares = _add_all((vec * scale).square().sum() for vec in vectors)
+    return mean_of_squares - mean.square()
+
+def encrypted_weighted_sum(vectors, weight_chunks):
+    # weight_chunks[i] is a plaintext list the same length as chunk i
+    return _add_all(vec.dot(weights) for vec, weights in zip(vectors, weight_chunks))
+
+def encrypted_dot(vectors_a, vectors_b):
+    return _add_all(a.dot(b) for a, b in zip(vectors_a, vectors_b))
+
+AGGREGATIONS = ("sum", "mean", "variance", "weighted_sum", "dot")
+
+# Multiplicative depth (rescales) each aggregation consumes; all of them reduce with sum(),
+# so they also need rotations. Used by seal_backend/param_planner.py to size parameters.
+OPERATION_DEPTH = {"decrypt": 0, "sum": 0, "mean": 1, "variance": 2, "weighted_sum": 1, "dot": 1}
+ROTATING_OPERATIONS = frozenset(AGGREGATIONS)
+# Largest intermediate value each aggregation holds at its deepest level, given the largest
+# absolute input value and the value count (weights are assumed to be at most 1 in magnitude).
+# CKKS has no overflow signal: a value past the modulus decrypts to garbage, so
+# param_planner.check_magnitude() compares these against the parameters' budget.
+OPERATION_MAGNITUDE = {
+    "decrypt": lambda max_abs, count: max_abs,
+    "sum": lambda max_abs, count: count * max_abs,
+    "mean": lambda max_abs, count: count * max_abs,  # a chunk sum, held before the rescale
+    "variance": lambda max_abs, count: max_abs ** 2,
+    "weighted_sum": lambda max_abs, count: count * max_abs,
+    "dot": lambda max_abs, count: count * max_abs ** 2
+}
+
+# Relative size of each aggregation's absolute error, in units of one fresh encryption's
+# noise (param_planner.error_bits). Fresh noise grows over a sum; a rescale leaves error
+# proportional to the value it divides (each chunk's partial mean, x**2 / count); variance
+# also squares the mean, amplifying its error by about 2 * max_abs. Used by param_planner
+# to size the scale so results keep the requested fractional bits.
+OPERATION_ERROR = {
+    "decrypt": lambda max_abs, count: 1,
+    "sum": lambda max_abs, count: 2 * math.sqrt(count),  # independent noise adds like a random walk
+    "mean": lambda max_abs, count: 2 * max_abs,
+    "variance": lambda max_abs, count: 2 * max_abs ** 2,
+    "weighted_sum": lambda max_abs, count: count * max_abs,
+    "dot": lambda max_abs, count: count * max_abs ** 2
+}
+
+def rotation_steps(operations, slot_count):
+    # TenSEAL's sum() rotates left by every power of two below the vector size, so these
+    # are the only Galois keys the aggregations need (key_management/key_gen.py)
+    if not any(op in ROTATING_OPERATIONS for op in operations):
+        return []
+    return [1 << i for i in range((slot_count - 1).bit_length())]
+
+def run_aggregation(operation, vectors, count=None, weights=None, other_vectors=None):
+    if operation in ("mean", "variance") and not count:
+        raise ValueError(f"'{operation}' needs the total value count")
+    if operation == "sum":
+        return encrypted_sum(vectors)
+    if operation == "mean":
+        return encrypted_mean(vectors, count)
+    if operation == "variance":
+        return encrypted_variance(vectors, count)
+    if operation == "weighted_sum":
+        return encrypted_weighted_sum(vectors, weights)
+    if operation == "dot":
+        return encrypted_dot(vectors, other_vectors)
+    raise ValueError(f"Unsupported operation: {operation}")
+
+# --- Accuracy check against NumPy ---
+def check_aggregations(values, operations=("sum", "mean", "variance"), params=None, tolerance=1e-3):
+    # Encrypts `values` in slot-sized chunks, runs each aggregation and compares it with NumPy.
+    # Without `params` the parameters are planned for the data's magnitude at the highest
+    # precision they reach. Returns
+    # {operation: {"expected", "actual", "rel_error", "ok"}} (or {"error"} if it cannot fit).
+    import numpy as np
+    import tenseal as ts
+    from seal_backend import context_store, param_planner
+
+    values = np.asarray(values, dtype=np.float64)
+    max_abs = float(np.abs(values).max(initial=0.0))
+    if params is None:
+        params = param_planner.plan_for_operations(operations, max_value=max_abs, count=len(values),
+                                                   precision_bits=None)["params"]
+    context = context_store.build_context(params)
+    context_store.ensure_relin_keys(context)
+    context_store.ensure_galois_keys(context)
+    slot_count = params["poly_modulus_degree"] // 2
+    vectors = [ts.ckks_vector(context, values[i:i + slot_count].tolist()) for i in range(0, len(values), slot_count)]
+    expected = {"sum": values.sum(), "mean": values.mean(), "variance": values.var()}
+
+    results = {}
+    for operation in operations:
+        try:
+            param_planner.check_magnitude(params, operation, max_abs, len(values))
+        except ValueError as e:
+            results[operation] = {"error": str(e), "ok": False}
+            continue
+        actual = run_aggregation(operation, vectors, count=len(values)).decrypt()[0]
+        rel_error = abs(actual - expected[operation]) / max(abs(expected[operation]), 1.0)
+        results[operation] = {"expected": float(expected[operation]), "actual": actual,
+                              "rel_error": rel_error, "ok": rel_error < tolerance}
+    return results
+
+if __name__ == "__main__":
+    # python -m analytics.analysis_runner [max value] [length]
+    # Defaults are MIMIC-range inputs: integer codes up to 999 (DRG codes) over 20000 rows
+    import random
+    import sys
+    max_value = int(sys.argv[1]) if len(sys.argv) > 1 else 999
+    length = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    rng = random.Random(0)
+    results = check_aggregations([rng.randint(0, max_value) for _ in range(length)])
+    for operation, result in results.items():
+        print(f"{'[✓]' if result['ok'] else '[✗]'} {operation}: {result}")
+    sys.exit(0 if all(r["ok"] for r in results.values()) else 1)
@@ -1,34 +1,241 @@
 # analytics/comparator.py
+# Symmetric baseline for the HE comparison: chunked, streaming AES-256-GCM and RSA-wrapped
+# hybrid envelopes. Inputs are read and written a chunk at a time, so memory stays bounded
+# by chunk size x workers regardless of input size, and chunks are encrypted on a thread
+# pool (PyCryptodome releases the GIL inside its C primitives).
+#
+#   stream   b"AGS1" | u32 chunk size | 4-byte nonce prefix
+#   frame    u32 ciphertext length | u8 final flag | ciphertext | 16-byte tag
+#   hybrid   b"HYB1" | u16 wrapped key length | RSA-OAEP(data key) | stream
+#
+# Chunk i uses nonce prefix | u64 i, and its index and final flag are authenticated, so
+# reordered, dropped or truncated chunks fail to decrypt.
+import functools
+import io
+import json
+import os
+import struct
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 from Crypto.Cipher import AES, PKCS1_OAEP
 from Crypto.PublicKey import RSA
 from Crypto.Random import get_random_bytes
-import time
-import json
 
-def aes_encrypt_decrypt(data):
-    key = get_random_bytes(16)
-    cipher = AES.new(key, AES.MODE_EAX)
-    start = time.time()
-    ciphertext, tag = cipher.encrypt_and_digest(json.dumps(data).encode())
-    encrypt_time = time.time() - start
+KEY_BYTES = 32
+TAG_BYTES = 16
+CHUNK_BYTES = 1024 * 1024
+WORKERS = min(os.cpu_count() or 1, 8)
+RSA_KEY_BITS = 2048
+
+STREAM_MAGIC = b"AGS1"
+STREAM_HEADER = struct.Struct(">4sI4s")
+FRAME = struct.Struct(">IB")
+CHUNK_AAD = struct.Struct(">QB")
+HYBRID_MAGIC = b"HYB1"
+HYBRID_HEADER = struct.Struct(">4sH")
+
+class StreamError(ValueError):
+    pass
+
+def new_key():
+    return get_random_bytes(KEY_BYTES)
+
+@functools.lru_cache(maxsize=None)
+def rsa_keypair(bits=RSA_KEY_BITS):
+    # Generated once per process; key generation is not what the baseline measures
+    return RSA.generate(bits)
+
+# --- Chunk helpers ---
+def _read_chunks(reader, chunk_bytes):
+    # Yields (index, data, final) with one chunk of lookahead; empty input is one empty final chunk
+    index = 0
+    current = reader.read(chunk_bytes)
+    while True:
+        following = reader.read(chunk_bytes) if current else b""
+        final = not following
+        yield index, current, final
+        if final:
+            return
+        index += 1
+        current = following
+
+def _ordered_map(fn, items, workers):
+    # Like pool.map, but keeps at most 2 x workers items in flight so a large stream
+    # is never fully buffered
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def _chunk_cipher(key, header, index, final):
+    nonce = header[-4:] + struct.pack(">Q", index)
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce, mac_len=TAG_BYTES)
+    cipher.update(header + CHUNK_AAD.pack(index, final))
+    return cipher
+
+# --- Streaming AES-GCM ---
+def encrypt_stream(key, reader, writer, chunk_bytes=CHUNK_BYTES, workers=WORKERS):
+    # Returns {"chunks", "plaintext_bytes", "ciphertext_bytes"}
+    header = STREAM_HEADER.pack(STREAM_MAGIC, chunk_bytes, get_random_bytes(4))
+    writer.write(header)
+    totals = {"chunks": 0, "plaintext_bytes": 0, "ciphertext_bytes": len(header)}
+
+    def encrypt_chunk(item):
+        index, data, final = item
+        ciphertext, tag = _chunk_cipher(key, header, index, final).encrypt_and_digest(data)
+        return len(data), FRAME.pack(len(ciphertext), final) + ciphertext + tag
+
+    for plaintext_length, frame in _ordered_map(encrypt_chunk, _read_chunks(reader, chunk_bytes), workers):
+        writer.write(frame)
+        totals["chunks"] += 1
+        totals["plaintext_bytes"] += plaintext_length
+        totals["ciphertext_bytes"] += len(frame)
+    return totals
+
+def _read_frames(reader):
+    index = 0
+    while True:
+        frame_header = reader.read(FRAME.size)
+        if len(frame_header) < FRAME.size:
+            raise StreamError(f"Stream truncated before chunk {index}")
+        length, final = FRAME.unpack(frame_header)
+        body = reader.read(length + TAG_BYTES)
+        if len(body) < length + TAG_BYTES:
+            raise StreamError(f"Stream truncated inside chunk {index}")
+        yield index, body[:length], body[length:], final
+        if final:
+            if reader.read(1):
+                raise StreamError("Trailing data after the final chunk")
+            return
+        index += 1
+
+def decrypt_stream(key, reader, writer, workers=WORKERS):
+    header = reader.read(STREAM_HEADER.size)
+    if len(header) < STREAM_HEADER.size or header[:4] != STREAM_MAGIC:
+        raise StreamError("Not an AES-GCM stream")
 
-    start = time.time()
-    decipher = AES.new(key, AES.MODE_EAX, nonce=cipher.nonce)
-    plaintext = decipher.decrypt(ciphertext)
-    decrypt_time = time.time() - start
+    def decrypt_chunk(item):
+        index, ciphertext, tag, final = item
+        try:
+            return _chunk_cipher(key, header, index, final).decrypt_and_verify(ciphertext, tag)
+        except ValueError:
+            raise StreamError(f"Authentication failed in chunk {index}") from None
+
+    plaintext_bytes = 0
+    for data in _ordered_map(decrypt_chunk, _read_frames(reader), workers):
+        writer.write(data)
+        plaintext_bytes += len(data)
+    return plaintext_bytes
+
+class IterReader(io.RawIOBase):
+    # Readable file object over an iterable of byte strings, for encrypting a payload that
+    # is generated piece by piece (wrap in io.BufferedReader for efficient small reads)
+    def __init__(self, pieces):
+        self._pieces = iter(pieces)
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            self._pending = next(self._pieces, None)
+            if self._pending is None:
+                self._pending = b""
+                return 0
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+class _CompareWriter:
+    # Write sink that checks decrypted output against an expected reader, a chunk at a time
+    def __init__(self, expected):
+        self.expected = expected
+        self.matches = True
+
+    def write(self, data):
+        if self.matches and self.expected.read(len(data)) != data:
+            self.matches = False
+        return len(data)
+
+def verify_stream(key, reader, expected, workers=WORKERS):
+    # Decrypts a stream and compares it with the expected plaintext reader without holding
+    # either in memory; returns (matches, plaintext_bytes)
+    sink = _CompareWriter(expected)
+    plaintext_bytes = decrypt_stream(key, reader, sink, workers)
+    return sink.matches and not expected.read(1), plaintext_bytes
+
+def encrypt_bytes(key, data, chunk_bytes=CHUNK_BYTES, workers=WORKERS):
+    out = io.BytesIO()
+    encrypt_stream(key, io.BytesIO(data), out, chunk_bytes, workers)
+    return out.getvalue()
+
+def decrypt_bytes(key, data, workers=WORKERS):
+    out = io.BytesIO()
+    decrypt_stream(key, io.BytesIO(data), out, workers)
+    return out.getvalue()
+
+# --- Hybrid RSA-OAEP + AES-GCM envelopes ---
+def hybrid_encrypt_stream(public_key, reader, writer, chunk_bytes=CHUNK_BYTES, workers=WORKERS):
+    # RSA only wraps the 32-byte data key; the payload goes through the AES-GCM stream
+    key = new_key()
+    wrapped = PKCS1_OAEP.new(public_key).encrypt(key)
+    writer.write(HYBRID_HEADER.pack(HYBRID_MAGIC, len(wrapped)) + wrapped)
+    totals = encrypt_stream(key, reader, writer, chunk_bytes, workers)
+    totals["ciphertext_bytes"] += HYBRID_HEADER.size + len(wrapped)
+    return totals
+
+def hybrid_decrypt_stream(private_key, reader, writer, workers=WORKERS):
+    header = reader.read(HYBRID_HEADER.size)
+    if len(header) < HYBRID_HEADER.size or header[:4] != HYBRID_MAGIC:
+        raise StreamError("Not a hybrid envelope")
+    (wrapped_length,) = struct.unpack_from(">H", header, 4)
+    key = PKCS1_OAEP.new(private_key).decrypt(reader.read(wrapped_length))
+    return decrypt_stream(key, reader, writer, workers)
+
+def hybrid_encrypt_bytes(public_key, data, chunk_bytes=CHUNK_BYTES, workers=WORKERS):
+    out = io.BytesIO()
+    hybrid_encrypt_stream(public_key, io.BytesIO(data), out, chunk_bytes, workers)
+    return out.getvalue()
+
+def hybrid_decrypt_bytes(private_key, data, workers=WORKERS):
+    out = io.BytesIO()
+    hybrid_decrypt_stream(private_key, io.BytesIO(data), out, workers)
+    return out.getvalue()
+
+# --- One-shot timings (kept for existing callers) ---
+def aes_encrypt_decrypt(data, chunk_bytes=CHUNK_BYTES, workers=WORKERS):
+    key = new_key()
+    payload = json.dumps(data).encode()
+    start = time.perf_counter()
+    ciphertext = encrypt_bytes(key, payload, chunk_bytes, workers)
+    encrypt_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plaintext = decrypt_bytes(key, ciphertext, workers)
+    decrypt_time = time.perf_counter() - start
 
     return encrypt_time, decrypt_time
 
-def rsa_encrypt_decrypt(data):
-    key = RSA.generate(2048)
-    cipher = PKCS1_OAEP.new(key.publickey())
-    start = time.time()
-    ciphertext = cipher.encrypt(json.dumps(data).encode())
-    encrypt_time = time.time() - start
-
-    start = time.time()
-    decipher = PKCS1_OAEP.new(key)
-    plaintext = decipher.decrypt(ciphertext)
-    decrypt_time = time.time() - start
+def rsa_encrypt_decrypt(data, chunk_bytes=CHUNK_BYTES, workers=WORKERS):
+    key = rsa_keypair()
+    payload = json.dumps(data).encode()
+    start = time.perf_counter()
+    ciphertext = hybrid_encrypt_bytes(key.publickey(), payload, chunk_bytes, workers)
+    encrypt_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plaintext = hybrid_decrypt_bytes(key, ciphertext, workers)
+    decrypt_time = time.perf_counter() - start
 
     return encrypt_time, decrypt_time
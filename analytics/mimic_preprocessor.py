@@ -1,17 +1,129 @@
+import csv
+import io
+import json
+import os
+
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
-
-def load_and_prepare_mimic(path="D:\\Research\\mimic-iii-clinical-database-demo-1.4\\mimic-iii-clinical-database-demo-1.4\\DRGCODES.csv"):
-    df = pd.read_csv(path)
-    
-    # Drop NA drg_type
-    df = df.dropna(subset=["drg_type"])
-    
-    # Encode 'drg_type'
-    encoder = LabelEncoder()
-    df["drg_type_encoded"] = encoder.fit_transform(df["drg_type"])
-    
-    print("Encoding Map:", dict(zip(encoder.classes_, encoder.transform(encoder.classes_))))
-    
-    return df["drg_type_encoded"].tolist()
 
+DEFAULT_PATH = "D:\\Research\\mimic-iii-clinical-database-demo-1.4\\mimic-iii-clinical-database-demo-1.4\\DRGCODES.csv"
+VOCAB_DIR = os.environ.get("MIMIC_VOCAB_DIR", os.path.join(".he_cache", "vocab"))
+DEFAULT_BLOCK_SIZE = 4096  # CKKS slots at poly_modulus_degree 8192
+DEFAULT_CHUNKSIZE = 100_000  # CSV rows parsed per pandas chunk
+
+# --- Persisted category vocabulary ---
+# Codes are assigned in order of first appearance and never change once written,
+# so the same category encodes identically across runs and files.
+def vocab_path(column, vocab_dir=VOCAB_DIR):
+    return os.path.join(vocab_dir, f"{column}.json")
+
+def load_vocabulary(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_vocabulary(vocab, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(vocab, f)
+    os.replace(tmp_path, path)
+
+def encode_categories(values, vocab):
+    # Factorize once per chunk, then map the (few) uniques through the vocabulary
+    codes, uniques = pd.factorize(values)
+    lookup = np.array([vocab.setdefault(str(u), len(vocab)) for u in uniques], dtype=np.float64)
+    return lookup[codes]
+
+# --- Streaming reader ---
+class _BoundedReader(io.RawIOBase):
+    # Reads a binary file from its current position up to `stop`, so rows appended while
+    # an ingest runs are left for the next one
+    def __init__(self, f, stop):
+        self._f = f
+        self._stop = stop
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), self._stop - self._f.tell())
+        if n <= 0:
+            return 0
+        data = self._f.read(n)
+        buffer[:len(data)] = data
+        return len(data)
+
+def _seek_rows(f, header_bytes, start_byte):
+    # Positions f at a resume offset, checking that it still falls on a row boundary
+    if start_byte < header_bytes:
+        raise ValueError(f"Resume offset {start_byte} is inside the CSV header")
+    # The byte before it ends the last ingested row, unless that row was unterminated and
+    # the appender started a new line
+    f.seek(start_byte - 1)
+    before, after = f.read(1), f.read(1)
+    if before != b"\n" and after not in (b"", b"\n", b"\r"):
+        raise ValueError(f"Resume offset {start_byte} is not at a row boundary; the file was rewritten, not appended to")
+    f.seek(start_byte)
+
+def iter_mimic_blocks(path=DEFAULT_PATH, column="drg_type", block_size=DEFAULT_BLOCK_SIZE,
+                      chunksize=DEFAULT_CHUNKSIZE, vocab_file=None, start_row=0, start_byte=0, progress=None):
+    # Yields float64 blocks of exactly block_size values (the last one may be shorter).
+    # `progress`, if given, is updated with raw CSV rows and bytes read so callers can resume.
+    # A resume seeks straight to start_byte (the previous bytes_read) and parses only the rows
+    # after it; start_row alone (no byte offset recorded) falls back to skipping rows.
+    vocab_file = vocab_file or vocab_path(column)
+    vocab = load_vocabulary(vocab_file)
+    progress = progress if progress is not None else {}
+    progress.setdefault("rows_read", start_row)
+
+    source = open(path, "rb")
+    header = source.readline()
+    names = next(csv.reader([header.decode("utf-8-sig")]))
+    stop = os.fstat(source.fileno()).st_size  # rows appended from here on wait for the next ingest
+    if start_byte:
+        _seek_rows(source, len(header), start_byte)
+    reader = pd.read_csv(
+        io.BufferedReader(_BoundedReader(source, stop)),
+        header=None,
+        names=names,
+        usecols=[column],
+        dtype={column: "category"},
+        chunksize=chunksize,
+        skiprows=start_row if start_row and not start_byte else None
+    )
+    pending = []
+    pending_len = 0
+    try:
+        for frame in reader:
+            progress["rows_read"] += len(frame)
+            # Drop NA drg_type
+            values = frame[column].dropna()
+            if values.empty:
+                continue
+            pending.append(encode_categories(values, vocab))
+            pending_len += len(pending[-1])
+
+            if pending_len >= block_size:
+                merged = np.concatenate(pending)
+                full = len(merged) - len(merged) % block_size
+                for offset in range(0, full, block_size):
+                    yield merged[offset:offset + block_size]
+                pending = [merged[full:]]
+                pending_len = len(pending[0])
+
+        if pending_len:
+            yield np.concatenate(pending)
+        progress["bytes_read"] = stop
+    finally:
+        source.close()
+        save_vocabulary(vocab, vocab_file)
+        progress["vocab_size"] = len(vocab)
+
+def load_and_prepare_mimic(path=DEFAULT_PATH):
+    # Whole-column convenience wrapper over the streaming reader
+    blocks = list(iter_mimic_blocks(path))
+    encoded = np.concatenate(blocks) if blocks else np.empty(0, dtype=np.float64)
+    print(f"[i] Encoded {len(encoded)} drg_type values ({len(load_vocabulary(vocab_path('drg_type')))} categories)")
+    return encoded.tolist()
@@ -0,0 +1,354 @@
+# analytics/result_logger.py
+# Hierarchical span tracer. Each pipeline run is appended to a JSONL history:
+#   python -m analytics.result_logger metrics_history.jsonl   (per-stage percentiles)
+#   streamlit run dashboard.py                                (trends and run-to-run comparison)
+import functools
+import json
+import math
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MB = 1024 * 1024
+HISTORY_PATH = os.environ.get("METRICS_HISTORY_PATH", "metrics_history.jsonl")
+CAPTURE_MEMORY = os.environ.get("TRACE_MEMORY", "0") == "1"
+
+def rss_mb():
+    if psutil is not None:
+        return round(psutil.Process().memory_info().rss / MB, 2)
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / MB, 2)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class Tracer:
+    def __init__(self, run_id=None, capture_memory=CAPTURE_MEMORY):
+        self.run_id = run_id or uuid.uuid4().hex
+        self.started_at = time.time()
+        self.capture_memory = capture_memory
+        self.spans = []  # finished spans, in completion order
+        self._origin_ns = time.perf_counter_ns()
+        self._local = threading.local()  # open-span stack per thread
+        self._lock = threading.Lock()
+        if capture_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def reset(self, run_id=None):
+        # Starts a new run on this tracer, so spans do not pile up across runs in one process
+        with self._lock:
+            self.run_id = run_id or uuid.uuid4().hex
+            self.started_at = time.time()
+            self.spans = []
+            self._origin_ns = time.perf_counter_ns()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def current(self):
+        # Pass this as `parent=` to keep nesting across thread pools
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name, bytes_processed=None, parent=None, **attrs):
+        stack = self._stack()
+        parent = parent or (stack[-1] if stack else None)
+        record = {
+            "name": name,
+            "path": f"{parent['path']}/{name}" if parent else name,
+            "depth": parent["depth"] + 1 if parent else 0,
+            "start_offset_ns": time.perf_counter_ns() - self._origin_ns
+        }
+        if bytes_processed is not None:
+            record["bytes"] = bytes_processed  # callers may also set record["bytes"] inside the block
+        if attrs:
+            record["attrs"] = attrs
+        if self.capture_memory:
+            traced_start = tracemalloc.get_traced_memory()[0]
+
+        stack.append(record)
+        start = time.perf_counter_ns()
+        try:
+            yield record
+        except Exception as e:
+            record["error"] = str(e)
+            raise
+        finally:
+            record["duration_ns"] = time.perf_counter_ns() - start
+            stack.pop()
+            if self.capture_memory:
+                traced_now, traced_peak = tracemalloc.get_traced_memory()
+                record["py_alloc_mb"] = round((traced_now - traced_start) / MB, 3)
+                record["py_peak_mb"] = round(traced_peak / MB, 3)
+                record["rss_mb"] = rss_mb()
+            with self._lock:
+                self.spans.append(record)
+
+    def traced(self, name=None, **attrs):
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name or fn.__name__, **attrs):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def merge(self, spans, parent=None):
+        # Re-roots spans recorded elsewhere (e.g. returned by the Lambda) under `parent`
+        with self._lock:
+            for remote in spans:
+                record = dict(remote)
+                if parent:
+                    record["path"] = f"{parent['path']}/{remote['path']}"
+                    record["depth"] = parent["depth"] + 1 + remote.get("depth", 0)
+                record["remote"] = True
+                self.spans.append(record)
+
+    def durations(self, depth=0):
+        # {name: seconds} for spans at one depth; repeated names are summed
+        totals = {}
+        for record in self.spans:
+            if record["depth"] == depth and not record.get("remote"):
+                totals[record["name"]] = totals.get(record["name"], 0) + record["duration_ns"]
+        return {name: round(ns / 1e9, 4) for name, ns in totals.items()}
+
+    def to_record(self, **meta):
+        # Per-chunk spans are folded together, so a history line grows with the shape of
+        # the span tree rather than with the number of chunks
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "meta": meta,
+            "spans": sorted(aggregate_spans(self.spans), key=lambda s: s.get("start_offset_ns", 0))
+        }
+
+    def append_history(self, path=HISTORY_PATH, **meta):
+        line = json.dumps(self.to_record(**meta), default=str)
+        with self._lock, open(path, "a") as f:
+            f.write(line + "\n")
+        print(f"[✓] Run {self.run_id} appended to {path}")
+
+def aggregate_spans(spans):
+    # One record per (path, remote): durations and bytes summed, with "count" and "max_ns"
+    # when several spans share a path; per-span attrs are dropped from folded records
+    merged = {}
+    for record in spans:
+        key = (record["path"], bool(record.get("remote")))
+        total = merged.get(key)
+        if total is None:
+            merged[key] = dict(record)
+            continue
+        if "count" not in total:
+            total["count"] = 1
+            total["max_ns"] = total["duration_ns"]
+            total.pop("attrs", None)
+            if "error" in total:
+                total["errors"] = 1
+        # Records may already be folded (e.g. spans returned by the Lambda)
+        total["count"] += record.get("count", 1)
+        total["duration_ns"] += record["duration_ns"]
+        total["max_ns"] = max(total["max_ns"], record.get("max_ns", record["duration_ns"]))
+        total["start_offset_ns"] = min(total.get("start_offset_ns", 0), record.get("start_offset_ns", 0))
+        if record.get("bytes"):
+            total["bytes"] = total.get("bytes", 0) + record["bytes"]
+        if "error" in record or "errors" in record:
+            total["errors"] = total.get("errors", 0) + record.get("errors", 1)
+        for name in ("py_peak_mb", "rss_mb"):
+            if record.get(name) is not None:
+                total[name] = max(total.get(name) or 0, record[name])
+    return list(merged.values())
+
+# Process-wide tracer shared by main.py and the cloud uploaders
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced
+
+def span_seconds(record):
+    return round(record["duration_ns"] / 1e9, 4)
+
+# --- History analysis ---
+def load_history(path=HISTORY_PATH):
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue  # tolerate a partially written last line
+
+def _percentile(sorted_values, q):
+    rank = max(math.ceil(q / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+def stage_percentiles(records, percentiles=(50, 90, 99)):
+    durations, throughputs = {}, {}
+    for record in records:
+        for s in record.get("spans", []):
+            seconds = s["duration_ns"] / 1e9
+            durations.setdefault(s["path"], []).append(seconds)
+            if s.get("bytes") and seconds > 0:
+                throughputs.setdefault(s["path"], []).append(s["bytes"] / MB / seconds)
+
+    summary = {}
+    for path, values in durations.items():
+        values.sort()
+        entry = {"runs": len(values), "mean_s": round(sum(values) / len(values), 4)}
+        for q in percentiles:
+            entry[f"p{q}_s"] = round(_percentile(values, q), 4)
+        if path in throughputs:
+            entry["median_mb_per_s"] = round(_percentile(sorted(throughputs[path]), 50), 2)
+        summary[path] = entry
+    return summary
+
+def slowest_stages(summary, top=10, key="p90_s"):
+    return sorted(summary.items(), key=lambda item: item[1].get(key, 0), reverse=True)[:top]
+
+# --- Incremental history (dashboard.py) ---
+def read_history(path=HISTORY_PATH, offset=0):
+    # Parses complete lines after byte `offset` and returns (records, new offset);
+    # a partially written last line is left for the next call
+    records = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records, offset
+
+def run_row(record, max_depth=1):
+    # Compact per-run summary: seconds and bytes per span path (repeated paths summed).
+    # Deeper and remote spans are dropped so tens of thousands of runs stay small in memory
+    seconds, byte_counts = {}, {}
+    for s in record.get("spans", []):
+        if s.get("depth", 0) > max_depth or s.get("remote"):
+            continue
+        seconds[s["path"]] = seconds.get(s["path"], 0) + s["duration_ns"] / 1e9
+        if s.get("bytes"):
+            byte_counts[s["path"]] = byte_counts.get(s["path"], 0) + s["bytes"]
+    meta = record.get("meta") or {}
+    stats = meta.get("stats") or {}
+    return {
+        "run_id": record.get("run_id"),
+        "started_at": record.get("started_at"),
+        "stages": meta.get("stages"),
+        "values": (stats.get("ingest") or {}).get("values"),
+        "seconds": seconds,
+        "bytes": byte_counts
+    }
+
+class RunHistory:
+    # Run rows for a history file; refresh() only parses lines appended since the last call,
+    # and starts over if the file was truncated or replaced
+    def __init__(self, path=HISTORY_PATH, max_depth=1):
+        self.path = path
+        self.max_depth = max_depth
+        self.rows = []
+        self.offset = 0
+        self._identity = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        # Returns the number of new runs
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                self.rows, self.offset, self._identity = [], 0, None
+                return 0
+            identity = (st.st_dev, st.st_ino)
+            if identity != self._identity or st.st_size < self.offset:
+                self.rows, self.offset = [], 0
+            self._identity = identity
+            if st.st_size == self.offset:
+                return 0
+            records, self.offset = read_history(self.path, self.offset)
+            self.rows.extend(run_row(record, self.max_depth) for record in records)
+            return len(records)
+
+def run_percentiles(rows, percentiles=(50, 90, 99)):
+    # Per-stage latency percentiles over per-run totals, with median MB/s and values/s
+    durations, mb_per_s, values_per_s = {}, {}, {}
+    for row in rows:
+        for path, seconds in row["seconds"].items():
+            durations.setdefault(path, []).append(seconds)
+            if seconds <= 0:
+                continue
+            if path in row["bytes"]:
+                mb_per_s.setdefault(path, []).append(row["bytes"][path] / MB / seconds)
+            if row["values"] and "/" not in path:
+                values_per_s.setdefault(path, []).append(row["values"] / seconds)
+
+    summary = {}
+    for path, values in durations.items():
+        values.sort()
+        entry = {"runs": len(values), "mean_s": round(sum(values) / len(values), 4)}
+        for q in percentiles:
+            entry[f"p{q}_s"] = round(_percentile(values, q), 4)
+        if path in mb_per_s:
+            entry["median_mb_per_s"] = round(_percentile(sorted(mb_per_s[path]), 50), 2)
+        if path in values_per_s:
+            entry["median_values_per_s"] = round(_percentile(sorted(values_per_s[path]), 50), 1)
+        summary[path] = entry
+    return summary
+
+def downsample(points, max_points=500):
+    # [(x, y)] -> at most max_points (x, median y, max y) buckets; the medians show the trend
+    # and the maxima keep spikes a plain stride would drop
+    if not points:
+        return []
+    size = math.ceil(len(points) / max_points)
+    buckets = []
+    for i in range(0, len(points), size):
+        bucket = points[i:i + size]
+        ys = sorted(y for _, y in bucket)
+        buckets.append((bucket[0][0], _percentile(ys, 50), ys[-1]))
+    return buckets
+
+def compare_runs(base, new, threshold=0.10, min_seconds=0.001):
+    # Stage-by-stage change between two run rows, largest slowdown first; stages faster than
+    # min_seconds in both runs are noise and never flagged
+    rows = []
+    for path in sorted(set(base["seconds"]) | set(new["seconds"])):
+        before, after = base["seconds"].get(path), new["seconds"].get(path)
+        change = None
+        if before and after is not None:
+            change = (after - before) / before
+        rows.append({
+            "stage": path,
+            "base_s": None if before is None else round(before, 4),
+            "new_s": None if after is None else round(after, 4),
+            "change": None if change is None else round(change, 4),
+            "regression": change is not None and change > threshold and max(before, after) >= min_seconds
+        })
+    return sorted(rows, key=lambda r: r["change"] if r["change"] is not None else float("-inf"), reverse=True)
+
+if __name__ == "__main__":
+    history_path = sys.argv[1] if len(sys.argv) > 1 else HISTORY_PATH
+    summary = stage_percentiles(load_history(history_path))
+    print(f"{'stage':<50} {'runs':>6} {'p50 s':>9} {'p90 s':>9} {'p99 s':>9} {'MB/s':>8}")
+    for path, entry in slowest_stages(summary, top=len(summary)):
+        print(f"{path:<50} {entry['runs']:>6} {entry['p50_s']:>9} {entry['p90_s']:>9} {entry['p99_s']:>9} {entry.get('median_mb_per_s', ''):>8}")
@@ -1,46 +1,304 @@
 
-import json
 import base64
-import boto3
-import tenseal as ts
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from analytics import result_logger
+from cloud import lambda_batch, wire_format
+from seal_backend import container
+
+# --- Lazy imports ---
+# boto3 and tenseal are imported on first use, so invocations that never touch S3 or a
+# ciphertext (bad requests, warmup pings) skip their import cost during a cold start.
+# HE_LAMBDA_PRELOAD=1 imports them during init instead.
+PRELOAD = os.environ.get("HE_LAMBDA_PRELOAD", "0") == "1"
+HEAVY_MODULES = ("boto3", "tenseal")
+cold_start = {"cold": True, "import_s": {}}
+_s3 = None
+_s3_lock = threading.Lock()
+
+def _import(name):
+    module = sys.modules.get(name)
+    if module is None:
+        start = time.perf_counter()
+        module = __import__(name)
+        cold_start["import_s"][name] = round(time.perf_counter() - start, 4)
+    return module
+
+def tenseal():
+    return _import("tenseal")
+
+def get_s3():
+    global _s3
+    if _s3 is None:
+        with _s3_lock:
+            if _s3 is None:
+                _s3 = _import("boto3").client("s3")
+    return _s3
+
+def preload():
+    get_s3()
+    tenseal()
+    _import("analytics.analysis_runner")
+
+# --- Warm-container cache ---
+# Module state survives across invocations on a warm container. Entries are keyed by
+# S3 ETag (or the key itself for content-addressed contexts) and evicted LRU-first.
+CACHE_MAX_BYTES = int(os.environ.get("HE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+_cache = OrderedDict()  # cache key -> (size in bytes, value)
+_cache_lock = threading.Lock()
+cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+# Payload keys in one invocation are processed on a thread pool sharing one context
+LAMBDA_WORKERS = int(os.environ.get("HE_LAMBDA_WORKERS", "4"))
+
+def _cache_get(cache_key):
+    with _cache_lock:
+        entry = _cache.get(cache_key)
+        if entry is None:
+            cache_stats["misses"] += 1
+            return None
+        _cache.move_to_end(cache_key)
+        cache_stats["hits"] += 1
+        return entry[1]
+
+def _cache_contains(cache_key):
+    # Presence probe for prefetching; leaves hit/miss counting and LRU order to _cache_get
+    with _cache_lock:
+        return cache_key in _cache
+
+def _cache_put(cache_key, value, size):
+    with _cache_lock:
+        if cache_key in _cache:
+            cache_stats["bytes"] -= _cache.pop(cache_key)[0]
+        _cache[cache_key] = (size, value)
+        cache_stats["bytes"] += size
+        while cache_stats["bytes"] > CACHE_MAX_BYTES and len(_cache) > 1:
+            _, (evicted_size, _) = _cache.popitem(last=False)
+            cache_stats["bytes"] -= evicted_size
+            cache_stats["evictions"] += 1
+
+# Chunk objects can be overwritten by a full re-ingest, so their ETag is checked, but at most
+# once per TTL per key: a warm batch of cache hits then costs no S3 round trips. An object
+# rewritten within the TTL may be served from cache until it expires.
+ETAG_TTL_SECONDS = float(os.environ.get("HE_ETAG_TTL_SECONDS", "60"))
+_etags = {}  # (bucket, key) -> (etag, checked at)
+_etags_lock = threading.Lock()
+
+def _object_version(bucket, key):
+    # contexts/<sha256>.bin already names its content and containers are written once
+    # under a unique name, so skip the HEAD request for both
+    if key.startswith("contexts/") or key.endswith(container.SUFFIX):
+        return key
+    now = time.monotonic()
+    with _etags_lock:
+        entry = _etags.get((bucket, key))
+    if entry is not None and now - entry[1] < ETAG_TTL_SECONDS:
+        return entry[0]
+    etag = get_s3().head_object(Bucket=bucket, Key=key)["ETag"]
+    with _etags_lock:
+        _etags[(bucket, key)] = (etag, now)
+    return etag
+
+def load_context(bucket, context_key):
+    cache_key = ("context", bucket, context_key, _object_version(bucket, context_key))
+    context = _cache_get(cache_key)
+    if context is None:
+        context_bytes = get_s3().get_object(Bucket=bucket, Key=context_key)["Body"].read()
+        context = tenseal().context_from(context_bytes)
+        _cache_put(cache_key, context, len(context_bytes))
+    return cache_key, context
+
+def load_container(bucket, container_key):
+    # Header, meta and index only (three small ranged GETs); chunks are fetched on demand
+    cache_key = ("container", bucket, container_key)
+    reader = _cache_get(cache_key)
+    if reader is None:
+        reader = container.RangedContainerReader(container.s3_range_fetcher(get_s3(), bucket, container_key))
+        _cache_put(cache_key, reader, container.INDEX_ENTRY.size * len(reader))
+    return reader
 
-s3 = boto3.client("s3")
+def _ciphertext_cache_key(context_cache_key, bucket, payload_key):
+    # Vectors are bound to their context, so the context identity is part of the key
+    object_key = (container.parse_chunk_ref(payload_key) or (payload_key,))[0]
+    return ("ciphertext", context_cache_key, bucket, payload_key, _object_version(bucket, object_key))
+
+def load_ciphertext(context_cache_key, context, bucket, payload_key, payload_format=None):
+    cache_key = _ciphertext_cache_key(context_cache_key, bucket, payload_key)
+    ckks_vector = _cache_get(cache_key)
+    if ckks_vector is None:
+        ref = container.parse_chunk_ref(payload_key)
+        if ref:
+            encrypted_bytes = load_container(bucket, ref[0]).chunk(ref[1])
+        else:
+            payload_body = get_s3().get_object(Bucket=bucket, Key=payload_key)["Body"].read()
+            encrypted_bytes = wire_format.decode_payload(payload_body, payload_format)
+        ckks_vector = tenseal().ckks_vector_from(context, encrypted_bytes)
+        _cache_put(cache_key, ckks_vector, len(encrypted_bytes))
+    return ckks_vector
+
+def prefetch_container_chunks(trace, context_cache_key, context, bucket, payload_keys):
+    # Uncached chunks of the same container are read with one ranged GET per consecutive run
+    wanted = {}
+    for payload_key in payload_keys:
+        ref = container.parse_chunk_ref(payload_key)
+        if ref and not _cache_contains(_ciphertext_cache_key(context_cache_key, bucket, payload_key)):
+            wanted.setdefault(ref[0], []).append(ref[1])
+    for container_key, positions in wanted.items():
+        with trace.span("fetch_container_chunks", key=container_key, chunks=len(positions)) as fetch_span:
+            fetched = 0
+            for position, encrypted_bytes in load_container(bucket, container_key).chunks(positions):
+                payload_key = container.chunk_ref(container_key, position)
+                cache_key = _ciphertext_cache_key(context_cache_key, bucket, payload_key)
+                _cache_put(cache_key, tenseal().ckks_vector_from(context, encrypted_bytes), len(encrypted_bytes))
+                fetched += len(encrypted_bytes)
+            fetch_span["bytes"] = fetched
+
+def process_item(trace, parent_span, context_cache_key, he_context, bucket, payload_key, payload_format, return_values,
+                 values_format=None):
+    start = time.perf_counter()
+    try:
+        with trace.span("load_ciphertext", parent=parent_span, key=payload_key):
+            ckks_vector = load_ciphertext(context_cache_key, he_context, bucket, payload_key, payload_format)
+        with trace.span("decrypt", parent=parent_span, key=payload_key):
+            decrypted = ckks_vector.decrypt()
+        item = {"key": payload_key, "count": len(decrypted), "seconds": round(time.perf_counter() - start, 4)}
+        if values_format == "f64":
+            # Packed float64, 8 bytes a value; read with analytics/accuracy.py decode_values()
+            item["decrypted_f64"] = base64.b64encode(array("d", decrypted[:return_values]).tobytes()).decode("ascii")
+        else:
+            item["decrypted_result"] = decrypted[:return_values]
+        return item
+    except Exception as e:
+        return {"key": payload_key, "error": str(e), "seconds": round(time.perf_counter() - start, 4)}
+
+def aggregate_items(trace, context_cache_key, he_context, bucket, event, payload_keys):
+    # Combines every chunk into one result ciphertext; nothing is decrypted here
+    from analytics import analysis_runner
+    payload_format = event.get("payload_format")
+    load = lambda key: load_ciphertext(context_cache_key, he_context, bucket, key, payload_format)
+    with trace.span("load_ciphertexts", chunks=len(payload_keys)):
+        prefetch_container_chunks(trace, context_cache_key, he_context, bucket, payload_keys)
+        with ThreadPoolExecutor(max_workers=min(LAMBDA_WORKERS, len(payload_keys))) as pool:
+            vectors = list(pool.map(load, payload_keys))
+            other_keys = event.get("encrypted_payload_keys_b") or []
+            other_vectors = list(pool.map(load, other_keys))
+
+    with trace.span(event["operation"]):
+        result = analysis_runner.run_aggregation(
+            event["operation"],
+            vectors,
+            count=event.get("count"),
+            weights=event.get("weights"),
+            other_vectors=other_vectors
+        )
+    with trace.span("serialize_result") as serialize_span:
+        result_bytes = result.serialize()
+        serialize_span["bytes"] = len(result_bytes)
+    return base64.b64encode(result_bytes).decode("utf-8")
+
+def _cold_start_report():
+    # Reported once per container: whether this was its first invocation and what it imported
+    report = {"cold": cold_start["cold"], "import_s": dict(cold_start["import_s"])}
+    cold_start["cold"] = False
+    return report
 
 def lambda_handler(event, context):
+    start = time.perf_counter()
+    # Per-invocation spans are returned to the caller, which nests them under its own
+    trace = result_logger.Tracer(run_id=event.get("run_id"), capture_memory=False)
     try:
+        # Warmup pings (scheduled or from benchmarks/cold_start.py) load everything up front
+        if event.get("warmup"):
+            preload()
+            return {
+                "statusCode": 200,
+                "warmup": True,
+                "timing": {"total": round(time.perf_counter() - start, 4)},
+                "cold_start": _cold_start_report()
+            }
+
         bucket = event.get("s3_bucket")
-        payload_key = event.get("encrypted_payload_key")
         context_key = event.get("seal_context_key")
+        operation = event.get("operation", "decrypt")
+        # Aggregations only need evaluation keys; a public context holding just the Galois keys
+        # they rotate with loads faster than the full context (key_management/key_gen.py)
+        if operation != "decrypt" and event.get("eval_context_key"):
+            context_key = event["eval_context_key"]
+        # One key, a list of keys, or a key range (see cloud/lambda_batch.py)
+        payload_keys = lambda_batch.expand_payload_keys(event)
 
-        if not (bucket and payload_key and context_key):
+        if not (bucket and payload_keys and context_key):
             return {
                 "statusCode": 400,
-                "error": "Missing required S3 keys"
+                "error": "Missing required S3 keys",
+                "cold_start": _cold_start_report()
             }
 
-        # Download encrypted payload from S3
-        payload_obj = s3.get_object(Bucket=bucket, Key=payload_key)
-        encrypted_payload_b64 = payload_obj["Body"].read().decode("utf-8")
-
-        # Download context (in bytes)
-        context_obj = s3.get_object(Bucket=bucket, Key=context_key)
-        context_bytes = context_obj["Body"].read()
+        # Restore context once per invocation (and cached across warm invocations)
+        with trace.span("load_context"):
+            context_cache_key, he_context = load_context(bucket, context_key)
+        context_seconds = round(time.perf_counter() - start, 4)
 
-        # Restore context
-        context = ts.context_from(context_bytes)
+        # Server-side aggregation: one small result ciphertext travels back
+        if operation != "decrypt":
+            encrypted_result = aggregate_items(trace, context_cache_key, he_context, bucket, event, payload_keys)
+            return {
+                "statusCode": 200,
+                "operation": operation,
+                "chunks": len(payload_keys),
+                "encrypted_result": encrypted_result,
+                "timing": {"context_load": context_seconds, "total": round(time.perf_counter() - start, 4)},
+                "supported_codecs": wire_format.supported_codecs(),
+                "cache": dict(cache_stats, entries=len(_cache)),
+                "cold_start": _cold_start_report(),
+                "trace": result_logger.aggregate_spans(trace.spans)
+            }
 
-        # Decode and decrypt
-        encrypted_bytes = base64.b64decode(encrypted_payload_b64)
-        ckks_vector = ts.ckks_vector_from(context, encrypted_bytes)
-        decrypted = ckks_vector.decrypt()
+        # Download, decode (binary wire format, base64 as fallback) and decrypt each item
+        payload_format = event.get("payload_format")
+        return_values = event.get("return_values", 10)  # Only return the first N values per item (None: all)
+        values_format = event.get("values_format")  # "f64": packed float64 instead of a JSON list
+        with trace.span("process_items", items=len(payload_keys)) as items_span:
+            prefetch_container_chunks(trace, context_cache_key, he_context, bucket, payload_keys)
+            with ThreadPoolExecutor(max_workers=min(LAMBDA_WORKERS, len(payload_keys))) as pool:
+                results = list(pool.map(
+                    lambda key: process_item(trace, items_span, context_cache_key, he_context, bucket, key, payload_format,
+                                             return_values, values_format),
+                    payload_keys
+                ))
 
-        return {
+        response = {
             "statusCode": 200,
-            "decrypted_result": decrypted[:10]  # Only return first 10 values
+            "results": results,
+            "timing": {"context_load": context_seconds, "total": round(time.perf_counter() - start, 4)},
+            "supported_codecs": wire_format.supported_codecs(),
+            "cache": dict(cache_stats, entries=len(_cache)),
+            "cold_start": _cold_start_report(),
+            "trace": result_logger.aggregate_spans(trace.spans)
         }
+        # Single-key events keep the original response shape
+        if "encrypted_payload_key" in event and len(results) == 1:
+            if "error" in results[0]:
+                response["error"] = results[0]["error"]
+            elif "decrypted_f64" in results[0]:
+                # Callers asking for packed values get them under the same name as in items
+                response["decrypted_f64"] = results[0]["decrypted_f64"]
+            else:
+                response["decrypted_result"] = results[0]["decrypted_result"]
+        return response
 
     except Exception as e:
         return {
             "statusCode": 500,
-            "error": str(e)
+            "error": str(e),
+            "cold_start": _cold_start_report()
         }
+
+if PRELOAD:
+    preload()
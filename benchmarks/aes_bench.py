@@ -0,0 +1,106 @@
+# benchmarks/aes_bench.py
+# Symmetric baseline benchmark, measured with the same harness and input lengths as
+# he_bench.py so HE and AES timings compare like for like. Run from the repo root:
+#   python -m benchmarks.aes_bench --lengths 4096 1000000 --workers 1 8 --output aes_results.json
+#   python -m benchmarks.aes_bench --file data/DRGCODES.csv   (time a real file as well)
+#   python -m benchmarks.aes_bench --baseline benchmarks/aes_baseline.json  (exit code 1 on regression)
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+
+from analytics import comparator
+from benchmarks import harness
+
+OPS = ("encrypt", "decrypt", "hybrid_encrypt", "hybrid_decrypt")
+
+def case_id(label, chunk_bytes, workers):
+    return f"aesgcm_{label}_chunk{chunk_bytes // 1024}k_w{workers}"
+
+def make_payload(length):
+    # Same values as he_bench.py, serialized the way the pipeline serializes plaintext
+    rng = random.Random(0)
+    return json.dumps([rng.uniform(0, 100) for _ in range(length)]).encode("utf-8")
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def throughput_mb_s(byte_count, stats):
+    if "median_ms" not in stats or stats["median_ms"] <= 0:
+        return None
+    return round(byte_count / (1024 * 1024) / (stats["median_ms"] / 1000), 2)
+
+def bench_case(payload, chunk_bytes, workers, ops, warmup, iterations):
+    measure = lambda fn: harness.measure_safely(fn, warmup, iterations)
+    key = comparator.new_key()
+    rsa_key = comparator.rsa_keypair()
+    public_key = rsa_key.publickey()
+    ciphertext = comparator.encrypt_bytes(key, payload, chunk_bytes, workers)
+    hybrid_ciphertext = comparator.hybrid_encrypt_bytes(public_key, payload, chunk_bytes, workers)
+
+    timed_ops = {
+        "encrypt": lambda: comparator.encrypt_bytes(key, payload, chunk_bytes, workers),
+        "decrypt": lambda: comparator.decrypt_bytes(key, ciphertext, workers),
+        "hybrid_encrypt": lambda: comparator.hybrid_encrypt_bytes(public_key, payload, chunk_bytes, workers),
+        "hybrid_decrypt": lambda: comparator.hybrid_decrypt_bytes(rsa_key, hybrid_ciphertext, workers)
+    }
+    results = {op: measure(fn) for op, fn in timed_ops.items() if op in ops}
+    for stats in results.values():
+        stats["throughput_mb_s"] = throughput_mb_s(len(payload), stats)
+
+    return {
+        "chunk_bytes": chunk_bytes,
+        "workers": workers,
+        "ops": results,
+        "plaintext_bytes": len(payload),
+        "ciphertext_bytes": len(ciphertext),
+        "hybrid_ciphertext_bytes": len(hybrid_ciphertext),
+        "peak_rss_mb": harness.peak_rss_mb()
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time streaming AES-GCM and hybrid RSA envelopes")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[4096], help="input vector lengths (as in he_bench)")
+    parser.add_argument("--file", nargs="+", default=[], help="files to encrypt as additional cases")
+    parser.add_argument("--chunk-kb", type=int, nargs="+", default=[comparator.CHUNK_BYTES // 1024])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, comparator.WORKERS])
+    parser.add_argument("--ops", nargs="+", default=list(OPS), choices=OPS)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output", default="aes_results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before flagging (0.10 = 10%%)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {"environment": harness.environment(), "cases": {}}
+
+    inputs = [(f"len{length}", lambda length=length: make_payload(length)) for length in args.lengths]
+    for path in args.file:
+        label = os.path.splitext(os.path.basename(path))[0]
+        inputs.append((label, lambda path=path: read_file(path)))
+
+    for (label, load), chunk_kb, workers in itertools.product(inputs, args.chunk_kb, sorted(set(args.workers))):
+        name = case_id(label, chunk_kb * 1024, workers)
+        print(f"[...] Benchmarking {name}")
+        case = bench_case(load(), chunk_kb * 1024, workers, set(args.ops), args.warmup, args.iterations)
+        results["cases"][name] = case
+        for op, stats in case["ops"].items():
+            summary = stats.get("error") or f"median {stats['median_ms']}ms, p95 {stats['p95_ms']}ms, {stats['throughput_mb_s']} MB/s"
+            print(f"   {op:<15} {summary}")
+        print(f"   plaintext {case['plaintext_bytes']} bytes, ciphertext {case['ciphertext_bytes']} bytes, peak RSS {case['peak_rss_mb']} MB")
+
+    harness.write_results(args.output, results)
+
+    if args.baseline:
+        regressions = harness.compare_to_baseline(results, harness.load_results(args.baseline), args.threshold)
+        harness.print_regressions(regressions, args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
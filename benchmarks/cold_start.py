@@ -0,0 +1,174 @@
+# benchmarks/cold_start.py
+# Lambda cold-start benchmark that never calls AWS. Each iteration starts a fresh
+# interpreter (locally, or inside the deployment image) that imports app.py and invokes
+# the handler twice, timing the import, the first (cold) and the second (warm) invocation.
+# Run from the repo root:
+#   python -m benchmarks.cold_start --iterations 5 --budget-ms 300
+#   python -m benchmarks.cold_start --image tseal-lambda:latest --rie     (same image as lamser.py)
+#   python -m benchmarks.cold_start --baseline benchmarks/cold_start_baseline.json
+# Exits 1 if the median import exceeds the budget, a heavy module is imported with app.py,
+# or a median regresses past the baseline threshold.
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks import harness
+
+# "ping" takes the bad-request path (nothing heavy should load); "warmup" imports everything
+EVENTS = {"ping": {}, "warmup": {"warmup": True}}
+RIE_PATH = "/2015-03-31/functions/function/invocations"
+
+PROBE = """
+import json, sys, time
+event = json.loads(sys.argv[1])
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+heavy = [m for m in app.HEAVY_MODULES if m in sys.modules]
+first = app.lambda_handler(event, None)
+invoked = time.perf_counter()
+app.lambda_handler(event, None)
+print(json.dumps({
+    "import_s": imported - start,
+    "first_invoke_s": invoked - imported,
+    "second_invoke_s": time.perf_counter() - invoked,
+    "status": first.get("statusCode"),
+    "heavy_modules_at_import": heavy,
+    "cold_start": first.get("cold_start")
+}))
+"""
+
+def probe_command(event, image=None, env=()):
+    if image is None:
+        return [sys.executable, "-c", PROBE, json.dumps(event)]
+    env_args = [arg for pair in env for arg in ("-e", pair)]
+    return ["docker", "run", "--rm", *env_args, "--entrypoint", "python", image, "-c", PROBE, json.dumps(event)]
+
+def run_probe(event, image=None, env=()):
+    local_env = dict(os.environ, **dict(pair.split("=", 1) for pair in env))
+    completed = subprocess.run(probe_command(event, image, env), capture_output=True, text=True,
+                               check=True, env=local_env if image is None else None)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+# --- Runtime Interface Emulator (bundled with the AWS Lambda base images) ---
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _post(url, event, timeout):
+    request = urllib.request.Request(url, data=json.dumps(event).encode(), method="POST")
+    start = time.perf_counter_ns()
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        response.read()
+    return time.perf_counter_ns() - start
+
+def run_rie(event, image, env=(), timeout=60):
+    # Fresh container per call; the emulator initializes the handler on the first request,
+    # so the first latency includes the Lambda init phase
+    port = _free_port()
+    env_args = [arg for pair in env for arg in ("-e", pair)]
+    container_id = subprocess.run(
+        ["docker", "run", "--rm", "-d", "-p", f"127.0.0.1:{port}:8080", *env_args, image],
+        capture_output=True, text=True, check=True
+    ).stdout.strip()
+    url = f"http://127.0.0.1:{port}{RIE_PATH}"
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                first_ns = _post(url, event, timeout)
+                break
+            except (urllib.error.URLError, ConnectionError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+        return first_ns, _post(url, event, timeout)
+    finally:
+        subprocess.run(["docker", "stop", container_id], capture_output=True)
+
+def bench_case(event, iterations, image=None, env=(), rie=False):
+    run_probe(event, image, env)  # warm the filesystem (and image layer) caches
+    samples = {"import": [], "first_invoke": [], "second_invoke": []}
+    heavy, statuses = set(), set()
+    for _ in range(iterations):
+        report = run_probe(event, image, env)
+        samples["import"].append(int(report["import_s"] * 1e9))
+        samples["first_invoke"].append(int(report["first_invoke_s"] * 1e9))
+        samples["second_invoke"].append(int(report["second_invoke_s"] * 1e9))
+        heavy.update(report["heavy_modules_at_import"])
+        statuses.add(report["status"])
+    if rie:
+        samples["rie_first_request"], samples["rie_second_request"] = [], []
+        for _ in range(iterations):
+            first_ns, second_ns = run_rie(event, image, env)
+            samples["rie_first_request"].append(first_ns)
+            samples["rie_second_request"].append(second_ns)
+    return {
+        "ops": {op: harness.summarize(values) for op, values in samples.items()},
+        "heavy_modules_at_import": sorted(heavy),
+        "status_codes": sorted(statuses, key=str)
+    }
+
+def load_event(path):
+    with open(path) as f:
+        return json.load(f)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure Lambda handler import time and first-invocation latency")
+    parser.add_argument("--image", help="run inside this Docker image instead of the local interpreter")
+    parser.add_argument("--rie", action="store_true", help="also time requests through the image's Runtime Interface Emulator")
+    parser.add_argument("--events", nargs="+", default=list(EVENTS), choices=EVENTS)
+    parser.add_argument("--event-file", nargs="+", default=[], help="extra events as JSON files (e.g. against a local S3)")
+    parser.add_argument("--env", nargs="+", default=[], metavar="KEY=VALUE", help="environment for the handler")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, help="fail if the median handler import exceeds this")
+    parser.add_argument("--output", default="cold_start_results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before flagging (0.10 = 10%%)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.rie and not args.image:
+        print("[✗] --rie needs --image")
+        return 2
+
+    target = "image" if args.image else "local"
+    results = {"environment": harness.environment(), "image": args.image, "env": args.env, "cases": {}}
+    events = {name: EVENTS[name] for name in args.events}
+    for path in args.event_file:
+        events[os.path.splitext(os.path.basename(path))[0]] = load_event(path)
+
+    failed = False
+    for name, event in events.items():
+        case_name = f"{target}_{name}"
+        print(f"[...] Benchmarking {case_name}")
+        case = bench_case(event, args.iterations, args.image, args.env, args.rie)
+        results["cases"][case_name] = case
+        for op, stats in case["ops"].items():
+            print(f"   {op:<19} median {stats['median_ms']}ms, p95 {stats['p95_ms']}ms")
+        if case["heavy_modules_at_import"] and "HE_LAMBDA_PRELOAD=1" not in args.env:
+            print(f"[✗] Heavy modules imported with app.py: {', '.join(case['heavy_modules_at_import'])}")
+            failed = True
+        import_ms = case["ops"]["import"]["median_ms"]
+        if args.budget_ms is not None and import_ms > args.budget_ms:
+            print(f"[✗] Median handler import {import_ms}ms exceeds budget {args.budget_ms}ms")
+            failed = True
+
+    harness.write_results(args.output, results)
+
+    if args.baseline:
+        regressions = harness.compare_to_baseline(results, harness.load_results(args.baseline), args.threshold)
+        harness.print_regressions(regressions, args.threshold)
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# benchmarks/galois_keys.py
+# Before/after comparison of full vs selective Galois keys (key_management/key_gen.py):
+# key generation time, evaluation context size, and how long the Lambda takes to load it.
+# Run from the repo root:
+#   python -m benchmarks.galois_keys --poly-degrees 8192 16384 --operations sum mean variance
+#   python -m benchmarks.galois_keys --baseline benchmarks/galois_baseline.json  (exit code 1 on regression)
+import argparse
+import sys
+
+from analytics import analysis_runner
+from benchmarks import harness
+from key_management import key_gen
+from seal_backend import context_store
+
+def make_params(poly_modulus_degree):
+    # Same prime layout as the pipeline's default CKKS set, sized for the ring degree
+    chain = {8192: [60, 40, 40, 60], 16384: [60, 40, 40, 40, 40, 60], 32768: [60, 40, 40, 40, 40, 40, 40, 60]}
+    return {
+        "scheme": "CKKS",
+        "poly_modulus_degree": poly_modulus_degree,
+        "coeff_mod_bit_sizes": chain[poly_modulus_degree],
+        "global_scale": 2 ** 40
+    }
+
+def bench_case(poly_modulus_degree, operations, warmup, iterations):
+    import tenseal as ts
+
+    measure = lambda fn: harness.measure_safely(fn, warmup, iterations)
+    context = context_store.build_context(make_params(poly_modulus_degree))
+    context_store.ensure_relin_keys(context)
+    steps = analysis_runner.rotation_steps(operations, poly_modulus_degree // 2)
+
+    # Keygen is slow at large rings, so it is timed with fewer iterations than loading
+    keygen_iterations = max(iterations // 4, 1)
+    full_bytes = key_gen.evaluation_context(context, steps=None)
+    selective_bytes = key_gen.evaluation_context(context, steps)
+    ops = {
+        "keygen_full": harness.measure_safely(context.generate_galois_keys, 1, keygen_iterations),
+        "keygen_selective": harness.measure_safely(lambda: key_gen.galois_keys_bytes(context, steps), 1, keygen_iterations),
+        "load_full": measure(lambda: ts.context_from(full_bytes)),
+        "load_selective": measure(lambda: ts.context_from(selective_bytes))
+    }
+    return {
+        "poly_modulus_degree": poly_modulus_degree,
+        "operations": list(operations),
+        "steps": steps,
+        "ops": ops,
+        "full_context_bytes": len(full_bytes),
+        "selective_context_bytes": len(selective_bytes),
+        "size_ratio": round(len(selective_bytes) / len(full_bytes), 3),
+        "peak_rss_mb": harness.peak_rss_mb()
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare full and selective Galois key generation")
+    parser.add_argument("--poly-degrees", type=int, nargs="+", default=[8192], choices=[8192, 16384, 32768])
+    parser.add_argument("--operations", nargs="+", default=["sum", "mean", "variance"],
+                        choices=sorted(analysis_runner.OPERATION_DEPTH))
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--output", default="galois_results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before flagging (0.10 = 10%%)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {"environment": harness.environment(), "cases": {}}
+
+    for poly_modulus_degree in args.poly_degrees:
+        name = f"galois_n{poly_modulus_degree}_{'-'.join(args.operations)}"
+        print(f"[...] Benchmarking {name}")
+        case = bench_case(poly_modulus_degree, args.operations, args.warmup, args.iterations)
+        results["cases"][name] = case
+        for op, stats in case["ops"].items():
+            summary = stats.get("error") or f"median {stats['median_ms']}ms, p95 {stats['p95_ms']}ms"
+            print(f"   {op:<17} {summary}")
+        print(f"   context {case['full_context_bytes']} -> {case['selective_context_bytes']} bytes "
+              f"({case['size_ratio']:.1%}) for rotation steps {case['steps']}")
+
+    harness.write_results(args.output, results)
+
+    if args.baseline:
+        regressions = harness.compare_to_baseline(results, harness.load_results(args.baseline), args.threshold)
+        harness.print_regressions(regressions, args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# benchmarks/harness.py
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# --- Timing ---
+def percentile(sorted_samples, q):
+    # Nearest-rank percentile on an already sorted list
+    if not sorted_samples:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(sorted_samples)), 1)
+    return sorted_samples[rank - 1]
+
+def summarize(samples_ns):
+    samples_ms = sorted(s / 1e6 for s in samples_ns)
+    return {
+        "iterations": len(samples_ms),
+        "median_ms": round(statistics.median(samples_ms), 4),
+        "p95_ms": round(percentile(samples_ms, 95), 4),
+        "mean_ms": round(statistics.fmean(samples_ms), 4),
+        "min_ms": round(samples_ms[0], 4),
+        "max_ms": round(samples_ms[-1], 4),
+        "stdev_ms": round(statistics.stdev(samples_ms), 4) if len(samples_ms) > 1 else 0.0
+    }
+
+def measure(fn, warmup=3, iterations=20):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        fn()
+        samples.append(time.perf_counter_ns() - start)
+    return summarize(samples)
+
+def measure_safely(fn, warmup=3, iterations=20):
+    # Parameter sweeps hit invalid combinations (e.g. no level left to rescale)
+    try:
+        return measure(fn, warmup, iterations)
+    except Exception as e:
+        return {"error": str(e)}
+
+# --- Memory ---
+def peak_rss_mb():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KB on Linux and bytes on macOS
+        return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 2)
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 2)
+    return None
+
+# --- Results and baselines ---
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    }
+
+def write_results(path, results):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[✓] Benchmark results written to {path}")
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+def compare_to_baseline(results, baseline, threshold=0.10, metric="median_ms"):
+    # Flags every case/op whose metric grew by more than `threshold` over the baseline
+    regressions = []
+    for case_id, case in results["cases"].items():
+        base_case = baseline.get("cases", {}).get(case_id)
+        if not base_case:
+            continue
+        for op, stats in case["ops"].items():
+            base_stats = base_case["ops"].get(op, {})
+            if metric not in stats or metric not in base_stats or base_stats[metric] <= 0:
+                continue
+            change = stats[metric] / base_stats[metric] - 1
+            if change > threshold:
+                regressions.append({
+                    "case": case_id,
+                    "op": op,
+                    "baseline": base_stats[metric],
+                    "current": stats[metric],
+                    "change_pct": round(change * 100, 1)
+                })
+    return regressions
+
+def unmatched_cases(results, baseline):
+    # Cases with no counterpart in the baseline are not compared at all
+    return [case_id for case_id in results["cases"] if case_id not in baseline.get("cases", {})]
+
+def environment_changes(results, baseline, keys=("machine", "cpu_count", "python", "tenseal")):
+    # Timings only compare across like environments; names the fields that differ
+    current, base = results.get("environment", {}), baseline.get("environment", {})
+    return {key: (base.get(key), current.get(key)) for key in keys if base.get(key) != current.get(key)}
+
+def check_baseline(results, baseline):
+    # Warns about unmatched cases and a different environment; False if nothing is comparable
+    unmatched = unmatched_cases(results, baseline)
+    if unmatched:
+        print(f"[⚠️] {len(unmatched)} case(s) missing from the baseline, not compared: {', '.join(unmatched)}")
+    for key, (base, current) in environment_changes(results, baseline).items():
+        print(f"[⚠️] Baseline {key} was {base}, this run {current}; timings may not be comparable")
+    if results["cases"] and len(unmatched) == len(results["cases"]):
+        print("[❌] No case matches the baseline; regenerate it with the same sweep")
+        return False
+    return True
+
+def print_regressions(regressions, threshold):
+    if not regressions:
+        print(f"[✅] No regressions above {threshold:.0%} against the baseline")
+        return
+    print(f"[❌] {len(regressions)} regression(s) above {threshold:.0%}:")
+    for r in regressions:
+        print(f" - {r['case']} / {r['op']}: {r['baseline']}ms -> {r['current']}ms (+{r['change_pct']}%)")
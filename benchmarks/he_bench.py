@@ -0,0 +1,125 @@
+# benchmarks/he_bench.py
+# Offline HE benchmark sweep. Run from the repo root:
+#   python -m benchmarks.he_bench --poly 8192 16384 --lengths 1024 4096 --output bench_results.json
+#   python -m benchmarks.he_bench --poly 8192 16384 --lengths 1024 4096 --baseline benchmarks/baseline.json
+#     (exit code 1 on regression; the committed baseline.json holds that sweep)
+import argparse
+import itertools
+import sys
+
+import numpy as np
+import tenseal as ts
+
+from benchmarks import harness
+from seal_backend import context_store, encryptor
+
+OPS = ("context_create", "keygen_relin", "keygen_galois", "encrypt", "serialize",
+       "deserialize", "add", "mul", "rotate_sum", "decrypt")
+
+def case_id(params, length):
+    coeff = "-".join(str(b) for b in params["coeff_mod_bit_sizes"])
+    scale_bits = int(np.log2(params["global_scale"]))
+    return f"n{params['poly_modulus_degree']}_q{coeff}_s{scale_bits}_len{length}"
+
+def bench_case(params, length, ops, warmup, iterations):
+    measure = lambda fn, n=iterations: harness.measure_safely(fn, warmup, n)
+    # Key generation gets far slower with the ring size, so it is sampled less
+    heavy_iterations = max(3, iterations // 5)
+    results = {}
+
+    if "context_create" in ops:
+        results["context_create"] = measure(lambda: context_store.build_context(params))
+    context = context_store.build_context(params)
+    if "keygen_relin" in ops:
+        results["keygen_relin"] = measure(context.generate_relin_keys, heavy_iterations)
+    if "keygen_galois" in ops:
+        results["keygen_galois"] = measure(context.generate_galois_keys, heavy_iterations)
+    context_store.ensure_relin_keys(context)
+    context_store.ensure_galois_keys(context)
+
+    slot_count = params["poly_modulus_degree"] // 2
+    data = np.random.default_rng(0).uniform(0, 100, length)
+    if "encrypt" in ops:
+        results["encrypt"] = measure(lambda: encryptor.encrypt_chunked(context, data, slot_count, workers=1))
+
+    chunks = encryptor.encrypt_chunked(context, data, slot_count, workers=1)
+    serialized = chunks[0]["ciphertext"]
+    vec = ts.ckks_vector_from(context, serialized)
+    timed_ops = {
+        "serialize": vec.serialize,
+        "deserialize": lambda: ts.ckks_vector_from(context, serialized),
+        "add": lambda: vec + vec,
+        "mul": lambda: vec * vec,
+        "rotate_sum": vec.sum,  # log-depth rotate-and-add
+        "decrypt": vec.decrypt
+    }
+    for op, fn in timed_ops.items():
+        if op in ops:
+            results[op] = measure(fn)
+
+    return {
+        "params": params,
+        "length": length,
+        "chunks": len(chunks),
+        "ops": results,
+        "ciphertext_bytes": sum(len(chunk["ciphertext"]) for chunk in chunks),
+        "context_bytes": len(context.serialize(save_secret_key=False)),
+        "peak_rss_mb": harness.peak_rss_mb()
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep CKKS parameters and time HE operations")
+    parser.add_argument("--poly", type=int, nargs="+", default=[8192], help="poly_modulus_degree values")
+    parser.add_argument("--coeff", nargs="+", default=["60,40,40,60"],
+                        help="coeff_mod_bit_sizes chains, comma-separated")
+    parser.add_argument("--scale-bits", type=int, nargs="+", default=[40], help="log2 of the global scale")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[4096], help="input vector lengths")
+    parser.add_argument("--ops", nargs="+", default=list(OPS), choices=OPS)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before flagging (0.10 = 10%%)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {"environment": harness.environment(), "cases": {}}
+    results["environment"]["tenseal"] = getattr(ts, "__version__", "unknown")
+
+    for poly, coeff, scale_bits, length in itertools.product(args.poly, args.coeff, args.scale_bits, args.lengths):
+        params = {
+            "scheme": "CKKS",
+            "poly_modulus_degree": poly,
+            "coeff_mod_bit_sizes": [int(b) for b in coeff.split(",")],
+            "global_scale": 2 ** scale_bits
+        }
+        name = case_id(params, length)
+        try:
+            context_store.build_context(params)
+        except ValueError as e:
+            # SEAL rejects chains that are too large for the ring at 128-bit security
+            print(f"[i] Skipping {name}: {e}")
+            continue
+
+        print(f"[...] Benchmarking {name}")
+        case = bench_case(params, length, set(args.ops), args.warmup, args.iterations)
+        results["cases"][name] = case
+        for op, stats in case["ops"].items():
+            summary = stats.get("error") or f"median {stats['median_ms']}ms, p95 {stats['p95_ms']}ms"
+            print(f"   {op:<15} {summary}")
+        print(f"   ciphertext {case['ciphertext_bytes']} bytes, context {case['context_bytes']} bytes, peak RSS {case['peak_rss_mb']} MB")
+
+    harness.write_results(args.output, results)
+
+    if args.baseline:
+        baseline = harness.load_results(args.baseline)
+        if not harness.check_baseline(results, baseline):
+            return 1
+        regressions = harness.compare_to_baseline(results, baseline, args.threshold)
+        harness.print_regressions(regressions, args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
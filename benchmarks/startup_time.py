@@ -0,0 +1,62 @@
+# benchmarks/startup_time.py
+# Times `python main.py --startup-time` in fresh interpreters, for CI. Run from the repo root:
+#   python -m benchmarks.startup_time --iterations 10 --budget-ms 500
+# Exits 1 if the median wall time exceeds the budget or a heavy module is imported at startup.
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from benchmarks import harness
+
+def run_once(script="main.py"):
+    start = time.perf_counter_ns()
+    completed = subprocess.run(
+        [sys.executable, script, "--startup-time"], capture_output=True, text=True, check=True
+    )
+    wall_ns = time.perf_counter_ns() - start
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    return wall_ns, report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure main.py import and startup time")
+    parser.add_argument("--script", default="main.py")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, help="fail if the median startup exceeds this")
+    parser.add_argument("--output", help="write the summary as JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    run_once(args.script)  # warm the filesystem and bytecode caches
+
+    wall_samples, import_samples, heavy = [], [], set()
+    for _ in range(args.iterations):
+        wall_ns, report = run_once(args.script)
+        wall_samples.append(wall_ns)
+        import_samples.append(int(report["import_s"] * 1e9))
+        heavy.update(report["heavy_modules_loaded"])
+
+    results = {
+        "environment": harness.environment(),
+        "startup": harness.summarize(wall_samples),
+        "import": harness.summarize(import_samples),
+        "heavy_modules_loaded": sorted(heavy)
+    }
+    print(f"[i] Startup (process wall): median {results['startup']['median_ms']}ms, p95 {results['startup']['p95_ms']}ms")
+    print(f"[i] main.py imports: median {results['import']['median_ms']}ms")
+    if args.output:
+        harness.write_results(args.output, results)
+
+    failed = False
+    if heavy:
+        print(f"[✗] Heavy modules imported at startup: {', '.join(sorted(heavy))}")
+        failed = True
+    if args.budget_ms is not None and results["startup"]["median_ms"] > args.budget_ms:
+        print(f"[✗] Median startup {results['startup']['median_ms']}ms exceeds budget {args.budget_ms}ms")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,8 @@
-import boto3
+import hashlib
+from analytics.result_logger import tracer
+from cloud import storage
 
 def upload_to_s3(bucket, key, data, binary=False):
-    s3 = boto3.client("s3", region_name="us-east-1")
-
     if isinstance(data, str) and not binary:
         body = data.encode("utf-8")
     elif isinstance(data, bytes) or binary:
@@ -10,5 +10,31 @@ def upload_to_s3(bucket, key, data, binary=False):
     else:
         raise TypeError("Unsupported data type for upload")
 
-    s3.put_object(Bucket=bucket, Key=key, Body=body)
+    with tracer.span("put_s3", bytes_processed=len(body)):
+        storage.put_s3(bucket, key, body)
     print(f"[✓] Uploaded encrypted data to S3 bucket '{bucket}' as '{key}'")
+
+def object_exists(bucket, key):
+    from botocore.exceptions import ClientError
+    s3 = storage.get_s3_client()
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+        return True
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+
+def content_addressed_key(data, prefix="", suffix=".bin"):
+    return f"{prefix}{hashlib.sha256(data).hexdigest()}{suffix}"
+
+def upload_if_absent(bucket, data, prefix="", suffix=".bin"):
+    # Identical bytes map to the same key, so a HEAD is enough to skip the PUT
+    key = content_addressed_key(data, prefix, suffix)
+    with tracer.span("head_s3"):
+        exists = object_exists(bucket, key)
+    if exists:
+        print(f"[i] S3 object '{key}' already exists in '{bucket}', skipping upload")
+        return key, False
+    upload_to_s3(bucket, key, data, binary=True)
+    return key, True
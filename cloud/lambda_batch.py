@@ -0,0 +1,80 @@
+# cloud/lambda_batch.py
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from seal_backend import container
+
+# Shared by the client (main.py) and the handler (app.py)
+KEY_WIDTH = 5
+
+def chunk_key(prefix, index, suffix="", width=KEY_WIDTH):
+    return f"{prefix}{index:0{width}d}{suffix}"
+
+def expand_payload_keys(event):
+    # Accepts a single key, an explicit list, a contiguous key range, or chunk ranges
+    # inside containers (seal_backend/container.py) as "<container key>#<position>" refs
+    if event.get("encrypted_payload_keys"):
+        return list(event["encrypted_payload_keys"])
+    if event.get("encrypted_container_ranges"):
+        return [
+            container.chunk_ref(r["key"], i)
+            for r in event["encrypted_container_ranges"]
+            for i in range(r["start"], r["end"])
+        ]
+    key_range = event.get("encrypted_payload_key_range")
+    if key_range:
+        return [
+            chunk_key(key_range["prefix"], i, key_range.get("suffix", ""), key_range.get("width", KEY_WIDTH))
+            for i in range(key_range["start"], key_range["end"])
+        ]
+    if event.get("encrypted_payload_key"):
+        return [event["encrypted_payload_key"]]
+    return []
+
+def make_batch_events(base_event, prefix, suffix, chunk_count, batch_size):
+    events = []
+    for start in range(0, chunk_count, batch_size):
+        event = dict(base_event)
+        event["encrypted_payload_key_range"] = {
+            "prefix": prefix,
+            "suffix": suffix,
+            "start": start,
+            "end": min(start + batch_size, chunk_count),
+            "width": KEY_WIDTH
+        }
+        events.append(event)
+    return events
+
+def container_ranges(refs):
+    # Collapses container chunk refs into [{key, start, end}] runs of consecutive positions
+    ranges = []
+    for ref in refs:
+        key, position = container.parse_chunk_ref(ref)
+        if ranges and ranges[-1]["key"] == key and ranges[-1]["end"] == position:
+            ranges[-1]["end"] += 1
+        else:
+            ranges.append({"key": key, "start": position, "end": position + 1})
+    return ranges
+
+def make_container_events(base_event, refs, batch_size):
+    events = []
+    for start in range(0, len(refs), batch_size):
+        event = dict(base_event)
+        event["encrypted_container_ranges"] = container_ranges(refs[start:start + batch_size])
+        events.append(event)
+    return events
+
+def _invoke(lambda_client, function_name, event):
+    start = time.perf_counter()
+    response = lambda_client.invoke(
+        FunctionName=function_name,
+        InvocationType='RequestResponse',
+        Payload=json.dumps(event)
+    )
+    return response, round(time.perf_counter() - start, 4)
+
+def invoke_batches(lambda_client, function_name, events, concurrency=4):
+    # Returns [(lambda_response, seconds), ...] in the same order as events
+    with ThreadPoolExecutor(max_workers=max(min(concurrency, len(events)), 1)) as pool:
+        return list(pool.map(lambda event: _invoke(lambda_client, function_name, event), events))
@@ -0,0 +1,138 @@
+# cloud/multipart_upload.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cloud import storage
+
+MB = 1024 * 1024
+DEFAULT_PART_SIZE = int(os.environ.get("UPLOAD_PART_SIZE_MB", "8")) * MB  # S3 minimum is 5 MB
+DEFAULT_CONCURRENCY = int(os.environ.get("UPLOAD_CONCURRENCY", "8"))
+DEFAULT_RETRIES = 3
+
+# --- Shared part scheduler ---
+def _iter_parts(source, part_size):
+    # Accepts bytes-like objects or any readable file object; part numbers start at 1
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for number, offset in enumerate(range(0, len(view), part_size), start=1):
+            yield number, bytes(view[offset:offset + part_size])
+        return
+    number = 1
+    while True:
+        chunk = source.read(part_size)
+        if not chunk:
+            return
+        yield number, chunk
+        number += 1
+
+def _with_retries(upload_part, number, chunk, retries):
+    for attempt in range(retries + 1):
+        try:
+            return upload_part(number, chunk)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = 0.5 * 2 ** attempt
+            print(f"[⚠️] Part {number} failed ({e}), retrying in {delay}s...")
+            time.sleep(delay)
+
+def _run_parts(source, part_size, concurrency, retries, upload_part, skip=()):
+    # At most 2 * concurrency parts are held in memory at once
+    buffers = threading.BoundedSemaphore(concurrency * 2)
+    futures = []
+    sent_bytes = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for number, chunk in _iter_parts(source, part_size):
+            if number in skip:
+                continue
+            buffers.acquire()
+            future = pool.submit(_with_retries, upload_part, number, chunk, retries)
+            future.add_done_callback(lambda _: buffers.release())
+            futures.append((number, future))
+            sent_bytes += len(chunk)
+        results = {number: future.result() for number, future in futures}
+    return results, sent_bytes
+
+def _report(target, sent_bytes, seconds, parts):
+    mb_per_s = (sent_bytes / MB) / seconds if seconds > 0 else 0.0
+    print(f"[✓] Uploaded {sent_bytes / MB:.2f} MB to {target} in {parts} part(s), {seconds:.2f}s ({mb_per_s:.2f} MB/s)")
+    return {"bytes": sent_bytes, "seconds": round(seconds, 4), "parts": parts, "mb_per_s": round(mb_per_s, 2)}
+
+# --- S3 multipart ---
+def multipart_upload_s3(bucket, key, source, part_size=DEFAULT_PART_SIZE, concurrency=DEFAULT_CONCURRENCY,
+                        retries=DEFAULT_RETRIES, upload_id=None, abort_on_failure=True):
+    # A failed upload is aborted so its parts are not left billed in the bucket; pass
+    # abort_on_failure=False to keep them and resume later with the printed upload_id
+    s3 = storage.get_s3_client()
+    done = {}
+    if upload_id:
+        # Resume: keep parts S3 already has for this upload
+        for page in s3.get_paginator("list_parts").paginate(Bucket=bucket, Key=key, UploadId=upload_id):
+            for part in page.get("Parts", []):
+                done[part["PartNumber"]] = part["ETag"]
+    else:
+        upload_id = s3.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+
+    def upload_part(number, chunk):
+        return s3.upload_part(
+            Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=chunk
+        )["ETag"]
+
+    start = time.perf_counter()
+    try:
+        etags, sent_bytes = _run_parts(source, part_size, concurrency, retries, upload_part, skip=done)
+    except Exception:
+        if not abort_on_failure:
+            print(f"[✗] Multipart upload of '{key}' failed; resume with upload_id='{upload_id}'")
+            raise
+        print(f"[✗] Multipart upload of '{key}' failed; aborting upload_id='{upload_id}'")
+        try:
+            abort_multipart_upload_s3(bucket, key, upload_id)
+        except Exception as e:
+            print(f"[⚠️] Could not abort upload_id='{upload_id}': {e}")
+        raise
+    etags.update(done)
+
+    s3.complete_multipart_upload(
+        Bucket=bucket,
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={"Parts": [{"PartNumber": n, "ETag": etags[n]} for n in sorted(etags)]}
+    )
+    return _report(f"s3://{bucket}/{key}", sent_bytes, time.perf_counter() - start, len(etags))
+
+def abort_multipart_upload_s3(bucket, key, upload_id):
+    storage.get_s3_client().abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+
+# --- Azure staged blocks ---
+def _block_id(number):
+    # Block ids must all have the same length; the SDK base64-encodes them
+    return f"{number:08d}"
+
+def staged_upload_blob(connection_string, container_name, blob_name, source, part_size=DEFAULT_PART_SIZE,
+                       concurrency=DEFAULT_CONCURRENCY, retries=DEFAULT_RETRIES, resume=False):
+    storage.ensure_container(connection_string, container_name)
+    blob_client = storage.get_blob_service_client(connection_string).get_blob_client(
+        container=container_name, blob=blob_name
+    )
+    done = {}
+    if resume:
+        _, uncommitted = blob_client.get_block_list("uncommitted")
+        done = {int(block.id): block.id for block in uncommitted}
+
+    def upload_part(number, chunk):
+        blob_client.stage_block(_block_id(number), chunk)
+        return _block_id(number)
+
+    start = time.perf_counter()
+    try:
+        block_ids, sent_bytes = _run_parts(source, part_size, concurrency, retries, upload_part, skip=done)
+    except Exception:
+        print(f"[✗] Staged upload of '{blob_name}' failed; rerun with resume=True to keep staged blocks")
+        raise
+    block_ids.update(done)
+
+    blob_client.commit_block_list([block_ids[n] for n in sorted(block_ids)])
+    return _report(f"azure://{container_name}/{blob_name}", sent_bytes, time.perf_counter() - start, len(block_ids))
@@ -0,0 +1,176 @@
+# cloud/storage.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from analytics.result_logger import span_seconds, tracer
+
+# --- Endpoints (override to point at moto/MinIO and Azurite locally) ---
+AWS_REGION = os.environ.get("AWS_REGION", "us-east-1")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL")
+MAX_POOL_CONNECTIONS = int(os.environ.get("STORAGE_MAX_POOL_CONNECTIONS", "32"))
+MULTIPART_THRESHOLD = int(os.environ.get("MULTIPART_THRESHOLD_MB", "64")) * 1024 * 1024
+
+# One client per endpoint per process; boto3 clients and BlobServiceClient are thread-safe.
+# The SDKs are imported on first use so importing this module stays cheap.
+_lock = threading.Lock()
+_s3_clients = {}
+_aws_clients = {}
+_blob_service_clients = {}
+_ensured_containers = set()
+
+def get_s3_client(region=AWS_REGION, endpoint_url=S3_ENDPOINT_URL):
+    key = (region, endpoint_url)
+    with _lock:
+        if key not in _s3_clients:
+            import boto3
+            from botocore.config import Config
+            _s3_clients[key] = boto3.client(
+                "s3",
+                region_name=region,
+                endpoint_url=endpoint_url,
+                config=Config(
+                    max_pool_connections=MAX_POOL_CONNECTIONS,
+                    retries={"max_attempts": 5, "mode": "standard"}
+                )
+            )
+        return _s3_clients[key]
+
+def get_client(service, region=AWS_REGION):
+    # Other AWS services (kms, lambda) share the same lazy, per-process cache
+    key = (service, region)
+    with _lock:
+        if key not in _aws_clients:
+            import boto3
+            _aws_clients[key] = boto3.client(service, region_name=region)
+        return _aws_clients[key]
+
+def get_blob_service_client(connection_string):
+    with _lock:
+        if connection_string not in _blob_service_clients:
+            from azure.storage.blob import BlobServiceClient
+            _blob_service_clients[connection_string] = BlobServiceClient.from_connection_string(connection_string)
+        return _blob_service_clients[connection_string]
+
+def ensure_container(connection_string, container_name):
+    # Checked once per process instead of on every upload
+    key = (connection_string, container_name)
+    if key in _ensured_containers:
+        return
+    from azure.core.exceptions import ResourceExistsError
+    service = get_blob_service_client(connection_string)
+    try:
+        service.create_container(container_name)
+        print(f"[✓] Created container: {container_name}")
+    except ResourceExistsError:
+        print(f"[i] Container '{container_name}' already exists.")
+    with _lock:
+        _ensured_containers.add(key)
+
+def reset_clients():
+    with _lock:
+        _s3_clients.clear()
+        _aws_clients.clear()
+        _blob_service_clients.clear()
+        _ensured_containers.clear()
+
+def put_s3(bucket, key, body):
+    get_s3_client().put_object(Bucket=bucket, Key=key, Body=body)
+
+def put_blob(connection_string, container_name, blob_name, body):
+    ensure_container(connection_string, container_name)
+    blob_client = get_blob_service_client(connection_string).get_blob_client(
+        container=container_name, blob=blob_name
+    )
+    blob_client.upload_blob(body, overwrite=True)
+
+# --- Concurrent multi-cloud fan-out ---
+# targets: {label: ("s3", bucket) | ("azure", (connection_string, container))}
+# A body is either bytes or the path of a spooled file; a path is opened separately by each
+# target and streamed from disk, so a large object is never held in memory whole.
+def _is_path(body):
+    return isinstance(body, (str, os.PathLike))
+
+def body_size(body):
+    return os.path.getsize(body) if _is_path(body) else len(body)
+
+def _upload_target(target, key, body, parent_span=None):
+    kind, location = target
+    with tracer.span(f"upload_{kind}", bytes_processed=body_size(body), parent=parent_span) as upload_span:
+        if _is_path(body):
+            with open(body, "rb") as f:
+                _upload_body(kind, location, key, f, body_size(body))
+        else:
+            _upload_body(kind, location, key, body, len(body))
+    return span_seconds(upload_span)
+
+def _upload_body(kind, location, key, body, size):
+    # body: bytes or a readable file object positioned at the start
+    if size >= MULTIPART_THRESHOLD:
+        # Large bodies go through parallel S3 parts / Azure staged blocks
+        from cloud import multipart_upload
+        if kind == "s3":
+            multipart_upload.multipart_upload_s3(location, key, body)
+        elif kind == "azure":
+            connection_string, container_name = location
+            multipart_upload.staged_upload_blob(connection_string, container_name, key, body)
+        else:
+            raise ValueError(f"Unknown storage target: {kind}")
+    elif kind == "s3":
+        put_s3(location, key, body)
+    elif kind == "azure":
+        connection_string, container_name = location
+        put_blob(connection_string, container_name, key, body)
+    else:
+        raise ValueError(f"Unknown storage target: {kind}")
+
+def upload_to_all(targets, key, body, verbose=True):
+    results = {}
+    start = time.perf_counter()
+    parent_span = tracer.current()  # worker threads do not inherit the span stack
+    with ThreadPoolExecutor(max_workers=max(len(targets), 1)) as pool:
+        futures = {label: pool.submit(_upload_target, target, key, body, parent_span) for label, target in targets.items()}
+        for label, future in futures.items():
+            try:
+                results[label] = {"ok": True, "seconds": future.result()}
+                if verbose:
+                    print(f"[✓] Uploaded '{key}' to {label} in {results[label]['seconds']}s")
+            except Exception as e:
+                results[label] = {"ok": False, "error": str(e)}
+                print(f"[✗] Upload of '{key}' to {label} failed: {e}")
+    return results, round(time.perf_counter() - start, 4)
+
+def upload_many(targets, items, max_workers=8):
+    # items: iterable of (key, body), consumed lazily; every item is fanned out to every target.
+    # At most 2 * max_workers items are in flight, so a generator of bodies is never drained ahead.
+    start = time.perf_counter()
+    parent_span = tracer.current()
+    in_flight = threading.BoundedSemaphore(max_workers * 2)
+
+    def upload_item(item):
+        with tracer.span("upload_object", bytes_processed=body_size(item[1]), parent=parent_span):
+            return upload_to_all(targets, item[0], item[1], verbose=False)[0]
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for item in items:
+            in_flight.acquire()
+            future = pool.submit(upload_item, item)
+            future.add_done_callback(lambda _: in_flight.release())
+            futures.append(future)
+        per_item = [future.result() for future in futures]
+    return summarize_uploads(targets, per_item), round(time.perf_counter() - start, 4)
+
+def summarize_uploads(targets, per_item):
+    # per_item: upload_to_all results, one per object -> {label: {ok, seconds, error}}
+    totals = {}
+    for label in targets:
+        errors = [r[label]["error"] for r in per_item if not r[label]["ok"]]
+        totals[label] = {
+            "ok": not errors,
+            "seconds": round(sum(r[label].get("seconds", 0) for r in per_item), 4),
+            "error": errors[0] if errors else None
+        }
+        print(f"[{'✓' if not errors else '✗'}] Uploaded {len(per_item) - len(errors)}/{len(per_item)} object(s) to {label}")
+    return totals
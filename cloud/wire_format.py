@@ -0,0 +1,61 @@
+# cloud/wire_format.py
+import base64
+import struct
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; SEAL already compresses its own serialization
+    zstandard = None
+
+# Frame: MAGIC | codec id (1 byte) | raw length (8 bytes, big endian) | body
+MAGIC = b"HEW1"
+HEADER = struct.Struct(">4sBQ")
+CODECS = {"seal": 0, "zstd": 1}
+CODEC_NAMES = {v: k for k, v in CODECS.items()}
+
+FORMAT_BINARY = "binary"
+FORMAT_BASE64 = "base64"
+
+def supported_codecs():
+    return [name for name in CODECS if name != "zstd" or zstandard is not None]
+
+def encode_payload(data, codec="seal", payload_format=FORMAT_BINARY):
+    if payload_format == FORMAT_BASE64:
+        # Legacy text transport: plain base64 of the SEAL bytes
+        return base64.b64encode(data)
+
+    if codec == "zstd" and zstandard is None:
+        print("[i] zstandard not installed, falling back to SEAL-native compression")
+        codec = "seal"
+    if codec not in CODECS:
+        raise ValueError(f"Unsupported codec: {codec}")
+
+    body = zstandard.ZstdCompressor(level=3).compress(data) if codec == "zstd" else data
+    return HEADER.pack(MAGIC, CODECS[codec], len(data)) + body
+
+def detect_format(payload):
+    return FORMAT_BINARY if payload[:len(MAGIC)] == MAGIC else FORMAT_BASE64
+
+def decode_payload(payload, payload_format=None):
+    payload_format = payload_format or detect_format(payload)
+    if payload_format == FORMAT_BASE64:
+        return base64.b64decode(payload)
+
+    magic, codec_id, raw_length = HEADER.unpack_from(payload)
+    if magic != MAGIC:
+        raise ValueError("Payload is not in the binary wire format")
+    codec = CODEC_NAMES.get(codec_id)
+    body = memoryview(payload)[HEADER.size:]
+
+    if codec == "seal":
+        data = bytes(body)
+    elif codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Payload is zstd-compressed but zstandard is not installed")
+        data = zstandard.ZstdDecompressor().decompress(body, max_output_size=raw_length)
+    else:
+        raise ValueError(f"Unknown codec id: {codec_id}")
+
+    if len(data) != raw_length:
+        raise ValueError(f"Payload length mismatch: expected {raw_length}, got {len(data)}")
+    return data
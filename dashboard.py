@@ -1,53 +1,125 @@
 import json
-import os  # <-- Add this line
-import base64
+import os
 import time
-import math
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
 
-# Load encryption metrics
-with open("encryption_metrics.json") as f:
-    metrics = json.load(f)
+from analytics import result_logger
 
-st.title("🔐 Secure Encryption Pipeline Dashboard")
+# Reads the append-only run history (analytics/result_logger.py). The parsed rows live in one
+# cached RunHistory per file, so a rerun only parses runs appended since the last one; the
+# summaries are cached per (file, offset, window) and only recomputed when new runs arrive.
+METRICS_PATH = "encryption_metrics.json"
+DECRYPTED_PATH = "decrypted_HE.json"
 
-# Metric table
-st.subheader("📊 Operation Time Metrics")
-df_metrics = pd.DataFrame(metrics.items(), columns=["Operation", "Time (s)"])
-st.dataframe(df_metrics.style.format({"Time (s)": "{:.4f}"}))
-
-# Bar chart - raw times
-st.subheader("📈 Execution Time by Operation")
-fig1, ax1 = plt.subplots(figsize=(10, 5))
-ax1.bar(df_metrics["Operation"], df_metrics["Time (s)"])
-ax1.set_xticklabels(df_metrics["Operation"], rotation=45, ha='right')
-ax1.set_ylabel("Time (seconds)")
-ax1.set_title("Individual Operation Execution Times")
-st.pyplot(fig1)
-
-# Grouped operations
-grouped = {
-    "HE Ops": metrics.get("he_encrypt", 0),
-    "AES Ops": metrics.get("aes_encrypt", 0) + metrics.get("aes_decrypt", 0),
-    "Upload Time": metrics.get("upload_s3_HE", 0) + metrics.get("upload_azure_HE", 0) + metrics.get("upload_s3_AES", 0),
-    "KMS Encryption": metrics.get("kms_encrypt_key", 0) + metrics.get("kms_encrypt_dummy_HE_key", 0),
-    "Lambda Compute": metrics.get("lambda_invoke", 0),
-    "Data Prep": metrics.get("load_prepare_data", 0)
+GROUPS = {
+    "HE Ops": ("create_context", "he_pipeline", "he_encrypt", "keygen_galois"),
+    "AES Ops": ("aes_encrypt", "aes_decrypt"),
+    "Upload Time": ("upload_HE", "upload_s3_HE", "upload_azure_HE", "upload_s3_AES", "upload_s3_context",
+                    "upload_s3_eval_context", "upload_s3_manifest"),
+    "KMS Encryption": ("kms_encrypt_key", "kms_encrypt_dummy_HE_key"),
+    "Lambda Compute": ("lambda_invoke", "lambda_aggregate"),
+    "Data Prep": ("load_prepare_data",)
 }
 
-st.subheader("📦 Grouped Operation Time Breakdown")
-df_grouped = pd.DataFrame(grouped.items(), columns=["Group", "Time (s)"])
-fig2, ax2 = plt.subplots(figsize=(8, 4))
-ax2.bar(df_grouped["Group"], df_grouped["Time (s)"], color="skyblue")
-ax2.set_ylabel("Total Time (s)")
-ax2.set_title("Grouped Processing Time")
-st.pyplot(fig2)
+@st.cache_resource
+def get_history(path):
+    return result_logger.RunHistory(path)
+
+@st.cache_data(max_entries=8)
+def stage_summary(path, offset, window):
+    rows = get_history(path).rows[-window:]
+    summary = result_logger.run_percentiles(rows)
+    if not summary:
+        # Empty or just-truncated history: no stage columns to sort by
+        return pd.DataFrame(index=pd.Index([], name="Stage"))
+    return pd.DataFrame.from_dict(summary, orient="index").rename_axis("Stage").sort_values("p90_s", ascending=False)
+
+@st.cache_data(max_entries=32)
+def stage_trend(path, offset, window, stage, max_points):
+    rows = get_history(path).rows[-window:]
+    points = [(row["started_at"], row["seconds"][stage]) for row in rows if stage in row["seconds"]]
+    buckets = result_logger.downsample(points, max_points)
+    df = pd.DataFrame(buckets, columns=["Run start", "Median (s)", "Max (s)"])
+    df["Run start"] = pd.to_datetime(df["Run start"], unit="s")
+    return df.set_index("Run start")
+
+def run_label(row):
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["started_at"] or 0))
+    return f"{started} · {row['run_id'][:8]}"
+
+def latest_metrics(rows):
+    # Top-level stage times of the last run; falls back to the single-run snapshot
+    if rows:
+        return {path: seconds for path, seconds in rows[-1]["seconds"].items() if "/" not in path}
+    if os.path.exists(METRICS_PATH):
+        with open(METRICS_PATH) as f:
+            return json.load(f)
+    return {}
+
+st.title("🔐 Secure Encryption Pipeline Dashboard")
+
+with st.sidebar:
+    history_path = st.text_input("Run history", result_logger.HISTORY_PATH)
+    window = st.number_input("Runs to analyse (latest)", min_value=2, value=1000, step=100)
+    max_points = st.slider("Points per trend chart", 50, 2000, 500, step=50)
+    threshold = st.slider("Regression threshold (%)", 1, 100, 10) / 100
+    st.button("Refresh")
+
+history = get_history(history_path)
+new_runs = history.refresh()
+rows = history.rows
+st.caption(f"{len(rows)} run(s) in {history_path}" + (f" · {new_runs} new" if new_runs else ""))
+
+# Latest run
+metrics = latest_metrics(rows)
+if metrics:
+    st.subheader("📊 Latest Run")
+    df_metrics = pd.DataFrame(metrics.items(), columns=["Operation", "Time (s)"]).set_index("Operation")
+    st.bar_chart(df_metrics)
+
+    st.subheader("📦 Grouped Operation Time Breakdown")
+    grouped = {group: sum(metrics.get(name, 0) for name in names) for group, names in GROUPS.items()}
+    st.bar_chart(pd.DataFrame(grouped.items(), columns=["Group", "Time (s)"]).set_index("Group"))
+else:
+    st.info("No runs recorded yet; run `python main.py` to append one to the history.")
+
+if not history.rows:
+    st.info(f"No run history in {history_path} yet.")
+else:
+    window = min(int(window), len(rows))
+
+    # Percentiles and throughput across runs
+    st.subheader(f"⏱ Stage Latency over the last {window} run(s)")
+    summary = stage_summary(history_path, history.offset, window)
+    if summary.empty:
+        st.info("No stage timings recorded in these runs.")
+    else:
+        st.dataframe(summary.style.format(precision=4, na_rep="–"))
+
+        # Trend for one stage, downsampled so large histories stay cheap to draw
+        stage = st.selectbox("Stage trend", list(summary.index))
+        st.line_chart(stage_trend(history_path, history.offset, window, stage, max_points))
+
+    # Run-to-run comparison
+    st.subheader("🔍 Compare Runs")
+    candidates = rows[-window:][::-1]
+    labels = [run_label(row) for row in candidates]
+    col_base, col_new = st.columns(2)
+    new_index = col_new.selectbox("Run", range(len(candidates)), format_func=labels.__getitem__, index=0)
+    base_index = col_base.selectbox("Baseline", range(len(candidates)), format_func=labels.__getitem__,
+                                    index=min(1, len(candidates) - 1))
+    comparison = pd.DataFrame(result_logger.compare_runs(candidates[base_index], candidates[new_index], threshold))
+    regressions = int(comparison["regression"].sum()) if not comparison.empty else 0
+    if regressions:
+        st.error(f"{regressions} stage(s) slower by more than {threshold:.0%}")
+    else:
+        st.success(f"No stage slower by more than {threshold:.0%}")
+    st.dataframe(comparison.style.format({"change": "{:+.1%}"}, na_rep="–", precision=4))
 
 # Optional: Load decrypted HE result
-if os.path.exists("decrypted_HE.json"):
-    with open("decrypted_HE.json") as f:
+if os.path.exists(DECRYPTED_PATH):
+    with open(DECRYPTED_PATH) as f:
         decrypted_data = json.load(f)
 
     st.subheader("🔓 Sample Decrypted HE Output")
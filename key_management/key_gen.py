@@ -1,4 +1,139 @@
-from seal_backend.seal_context import create_context
+import hashlib
+import os
+import tempfile
 
-def generate_context_with_keys():
-    return create_context()
+from seal_backend import context_store
+from seal_backend.seal_context import BFV_PARAMS, create_context
+
+def generate_context_with_keys(params=BFV_PARAMS):
+    context = create_context(params)
+    context_store.ensure_galois_keys(context, params)
+    context_store.ensure_relin_keys(context, params)
+    return context
+
+# --- Selective Galois keys ---
+# context.generate_galois_keys() builds keys for every +/- power-of-two rotation. A workload
+# that only calls sum() needs the positive steps (analysis_runner.rotation_steps), so the
+# evaluation context is built with SEAL's KeyGenerator for just those steps. TenSEAL only
+# loads stored Galois keys into public contexts, so the result is a public context
+# (public key, relin keys, selected Galois keys) for the server-side aggregations.
+
+def _read_varint(data, i):
+    shift = value = 0
+    while True:
+        byte = data[i]
+        i += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, i
+        shift += 7
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        out.append((value & 0x7F) | (0x80 if value > 0x7F else 0))
+        value >>= 7
+        if not value:
+            return bytes(out)
+
+def _proto_fields(data):
+    # Minimal protobuf reader for TenSEAL's context message: [(field, wire type, value)]
+    fields, i = [], 0
+    while i < len(data):
+        key, i = _read_varint(data, i)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, i = _read_varint(data, i)
+        elif wire_type == 1:
+            value, i = data[i:i + 8], i + 8
+        elif wire_type == 2:
+            length, i = _read_varint(data, i)
+            value, i = data[i:i + length], i + length
+        elif wire_type == 5:
+            value, i = data[i:i + 4], i + 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+        fields.append((field, wire_type, value))
+    return fields
+
+def _proto_encode(fields):
+    out = bytearray()
+    for field, wire_type, value in fields:
+        out += _varint(field << 3 | wire_type)
+        if wire_type == 0:
+            out += _varint(value)
+        elif wire_type == 2:
+            out += _varint(len(value)) + value
+        else:
+            out += value
+    return bytes(out)
+
+# TenSEALContextProto: 1 encryption parameters, 2 public part, 3 private part;
+# TenSEALPublicProto field 5 holds serialized Galois keys, TenSEALPrivateProto field 1 the secret key
+_PARMS_FIELD, _PUBLIC_FIELD, _PRIVATE_FIELD = 1, 2, 3
+_GALOIS_FIELD, _SECRET_KEY_FIELD = 5, 1
+
+# sealapi objects only (de)serialize through file paths
+def _seal_load(obj, data, tmp_dir, *args):
+    path = os.path.join(tmp_dir, "seal.bin")
+    with open(path, "wb") as f:
+        f.write(data)
+    obj.load(*args, path)
+    return obj
+
+def _seal_save(obj, tmp_dir):
+    path = os.path.join(tmp_dir, "seal.bin")
+    obj.save(path)
+    with open(path, "rb") as f:
+        return f.read()
+
+def galois_keys_bytes(context, steps):
+    # Serialized SEAL Galois keys for exactly these rotation steps (needs the secret key)
+    from tenseal import sealapi
+    fields = {field: value for field, _, value in _proto_fields(context.serialize(save_secret_key=True))}
+    private = {field: value for field, _, value in _proto_fields(fields[_PRIVATE_FIELD])}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The scheme given here is replaced by the one in the serialized parameters
+        parms = _seal_load(sealapi.EncryptionParameters(sealapi.SCHEME_TYPE.CKKS), fields[_PARMS_FIELD], tmp_dir)
+        seal_context = sealapi.SEALContext(parms, True, sealapi.SEC_LEVEL_TYPE.NONE)
+        secret_key = _seal_load(sealapi.SecretKey(), private[_SECRET_KEY_FIELD], tmp_dir, seal_context)
+        elements = seal_context.key_context_data().galois_tool().get_elts_from_steps(list(steps))
+        return _seal_save(sealapi.KeyGenerator(seal_context, secret_key).create_galois_keys(elements), tmp_dir)
+
+def evaluation_context(context, steps=None, relin_keys=True):
+    # Public context bytes carrying only the Galois keys for `steps` (all keys if None)
+    if steps is None:
+        context_store.ensure_galois_keys(context)
+        return context.serialize(save_secret_key=False, save_galois_keys=True, save_relin_keys=relin_keys)
+    if relin_keys:
+        context_store.ensure_relin_keys(context)
+    public = context.serialize(save_secret_key=False, save_galois_keys=False, save_relin_keys=relin_keys)
+    if not steps:
+        return public
+    galois = galois_keys_bytes(context, steps)
+    fields = [
+        (field, wire_type, value + _proto_encode([(_GALOIS_FIELD, 2, galois)]) if field == _PUBLIC_FIELD else value)
+        for field, wire_type, value in _proto_fields(public)
+    ]
+    return _proto_encode(fields)
+
+def evaluation_context_path(context, steps, cache_dir=context_store.CACHE_DIR):
+    # Keyed by the context's public key and the step set, so a new context or workload misses
+    public = context.serialize(save_public_key=True, save_secret_key=False,
+                               save_galois_keys=False, save_relin_keys=False)
+    digest = hashlib.sha256(public + repr(sorted(steps)).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{digest}.eval")
+
+def load_or_create_evaluation_context(context, steps, cache_dir=context_store.CACHE_DIR):
+    # Returns (bytes, cache_hit); reusing the bytes keeps content-addressed uploads deduplicated
+    path = evaluation_context_path(context, steps, cache_dir)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read(), True
+    data = evaluation_context(context, steps)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return data, False
@@ -0,0 +1,122 @@
+# key_management/key_retrieval.py
+# Envelope encryption with cached data keys. One GenerateDataKey call yields a data key
+# that seals many payloads locally (AES-256-GCM) until it expires by age or use count;
+# each envelope carries the wrapped key, which is unwrapped lazily and cached on read.
+import hashlib
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from key_management import vault_config
+
+# Envelope: b"HEK1" | u16 wrapped key length | wrapped key | 12-byte nonce | AES-GCM ciphertext
+ENVELOPE_MAGIC = b"HEK1"
+NONCE_BYTES = 12
+
+class DataKey:
+    def __init__(self, plaintext, wrapped, key_id):
+        self.plaintext = plaintext
+        self.wrapped = wrapped
+        self.key_id = key_id
+        self.created_at = time.monotonic()
+        self.uses = 0
+
+    def usable(self, ttl, max_uses):
+        return time.monotonic() - self.created_at < ttl and self.uses < max_uses
+
+class KeyManager:
+    def __init__(self, key_id, backend=None, ttl=vault_config.DATA_KEY_TTL_SECONDS,
+                 max_uses=vault_config.DATA_KEY_MAX_USES, concurrency=vault_config.KMS_BATCH_CONCURRENCY):
+        self.key_id = key_id
+        self.backend = backend or vault_config.make_backend()
+        self.ttl = ttl
+        self.max_uses = max_uses
+        self.concurrency = concurrency
+        self._lock = threading.Lock()
+        self._active = None  # data key currently used for sealing
+        self._spare = []  # pre-generated keys (see prefetch)
+        self._unwrapped = {}  # sha256(wrapped key) -> DataKey
+        self.stats = {"generate_calls": 0, "decrypt_calls": 0, "key_reuses": 0, "unwrap_hits": 0}
+
+    # --- Data keys ---
+    def _generate(self):
+        plaintext, wrapped = self.backend.generate_data_key(self.key_id)
+        with self._lock:
+            self.stats["generate_calls"] += 1
+        return DataKey(plaintext, wrapped, self.key_id)
+
+    def prefetch(self, count):
+        # Generates several data keys concurrently ahead of a burst of sealing
+        with ThreadPoolExecutor(max_workers=max(min(self.concurrency, count), 1)) as pool:
+            keys = list(pool.map(lambda _: self._generate(), range(count)))
+        with self._lock:
+            self._spare.extend(keys)
+
+    def data_key(self):
+        # Returns the active data key, rotating it once its TTL or use budget runs out
+        with self._lock:
+            active = self._active
+            if active is not None and active.usable(self.ttl, self.max_uses):
+                active.uses += 1
+                self.stats["key_reuses"] += 1
+                return active
+            spare = self._spare.pop(0) if self._spare else None
+        key = spare or self._generate()
+        with self._lock:
+            key.uses += 1
+            self._active = key
+        return key
+
+    def unwrap(self, wrapped):
+        # Lazily decrypts a wrapped key; repeated envelopes under one key cost one KMS call
+        digest = hashlib.sha256(wrapped).digest()
+        with self._lock:
+            cached = self._unwrapped.get(digest)
+            if cached is not None and cached.usable(self.ttl, float("inf")):
+                self.stats["unwrap_hits"] += 1
+                return cached.plaintext
+        plaintext = self.backend.decrypt(wrapped, self.key_id)
+        with self._lock:
+            self.stats["decrypt_calls"] += 1
+            self._unwrapped[digest] = DataKey(plaintext, wrapped, self.key_id)
+        return plaintext
+
+    def unwrap_many(self, wrapped_keys):
+        # Deduplicates and unwraps concurrently; KMS has no batch decrypt
+        distinct = list(dict.fromkeys(wrapped_keys))
+        if distinct:
+            with ThreadPoolExecutor(max_workers=max(min(self.concurrency, len(distinct)), 1)) as pool:
+                list(pool.map(self.unwrap, distinct))
+        return [self.unwrap(wrapped) for wrapped in wrapped_keys]
+
+    def clear(self):
+        with self._lock:
+            self._active = None
+            self._spare.clear()
+            self._unwrapped.clear()
+
+    # --- Envelopes ---
+    def seal(self, plaintext, associated_data=None):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        key = self.data_key()
+        nonce = os.urandom(NONCE_BYTES)
+        ciphertext = AESGCM(key.plaintext).encrypt(nonce, plaintext, associated_data)
+        return ENVELOPE_MAGIC + struct.pack(">H", len(key.wrapped)) + key.wrapped + nonce + ciphertext
+
+    def open(self, envelope, associated_data=None):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        wrapped, nonce, ciphertext = parse_envelope(envelope)
+        return AESGCM(self.unwrap(wrapped)).decrypt(nonce, ciphertext, associated_data)
+
+    def open_many(self, envelopes, associated_data=None):
+        self.unwrap_many([parse_envelope(envelope)[0] for envelope in envelopes])
+        return [self.open(envelope, associated_data) for envelope in envelopes]
+
+def parse_envelope(envelope):
+    if envelope[:4] != ENVELOPE_MAGIC:
+        raise ValueError("Not a key envelope")
+    (wrapped_length,) = struct.unpack_from(">H", envelope, 4)
+    wrapped_end = 6 + wrapped_length
+    return envelope[6:wrapped_end], envelope[wrapped_end:wrapped_end + NONCE_BYTES], envelope[wrapped_end + NONCE_BYTES:]
@@ -0,0 +1,98 @@
+# key_management/vault_config.py
+# Key-management settings and the pluggable KMS backends used by key_retrieval.py.
+# "aws" talks to AWS KMS; "local" wraps keys under a master key on this machine and is
+# meant for tests and offline runs (HE_KMS_BACKEND=local).
+import os
+import struct
+
+KMS_BACKEND = os.environ.get("HE_KMS_BACKEND", "aws")
+KMS_REGION = os.environ.get("AWS_REGION", "us-east-1")
+DATA_KEY_SPEC = "AES_256"
+DATA_KEY_BYTES = 32
+# A plaintext data key is reused for at most this long / this many envelopes
+DATA_KEY_TTL_SECONDS = float(os.environ.get("HE_DATA_KEY_TTL_SECONDS", "300"))
+DATA_KEY_MAX_USES = int(os.environ.get("HE_DATA_KEY_MAX_USES", "10000"))
+# Concurrent KMS calls when unwrapping or pre-generating keys in a batch
+KMS_BATCH_CONCURRENCY = int(os.environ.get("HE_KMS_BATCH_CONCURRENCY", "8"))
+LOCAL_MASTER_KEY_PATH = os.environ.get("HE_LOCAL_MASTER_KEY", os.path.join(".he_cache", "local_kms_master.key"))
+
+class AwsKmsBackend:
+    def __init__(self, region=KMS_REGION):
+        from cloud import storage
+        self.client = storage.get_client("kms", region)
+
+    def generate_data_key(self, key_id, key_spec=DATA_KEY_SPEC):
+        # One round trip returns the key both in plaintext and wrapped under key_id
+        response = self.client.generate_data_key(KeyId=key_id, KeySpec=key_spec)
+        return response["Plaintext"], response["CiphertextBlob"]
+
+    def decrypt(self, wrapped_key, key_id=None):
+        kwargs = {"CiphertextBlob": wrapped_key}
+        if key_id:
+            kwargs["KeyId"] = key_id
+        return self.client.decrypt(**kwargs)["Plaintext"]
+
+class LocalKmsBackend:
+    # Wrapped key: b"LKMS" | u16 key id length | key id | 12-byte nonce | AES-GCM(data key)
+    MAGIC = b"LKMS"
+
+    def __init__(self, master_key=None, path=None):
+        if master_key is None and path:
+            master_key = self._load_or_create(path)
+        self.master_key = master_key or os.urandom(DATA_KEY_BYTES)
+        self.calls = {"generate_data_key": 0, "decrypt": 0}
+
+    @staticmethod
+    def _load_or_create(path):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Owner-only temp file, fully written, then hard-linked into place: linking fails if
+        # the key exists, so processes racing here all end up with the first one's key
+        key = os.urandom(DATA_KEY_BYTES)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(key)
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.link(tmp_path, path)
+            except FileExistsError:
+                with open(path, "rb") as f:
+                    return f.read()
+        finally:
+            os.remove(tmp_path)
+        return key
+
+    def generate_data_key(self, key_id, key_spec=DATA_KEY_SPEC):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        self.calls["generate_data_key"] += 1
+        plaintext = os.urandom(DATA_KEY_BYTES)
+        nonce = os.urandom(12)
+        key_id_bytes = key_id.encode("utf-8")
+        header = self.MAGIC + struct.pack(">H", len(key_id_bytes)) + key_id_bytes
+        wrapped = header + nonce + AESGCM(self.master_key).encrypt(nonce, plaintext, header)
+        return plaintext, wrapped
+
+    def decrypt(self, wrapped_key, key_id=None):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        self.calls["decrypt"] += 1
+        if wrapped_key[:4] != self.MAGIC:
+            raise ValueError("Not a locally wrapped data key")
+        (id_length,) = struct.unpack_from(">H", wrapped_key, 4)
+        header_length = 6 + id_length
+        wrapped_id = wrapped_key[6:header_length].decode("utf-8")
+        if key_id and wrapped_id != key_id:
+            raise ValueError(f"Data key was wrapped under '{wrapped_id}', not '{key_id}'")
+        nonce = wrapped_key[header_length:header_length + 12]
+        return AESGCM(self.master_key).decrypt(nonce, wrapped_key[header_length + 12:], wrapped_key[:header_length])
+
+BACKENDS = {"aws": AwsKmsBackend, "local": lambda: LocalKmsBackend(path=LOCAL_MASTER_KEY_PATH)}
+
+def make_backend(name=KMS_BACKEND):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown KMS backend '{name}'; choose from {sorted(BACKENDS)}")
+    return BACKENDS[name]()
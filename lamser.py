@@ -20,86 +20,42 @@ LAMBDA_ROLE_ARN = f"arn:aws:iam::{account_id}:role/{ROLE_NAME}"
 ecr_url = f"{account_id}.dkr.ecr.{AWS_REGION}.amazonaws.com/{ECR_REPO}"
 
 # --- Dockerfile Content ---
-dockerfile_content = """
-FROM public.ecr.aws/lambda/python:3.10
+dockerfile_content = r"""
+# --- Build stage: prebuilt wheels only, then strip what the handler never loads ---
+FROM public.ecr.aws/lambda/python:3.10 AS build
+
+RUN yum install -y binutils findutils && yum clean all
 
-# System dependencies
-RUN yum install -y gcc gcc-c++ python3-devel openssl-devel wget make tar gzip
+COPY requirements-lambda.txt /tmp/
+RUN pip install --no-cache-dir --only-binary=:all: --target /opt/deps -r /tmp/requirements-lambda.txt && \
+    find /opt/deps -depth -type d \( -name tests -o -name __pycache__ \) -exec rm -rf {} + && \
+    find /opt/deps -name "*.so*" -exec strip --strip-unneeded {} + && \
+    rm -rf /opt/deps/bin
 
-# Install CMake
-RUN wget https://github.com/Kitware/CMake/releases/download/v3.26.4/cmake-3.26.4-linux-x86_64.tar.gz && \
-    tar xzf cmake-3.26.4-linux-x86_64.tar.gz -C /usr/local --strip-components=1 && \
-    rm cmake-3.26.4-linux-x86_64.tar.gz
+# --- Runtime stage: base image + stripped dependencies + handler code, no build tooling ---
+FROM public.ecr.aws/lambda/python:3.10
 
-# 🔧 Install dependencies in correct order
-RUN pip install --upgrade pip && \
-    pip install numpy && \
-    pip install pybind11 tenseal --no-cache-dir
+COPY --from=build /opt/deps ${LAMBDA_TASK_ROOT}
 
 # Copy app code
 COPY app.py ${LAMBDA_TASK_ROOT}
+COPY cloud/wire_format.py cloud/lambda_batch.py ${LAMBDA_TASK_ROOT}/cloud/
+COPY analytics/analysis_runner.py analytics/result_logger.py ${LAMBDA_TASK_ROOT}/analytics/
+COPY seal_backend/evaluator.py seal_backend/context_store.py seal_backend/worker_pool.py seal_backend/container.py ${LAMBDA_TASK_ROOT}/seal_backend/
+
+# The task root is read-only at runtime, so bytecode has to be compiled into the image
+RUN python -m compileall -q -j 0 ${LAMBDA_TASK_ROOT}
 
 # Lambda entry point
 CMD ["app.lambda_handler"]
 
 """
 
-# --- Lambda Handler Code ---
-app_code = """
-import json
-import base64
-import boto3
-import tenseal as ts
-
-s3 = boto3.client("s3")
-
-def lambda_handler(event, context):
-    try:
-        bucket = event.get("s3_bucket")
-        payload_key = event.get("encrypted_payload_key")
-        context_key = event.get("seal_context_key")
-
-        if not (bucket and payload_key and context_key):
-            return {
-                "statusCode": 400,
-                "error": "Missing required S3 keys"
-            }
-
-        # Download encrypted payload from S3
-        payload_obj = s3.get_object(Bucket=bucket, Key=payload_key)
-        encrypted_payload_b64 = payload_obj["Body"].read().decode("utf-8")
-
-        # Download context (in bytes)
-        context_obj = s3.get_object(Bucket=bucket, Key=context_key)
-        context_bytes = context_obj["Body"].read()
-
-        # Restore context
-        context = ts.context_from(context_bytes)
-
-        # Decode and decrypt
-        encrypted_bytes = base64.b64decode(encrypted_payload_b64)
-        ckks_vector = ts.ckks_vector_from(context, encrypted_bytes)
-        decrypted = ckks_vector.decrypt()
-
-        return {
-            "statusCode": 200,
-            "decrypted_result": decrypted[:10]  # Only return first 10 values
-        }
-
-    except Exception as e:
-        return {
-            "statusCode": 500,
-            "error": str(e)
-        }
-"""
-
 # --- Write Files ---
+# The handler is built from app.py on disk (it imports cloud/wire_format.py)
 with open("Dockerfile", "w", encoding='utf-8') as f:
     f.write(dockerfile_content)
 
-with open("app.py", "w", encoding='utf-8') as f:
-    f.write(app_code)
-
 # --- AWS Setup ---
 ecr_client = boto3.client("ecr", region_name=AWS_REGION)
 lambda_client = boto3.client("lambda", region_name=AWS_REGION)
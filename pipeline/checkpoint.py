@@ -0,0 +1,77 @@
+# pipeline/checkpoint.py
+# On-disk stage checkpoints. An entry is keyed by a hash of everything the stage reads
+# (parameters, input file digest, ids of the upstream outputs it consumes), so a rerun
+# skips stages whose inputs are unchanged and any change simply produces a new key.
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+CHECKPOINT_DIR = os.environ.get("HE_CHECKPOINT_DIR", os.path.join(".he_cache", "checkpoints"))
+
+_digests = {}  # (path, size, mtime_ns) -> sha256, so a file is hashed once per process
+
+def input_key(inputs):
+    canonical = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def file_digest(path, block_size=1024 * 1024):
+    stat = os.stat(path)
+    cache_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if cache_key not in _digests:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        _digests[cache_key] = digest.hexdigest()
+    return _digests[cache_key]
+
+def new_output_id():
+    return uuid.uuid4().hex
+
+class CheckpointStore:
+    def __init__(self, directory=CHECKPOINT_DIR):
+        self.directory = directory
+
+    def path(self, stage, key):
+        return os.path.join(self.directory, stage, f"{key}.json")
+
+    def load(self, stage, key):
+        path = self.path(stage, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None  # a torn write counts as a miss
+
+    def save(self, stage, key, output_id, output):
+        path = self.path(stage, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = {
+            "stage": stage,
+            "key": key,
+            "output_id": output_id,
+            "created_at": time.time(),
+            "output": output
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+
+    def invalidate(self, stages=None):
+        # Drops every checkpoint of the given stages (all stages if None)
+        if not os.path.isdir(self.directory):
+            return 0
+        removed = 0
+        for stage in stages or os.listdir(self.directory):
+            stage_dir = os.path.join(self.directory, stage)
+            if os.path.isdir(stage_dir):
+                removed += len(os.listdir(stage_dir))
+                shutil.rmtree(stage_dir)
+        print(f"[i] Invalidated {removed} checkpoint(s) for {', '.join(stages) if stages else 'all stages'}")
+        return removed
@@ -0,0 +1,75 @@
+# pipeline/ingest.py
+# Per-dataset chunk manifest for append-only sources. The manifest records a high-water
+# mark (raw CSV rows already encrypted and the byte offset they end at), so an incremental
+# run seeks past them and only reads, encrypts and uploads the rows after it, as new chunks
+# appended after the existing ones.
+import json
+import os
+import time
+
+DATASET_DIR = os.environ.get("HE_DATASET_DIR", os.path.join(".he_cache", "datasets"))
+
+def dataset_name(path):
+    return os.path.splitext(os.path.basename(path))[0].lower()
+
+def manifest_path(dataset, dataset_dir=DATASET_DIR):
+    return os.path.join(dataset_dir, f"{dataset}.json")
+
+def new_manifest(dataset, source, column, params_hash, context_fingerprint):
+    return {
+        "dataset": dataset,
+        "source": source,
+        "column": column,
+        "params_hash": params_hash,
+        "context_fingerprint": context_fingerprint,
+        "rows_read": 0,  # high-water mark in raw CSV rows (NA rows included)
+        "values": 0,  # encoded values across all chunks
+        "source_bytes": 0,  # byte offset just past the last row read; incremental runs resume here
+        "vocab_size": 0,
+        "chunks": [],
+        "ingests": []
+    }
+
+def load_manifest(dataset, dataset_dir=DATASET_DIR):
+    path = manifest_path(dataset, dataset_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(manifest, dataset_dir=DATASET_DIR):
+    path = manifest_path(manifest["dataset"], dataset_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def check_resumable(manifest, source, params_hash, context_fingerprint):
+    # New chunks must decrypt with the same keys and extend the same append-only file
+    if manifest["params_hash"] != params_hash or manifest["context_fingerprint"] != context_fingerprint:
+        raise ValueError(
+            f"[❌] Dataset '{manifest['dataset']}' was encrypted under a different context; "
+            "run a full (non-incremental) ingest to rebuild it"
+        )
+    if os.path.getsize(source) < manifest["source_bytes"]:
+        raise ValueError(
+            f"[❌] {source} is smaller than at the last ingest ({manifest['source_bytes']} bytes); "
+            "the source was rewritten, not appended to. Run a full ingest"
+        )
+
+def record_ingest(manifest, new_chunks, rows_read, vocab_size, source_bytes):
+    ingest = {
+        "at": time.time(),
+        "rows_from": manifest["rows_read"],
+        "rows_to": rows_read,
+        "chunks": [chunk["index"] for chunk in new_chunks],
+        "values": sum(chunk["length"] for chunk in new_chunks)
+    }
+    manifest["chunks"].extend(new_chunks)
+    manifest["ingests"].append(ingest)
+    manifest["rows_read"] = rows_read
+    manifest["values"] += ingest["values"]
+    manifest["vocab_size"] = vocab_size
+    manifest["source_bytes"] = source_bytes
+    return ingest
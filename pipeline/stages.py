@@ -0,0 +1,949 @@
+# pipeline/stages.py
+# The encryption workflow as callable stages, shared by main.py and anything else that
+# wants to reuse a step. tenseal, numpy, pandas, matplotlib, the crypto libraries and the cloud
+# SDKs are imported inside the stages that use them, so importing this module is cheap
+# and a run that selects e.g. only "report" never loads them.
+import base64
+import hashlib
+import io
+import json
+import math
+import os
+
+from analytics import result_logger
+from cloud import aws_upload, azure_upload, lambda_batch, storage, wire_format
+from pipeline import checkpoint, ingest
+
+# --- Input ---
+DATA_PATH = "D:\\Research\\mimic-iii-clinical-database-demo-1.4\\mimic-iii-clinical-database-demo-1.4\\DRGCODES.csv"
+DATA_COLUMN = "drg_type"
+
+# --- AWS Setup ---
+KMS_KEY_ID = "arn:aws:kms:us-east-1:324362263667:key/2f8de86b-4c1f-45d7-b4bf-a8b9022ee058"
+LAMBDA_FUNCTION_NAME = "EncryptedEHRLambda"
+S3_BUCKET = "secure-ehr-bucket"
+# The Lambda decrypts, so it needs the secret key; set False for compute-only consumers
+UPLOAD_SECRET_KEY = True
+
+# --- Ciphertext Transport ---
+# "binary" frames SEAL bytes (codec "seal" or "zstd"); "base64" is the legacy text fallback
+WIRE_FORMAT = wire_format.FORMAT_BINARY
+WIRE_CODEC = "seal"
+HE_UPLOAD_TARGETS = {
+    "s3": ("s3", S3_BUCKET),
+    "azure": ("azure", (azure_upload.CONNECTION_STRING, "secure-container"))
+}
+# "objects": chunk i is stored as encrypted_data_HE/chunk_<i:05d>.bin
+# "container": each ingest is one indexed container (seal_backend/container.py) under
+# encrypted_data_HE/containers/, and the Lambda reads single chunks with ranged GETs
+HE_LAYOUT = "objects"
+HE_PAYLOAD_PREFIX = "encrypted_data_HE/chunk_"
+HE_PAYLOAD_SUFFIX = ".bin" if WIRE_FORMAT == wire_format.FORMAT_BINARY else ".b64"
+HE_CONTAINER_PREFIX = "encrypted_data_HE/containers/"
+
+# --- Server-side Encrypted Analytics (see analytics/analysis_runner.py) ---
+ANALYTICS_OPERATIONS = ["sum", "mean", "variance"]
+# "selective" sends the aggregations a public evaluation context holding only the Galois keys
+# their rotations use (key_management/key_gen.py); "all" keeps SEAL's full key set in the
+# uploaded context, which the Lambda regenerates on every cold load
+GALOIS_KEYS = os.environ.get("HE_GALOIS_KEYS", "selective")
+
+# --- Decryption Accuracy (see analytics/accuracy.py) ---
+# The Lambda sends back every decrypted value (packed float64) and each chunk is checked
+# against the input as it arrives; a number returns only the first N values per chunk
+LAMBDA_RETURN_VALUES = None
+ACCURACY_TOLERANCE = 1e-3
+# HE_VALIDATE_LOCAL=1 also decrypts each chunk locally right after it is encrypted
+VALIDATE_LOCAL = os.environ.get("HE_VALIDATE_LOCAL", "0") == "1"
+DECRYPTED_SAMPLE_SIZE = 10  # decrypted values kept on the run for the report
+
+# --- Lambda Batching ---
+LAMBDA_BATCH_SIZE = 16  # chunk keys per invocation
+LAMBDA_CONCURRENCY = 4  # batches in flight at once
+
+# --- Streaming Pipeline (see pipeline/streaming.py) ---
+PIPELINE_ENCRYPT_WORKERS = os.cpu_count() or 1  # threads feeding one process each
+PIPELINE_UPLOAD_WORKERS = 8
+PIPELINE_QUEUE_SIZE = 8  # blocks buffered between stages (bounds memory)
+
+# --- AES baseline (analytics/comparator.py streaming AES-256-GCM) ---
+AES_CHUNK_BYTES = 1024 * 1024
+AES_WORKERS = min(os.cpu_count() or 1, 8)
+
+# --- Local spool ---
+# An encrypt-only run writes framed chunks here for a later upload-only run;
+# the chunk list itself lives in the dataset manifest (see pipeline/ingest.py)
+SPOOL_DIR = os.environ.get("HE_SPOOL_DIR", os.path.join(".he_cache", "spool"))
+# Dataset manifests are also published next to the chunks for downstream readers
+HE_MANIFEST_PREFIX = "encrypted_data_HE/manifests/"
+
+# --- Outputs ---
+METRICS_PATH = "encryption_metrics.json"
+STATS_PATH = "encryption_stats.json"
+
+# --- CKKS Parameters ---
+# HE_PLAN_PARAMS=1 replaces the fixed set with the smallest secure one for
+# ANALYTICS_OPERATIONS (seal_backend/param_planner.py); new parameters mean a new context
+PLAN_PARAMS = os.environ.get("HE_PLAN_PARAMS", "0") == "1"
+PLAN_PRECISION_BITS = None  # fractional bits of every aggregation; None takes the most the chain allows
+# Data to size for (MIMIC-range codes by default); stage_lambda skips aggregations whose
+# data exceeds what the parameters can hold
+PLAN_MAX_VALUE = float(os.environ.get("HE_PLAN_MAX_VALUE", "999"))
+PLAN_VALUES = int(os.environ.get("HE_PLAN_VALUES", "20000"))
+
+if PLAN_PARAMS:
+    from seal_backend import param_planner
+    CKKS_PARAMS = param_planner.plan_for_operations(
+        ANALYTICS_OPERATIONS, max_value=PLAN_MAX_VALUE, count=PLAN_VALUES, precision_bits=PLAN_PRECISION_BITS
+    )["params"]
+else:
+    CKKS_PARAMS = {
+        "scheme": "CKKS",
+        "poly_modulus_degree": 8192,
+        "coeff_mod_bit_sizes": [60, 40, 40, 60],
+        "global_scale": 2**40
+    }
+POLY_MODULUS_DEGREE = CKKS_PARAMS["poly_modulus_degree"]
+SLOT_COUNT = POLY_MODULUS_DEGREE // 2
+
+# Stages run in this order; any subset may be selected
+STAGES = ("encrypt", "upload", "lambda", "aes", "report")
+
+class PipelineRun:
+    # State handed from one stage to the next within a single invocation
+    def __init__(self, stages=STAGES, file_path=DATA_PATH, spool_dir=SPOOL_DIR, tracer=None,
+                 incremental=False, dataset=None):
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown stage(s): {sorted(unknown)}; choose from {STAGES}")
+        self.stages = [name for name in STAGES if name in stages]
+        self.file_path = file_path
+        self.spool_dir = spool_dir
+        # Incremental runs only encrypt rows past the dataset manifest's high-water mark
+        self.incremental = incremental
+        self.dataset = dataset or ingest.dataset_name(file_path)
+        if tracer is None:
+            result_logger.tracer.reset()  # the shared tracer outlives runs; start this one empty
+        self.tracer = tracer or result_logger.tracer
+        # Top-level spans become encryption_metrics.json; the full span tree is appended
+        # to metrics_history.jsonl (see analytics/result_logger.py)
+        self.metrics = {}
+        self.stats = {}  # Non-timing run facts (cache hits, sizes)
+        self.context = None
+        self.keys = None  # KeyManager (key_management/key_retrieval.py), created on first use
+        self.manifest = None  # dataset manifest (pipeline/ingest.py)
+        self.chunks = None  # manifest entries: index, offset, length, key, byte counts, uploaded
+        self.uploaded = False
+        self.outputs = {}  # stage -> output id, threaded into downstream checkpoint keys
+        self.mimic_data = None
+        self.decrypted_he_result = []  # first DECRYPTED_SAMPLE_SIZE values; accuracy goes in stats
+
+# --- Recursive Base64 Encoding ---
+def encode_bytes_recursive(obj):
+    if isinstance(obj, bytes):
+        return base64.b64encode(obj).decode('utf-8')
+    elif isinstance(obj, dict):
+        return {k: encode_bytes_recursive(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [encode_bytes_recursive(i) for i in obj]
+    return obj
+
+def calculate_entropy(data):
+    from collections import Counter
+    prob = [v / len(data) for v in Counter(data).values()]
+    return -sum(p * math.log2(p) for p in prob)
+
+# ✅ Load or create SEAL context (cached on disk by parameter hash)
+def create_context():
+    from seal_backend import context_store
+    return context_store.load_or_create_context(CKKS_PARAMS)
+
+def ensure_context(run):
+    if run.context is not None:
+        return run.context
+    from seal_backend import context_store
+    with run.tracer.span("create_context") as context_span:
+        run.context, context_cache_hit = create_context()
+        context_span["attrs"] = {"cache_hit": context_cache_hit}
+    run.stats["context_cache_hit"] = context_cache_hit
+    run.stats["context_params_hash"] = context_store.params_hash(CKKS_PARAMS)
+    run.stats["context_params"] = dict(CKKS_PARAMS, planned=PLAN_PARAMS)
+    print(f"[i] SEAL context {'loaded from cache' if context_cache_hit else 'generated'} in {result_logger.span_seconds(context_span)}s")
+    return run.context
+
+def ensure_keys(run):
+    # One data key from KMS seals every key this run wraps; later seals are local AES-GCM
+    if run.keys is None:
+        from key_management import key_retrieval
+        run.keys = key_retrieval.KeyManager(KMS_KEY_ID)
+        run.stats["key_manager"] = run.keys.stats
+    return run.keys
+
+def check_input(run):
+    if not os.path.exists(run.file_path):
+        raise FileNotFoundError(f"[❌] File not found: {run.file_path}")
+
+def ensure_mimic_data(run):
+    # Stages after "encrypt" need the plaintext column: the spool "encrypt" wrote, mapped
+    # from disk, or else re-read from the CSV
+    if run.mimic_data is None and run.manifest is not None:
+        run.mimic_data = load_plain_spool(run, run.manifest["values"])
+    if run.mimic_data is None:
+        from analytics.mimic_preprocessor import load_and_prepare_mimic
+        check_input(run)
+        with run.tracer.span("load_prepare_data", bytes_processed=os.path.getsize(run.file_path)):
+            run.mimic_data = load_and_prepare_mimic(run.file_path)
+    return run.mimic_data
+
+# --- Spool ---
+def spool_path(run, key):
+    return os.path.join(run.spool_dir, *key.split("/"))
+
+def plain_spool_path(run):
+    # The plaintext column as raw float64, appended block by block during encryption
+    return spool_path(run, f"plain/{run.dataset}.f64")
+
+def load_plain_spool(run, values):
+    # Memory-mapped plaintext (pages load on demand), or None if it is missing or does not
+    # hold exactly the manifest's values (an interrupted or older ingest)
+    import numpy as np
+    path = plain_spool_path(run)
+    if not values or not os.path.exists(path) or os.path.getsize(path) != values * 8:
+        return None
+    return np.memmap(path, dtype=np.float64, mode="r")
+
+def plain_blocks(values, block_size=1 << 20):
+    # Fixed-size slices, so whole-column statistics never materialize more than one block
+    for start in range(0, len(values), block_size):
+        yield values[start:start + block_size]
+
+def plain_moments(values):
+    # Sum, mean and population variance over blocks (two passes, like statistics.pvariance)
+    import numpy as np
+    total = math.fsum(float(np.sum(block, dtype=np.float64)) for block in plain_blocks(values))
+    mean = total / len(values)
+    squares = math.fsum(float(np.sum(np.square(np.asarray(block, dtype=np.float64) - mean)))
+                        for block in plain_blocks(values))
+    return {"sum": total, "mean": mean, "variance": squares / len(values)}
+
+def adopt_manifest(run, manifest):
+    run.manifest = manifest
+    run.chunks = manifest["chunks"]
+    run.uploaded = all(chunk.get("uploaded") for chunk in run.chunks)
+    run.outputs = dict(manifest.get("outputs", {}), **run.outputs)
+
+def write_manifest(run):
+    run.manifest["chunks"] = run.chunks
+    run.manifest["outputs"] = run.outputs
+    run.manifest["payload_format"] = WIRE_FORMAT
+    run.manifest["codec"] = WIRE_CODEC
+    ingest.save_manifest(run.manifest)
+
+def publish_manifest(run):
+    body = json.dumps(run.manifest, indent=2).encode("utf-8")
+    with run.tracer.span("upload_s3_manifest", bytes_processed=len(body)):
+        aws_upload.upload_to_s3(S3_BUCKET, f"{HE_MANIFEST_PREFIX}{run.dataset}.json", body, binary=True)
+
+def ensure_chunks(run):
+    if run.chunks is None:
+        manifest = ingest.load_manifest(run.dataset)
+        if manifest is None:
+            raise FileNotFoundError(f"[❌] No manifest for dataset '{run.dataset}'; run the 'encrypt' stage first")
+        adopt_manifest(run, manifest)
+    return run.chunks
+
+# --- Charts and verification ---
+def generate_metric_charts(metrics_dict):
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    labels = list(metrics_dict.keys())
+    values = list(metrics_dict.values())
+
+    with PdfPages("encryption_metrics_report.pdf") as pdf:
+        plt.figure(figsize=(12, 6))
+        plt.bar(labels, values)
+        plt.xlabel('Operation Step')
+        plt.ylabel('Time (seconds)')
+        plt.title('Encryption and Upload Execution Time')
+        plt.xticks(rotation=45, ha='right')
+        plt.grid(True, axis='y')
+        plt.tight_layout()
+        plt.savefig("encryption_metrics_bar.png")
+        pdf.savefig()
+        plt.close()
+
+        plt.figure(figsize=(10, 8))
+        plt.barh(labels, values)
+        plt.xlabel('Time (seconds)')
+        plt.title('Time Taken by Each Operation Step')
+        plt.grid(True, axis='x')
+        plt.tight_layout()
+        plt.savefig("encryption_metrics_horizontal.png")
+        pdf.savefig()
+        plt.close()
+
+        grouped = {
+            "HE Ops": metrics_dict.get("he_encrypt", 0),
+            "AES Ops": metrics_dict.get("aes_encrypt", 0) + metrics_dict.get("aes_decrypt", 0),
+            "Upload Time": metrics_dict.get("upload_s3_HE", 0) + metrics_dict.get("upload_azure_HE", 0) + metrics_dict.get("upload_s3_AES", 0),
+            "KMS Encryption": metrics_dict.get("kms_encrypt_key", 0) + metrics_dict.get("kms_encrypt_dummy_HE_key", 0),
+            "Lambda Compute": metrics_dict.get("lambda_invoke", 0),
+            "Data Prep": metrics_dict.get("load_prepare_data", 0)
+        }
+
+        plt.figure(figsize=(10, 6))
+        plt.bar(grouped.keys(), grouped.values())
+        plt.ylabel("Total Time (s)")
+        plt.title("Grouped Operation Times")
+        plt.xticks(rotation=30, ha='right')
+        plt.grid(True, axis='y')
+        plt.tight_layout()
+        plt.savefig("encryption_metrics_grouped.png")
+        pdf.savefig()
+        plt.close()
+
+    print("[📊] Charts and PDF report generated (encryption_metrics_report.pdf)")
+
+class LambdaError(RuntimeError):
+    # The Lambda could not be invoked or returned an unusable response; main.py maps it to
+    # an exit code
+    pass
+
+def read_lambda_response(run, lambda_response, parent_span=None):
+    payload_stream = lambda_response.get('Payload')
+    if payload_stream is None:
+        raise LambdaError("[❌] Lambda response missing Payload field.")
+    try:
+        lambda_result = json.load(payload_stream)
+    except json.JSONDecodeError as je:
+        raise LambdaError(f"[💥] Failed to decode Lambda response JSON: {je}") from je
+
+    status_code = lambda_response.get("StatusCode", 0)
+    if status_code != 200:
+        raise LambdaError(f"[❌] Lambda returned HTTP {status_code}: {lambda_result}")
+
+    # Codec negotiation: warn if the handler cannot read the configured frame
+    supported_codecs = lambda_result.get("supported_codecs")
+    if supported_codecs and WIRE_CODEC not in supported_codecs:
+        print(f"[⚠️] Lambda does not support codec '{WIRE_CODEC}' (supports {supported_codecs}); use 'seal' or base64")
+
+    # Lambda-side spans nest under the client span that invoked it
+    run.tracer.merge(lambda_result.get("trace", []), parent=parent_span)
+
+    lambda_cache = lambda_result.get("cache")
+    if lambda_cache:
+        run.stats.setdefault("lambda_cache", []).append(lambda_cache)
+        print(f"[i] Lambda warm cache: {lambda_cache['hits']} hit(s), {lambda_cache['misses']} miss(es)")
+
+    error_message = lambda_result.get("error")
+    if "results" in lambda_result:
+        timing = lambda_result.get("timing", {})
+        print(f"[✓] Lambda batch of {len(lambda_result['results'])} item(s) done in {timing.get('total')}s (context load {timing.get('context_load')}s)")
+    elif "encrypted_result" in lambda_result:
+        timing = lambda_result.get("timing", {})
+        print(f"[✓] Lambda '{lambda_result.get('operation')}' over {lambda_result.get('chunks')} chunk(s) done in {timing.get('total')}s")
+    elif error_message:
+        print("[❌] Lambda returned an error:")
+        print("Error:", error_message)
+    else:
+        raise LambdaError(f"[❌] Lambda returned successfully but with no results, encrypted_result or error field: {lambda_result}")
+    return lambda_result
+
+def record_upload_results(run, upload_results):
+    # One upload_<label>_HE metric per configured target; any failed target fails the stage
+    failed = []
+    for label in HE_UPLOAD_TARGETS:
+        result = upload_results.get(label, {"ok": False, "error": "no upload result"})
+        run.metrics[f"upload_{label}_HE"] = result.get("seconds", 0)
+        if not result["ok"]:
+            failed.append(f"{label}: {result['error']}")
+    if failed:
+        raise RuntimeError(f"[❌] Upload failed ({'; '.join(failed)})")
+
+def chunk_object(chunk):
+    # Storage object holding a chunk: its own key, or the container it lives in
+    return chunk.get("object", chunk["key"])
+
+def upload_objects(run, keys):
+    # Uploads spooled objects (chunk files or containers) to every target, streamed from disk
+    payload_bytes = sum(os.path.getsize(spool_path(run, key)) for key in keys)
+    with run.tracer.span("upload_HE", bytes_processed=payload_bytes):
+        upload_results, upload_wall = storage.upload_many(
+            HE_UPLOAD_TARGETS, ((key, spool_path(run, key)) for key in keys))
+    run.metrics["upload_HE_wall"] = upload_wall
+    record_upload_results(run, upload_results)
+
+# --- Stages ---
+def stage_encrypt(run):
+    import threading
+    import numpy as np
+    import tenseal as ts
+    from analytics import accuracy
+    from analytics.mimic_preprocessor import iter_mimic_blocks
+    from pipeline import streaming
+    from seal_backend import container, context_store, encryptor, worker_pool
+
+    tracer = run.tracer
+    context = ensure_context(run)
+
+    # Envelope-encrypt dummy HE key under a KMS data key (for metric demo)
+    keys = ensure_keys(run)
+    with tracer.span("kms_encrypt_dummy_HE_key"):
+        dummy_he_key = base64.b64encode(b"fake_he_secret_key_for_metrics").decode('utf-8')
+        kms_encrypted_he_key = keys.seal(dummy_he_key.encode())
+    print("[✓] Simulated HE secret key encrypted with KMS data key")
+
+    # Incremental runs continue the dataset manifest; full runs start a new one from row 0
+    check_input(run)
+    params_hash = context_store.params_hash(CKKS_PARAMS)
+    manifest = ingest.load_manifest(run.dataset) if run.incremental else None
+    if manifest is not None:
+        ingest.check_resumable(manifest, run.file_path, params_hash, context_fingerprint(run))
+        print(f"[i] Incremental ingest of '{run.dataset}' from row {manifest['rows_read']} (byte {manifest['source_bytes']}; {len(manifest['chunks'])} chunk(s) already stored)")
+    else:
+        manifest = ingest.new_manifest(run.dataset, run.file_path, DATA_COLUMN, params_hash, context_fingerprint(run))
+    first_index, first_offset = len(manifest["chunks"]), manifest["values"]
+    source_bytes = os.path.getsize(run.file_path)
+    progress = {}
+
+    # Read -> encrypt -> frame and upload (or spool), overlapped through bounded queues.
+    # A slow stage back-pressures the ones before it instead of buffering the whole column.
+    stream_upload = "upload" in run.stages
+    sample = {}
+    validator = accuracy.AccuracyValidator(ACCURACY_TOLERANCE) if VALIDATE_LOCAL else None
+
+    use_container = HE_LAYOUT == "container"
+    if use_container:
+        # One container per ingest, named uniquely so readers may cache it by key
+        container_key = f"{HE_CONTAINER_PREFIX}{run.dataset}-{first_index:05d}-{(run.outputs.get('encrypt') or checkpoint.new_output_id())[:12]}{container.SUFFIX}"
+        container_path = spool_path(run, container_key)
+        os.makedirs(os.path.dirname(container_path), exist_ok=True)
+        container_file = open(container_path, "w+b")
+        container_writer = container.ContainerWriter(
+            container_file, context_fingerprint(run), CKKS_PARAMS,
+            {"dataset": run.dataset, "first_index": first_index, "first_offset": first_offset, "slot_count": SLOT_COUNT}
+        )
+        container_lock = threading.Lock()
+
+    # Plaintext is spooled to disk for the verification and AES stages instead of being kept
+    # in memory; an incremental run appends only if the spool matches the manifest so far
+    plain_path = plain_spool_path(run)
+    os.makedirs(os.path.dirname(plain_path), exist_ok=True)
+    resumable = first_offset and load_plain_spool(run, first_offset) is not None
+    plain_file = open(plain_path, "ab" if resumable else "wb") if resumable or not first_offset else None
+    if plain_file is None and os.path.exists(plain_path):
+        os.remove(plain_path)  # stale; later stages re-read the CSV
+
+    def read_blocks():
+        offset = first_offset
+        blocks = iter_mimic_blocks(run.file_path, column=DATA_COLUMN, block_size=SLOT_COUNT,
+                                   start_row=manifest["rows_read"], start_byte=manifest["source_bytes"],
+                                   progress=progress)
+        for index, block in enumerate(blocks, start=first_index):
+            if plain_file is not None:
+                plain_file.write(np.asarray(block, dtype=np.float64).tobytes())
+            yield {"index": index, "offset": offset, "length": len(block), "values": block}
+            offset += len(block)
+
+    with tracer.span("he_pipeline", bytes_processed=source_bytes - manifest["source_bytes"]) as pipeline_span, \
+            worker_pool.make_pool(context, PIPELINE_ENCRYPT_WORKERS) as encrypt_pool:
+
+        def encrypt(item):
+            with tracer.span("he_encrypt_chunk", parent=pipeline_span) as chunk_span:
+                values = item.pop("values")
+                item["ciphertext"] = encryptor.encrypt_block(encrypt_pool, values)
+                chunk_span["bytes"] = len(item["ciphertext"])
+            if validator is not None:
+                with tracer.span("he_validate_chunk", parent=pipeline_span):
+                    decrypted = ts.ckks_vector_from(context, item["ciphertext"]).decrypt()
+                    validator.update(values, decrypted, offset=item["offset"])
+            return item
+
+        def store(item):
+            ciphertext = item.pop("ciphertext")
+            sample.setdefault("ciphertext", ciphertext)
+            if use_container:
+                # Uploaded as a whole once every chunk is in (see below)
+                position = item["index"] - first_index
+                with container_lock:
+                    container_writer.add(ciphertext, item["length"], position=position)
+                item["key"] = container.chunk_ref(container_key, position)
+                item["object"] = container_key
+                item["raw_bytes"] = item["payload_bytes"] = len(ciphertext)
+                item["uploaded"] = False
+                return item
+            item["key"] = lambda_batch.chunk_key(HE_PAYLOAD_PREFIX, item["index"], HE_PAYLOAD_SUFFIX)
+            body = wire_format.encode_payload(ciphertext, codec=WIRE_CODEC, payload_format=WIRE_FORMAT)
+            item["raw_bytes"], item["payload_bytes"] = len(ciphertext), len(body)
+            if stream_upload:
+                with tracer.span("upload_object", bytes_processed=len(body), parent=pipeline_span):
+                    item["upload"] = storage.upload_to_all(HE_UPLOAD_TARGETS, item["key"], body, verbose=False)[0]
+                item["uploaded"] = all(item["upload"][label]["ok"] for label in HE_UPLOAD_TARGETS)
+            else:
+                path = spool_path(run, item["key"])
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(body)
+                item["uploaded"] = False
+            return item
+
+        pipeline = streaming.StreamingPipeline(read_blocks(), [
+            streaming.Stage("encrypt", encrypt, workers=PIPELINE_ENCRYPT_WORKERS, queue_size=PIPELINE_QUEUE_SIZE),
+            streaming.Stage("upload" if stream_upload else "spool", store,
+                            workers=PIPELINE_UPLOAD_WORKERS, queue_size=PIPELINE_QUEUE_SIZE)
+        ])
+        try:
+            new_chunks = pipeline.run()
+            if use_container:
+                container_writer.close()  # writes the index and patches the header
+        finally:
+            if use_container:
+                container_file.close()
+            if plain_file is not None:
+                plain_file.close()
+    pipeline_report = pipeline.print_report()
+    if use_container and not new_chunks:
+        os.remove(container_path)
+
+    if not new_chunks and not manifest["chunks"]:
+        raise ValueError("[❌] No data to encrypt.")
+    ingest_record = ingest.record_ingest(manifest, new_chunks, progress["rows_read"], progress["vocab_size"],
+                                         progress.get("bytes_read", source_bytes))
+    run.mimic_data = load_plain_spool(run, manifest["values"])
+    if run.mimic_data is not None:
+        print(f"[✓] Prepared data: {len(run.mimic_data)} values spooled to {plain_path}, first 10: {run.mimic_data[:10].tolist()}")
+    print(f"[✓] Encrypted {ingest_record['values']} new value(s) from rows {ingest_record['rows_from']}-{ingest_record['rows_to']} "
+          f"into {len(new_chunks)} CKKS chunk(s) of up to {SLOT_COUNT} slots ({len(manifest['chunks'])} chunk(s) in '{run.dataset}')")
+
+    payload_bytes = sum(chunk["payload_bytes"] for chunk in new_chunks)
+    raw_bytes = sum(chunk["raw_bytes"] for chunk in new_chunks)
+    print(f"[i] Encrypted payload size ({WIRE_FORMAT}/{WIRE_CODEC}): {payload_bytes} bytes in {len(new_chunks)} object(s) (raw SEAL: {raw_bytes} bytes)")
+    run.stats["payload_bytes_HE"] = payload_bytes
+    run.stats["payload_format"] = WIRE_FORMAT
+    run.stats["he_chunks"] = len(manifest["chunks"])
+    run.stats["he_chunks_new"] = len(new_chunks)
+    run.stats["ingest"] = dict(ingest_record, incremental=run.incremental, chunks=len(new_chunks))
+    run.stats["pipeline"] = pipeline_report
+    if validator is not None:
+        run.stats["accuracy_local"] = validator.summary()
+        accuracy.print_summary(run.stats["accuracy_local"])
+    if sample:
+        print(f"[i] Entropy of encrypted payload: {round(calculate_entropy(sample['ciphertext']), 4)}")
+
+    # Stages overlap, so these are busy times; he_pipeline (the span) is the wall time
+    pipeline_stages = pipeline_report["stages"]
+    run.metrics["load_prepare_data"] = pipeline_stages["read"]["busy_s"]
+    run.metrics["he_encrypt"] = pipeline_stages["encrypt"]["busy_s"]
+    if use_container and new_chunks:
+        print(f"[i] Container {container_key}: {os.path.getsize(container_path)} bytes, {len(new_chunks)} chunk(s)")
+        if stream_upload:
+            upload_objects(run, [container_key])
+            for chunk in new_chunks:
+                chunk["uploaded"] = True
+    elif stream_upload and new_chunks:
+        upload_results = storage.summarize_uploads(HE_UPLOAD_TARGETS, [chunk.pop("upload") for chunk in new_chunks])
+        record_upload_results(run, upload_results)
+
+    adopt_manifest(run, manifest)
+    write_manifest(run)
+    if stream_upload and new_chunks:
+        publish_manifest(run)
+
+def stage_upload(run):
+    chunks = ensure_chunks(run)
+    # Only chunks not yet stored remotely (spooled by an encrypt-only run) are sent
+    pending = [chunk for chunk in chunks if not chunk.get("uploaded")]
+    if not pending:
+        print(f"[i] All {len(chunks)} chunk(s) of '{run.dataset}' already uploaded")
+        return
+    keys = list(dict.fromkeys(chunk_object(chunk) for chunk in pending))
+    missing = [key for key in keys if not os.path.exists(spool_path(run, key))]
+    if missing:
+        raise FileNotFoundError(f"[❌] {len(missing)} object(s) not spooled (e.g. {missing[0]}); run the 'encrypt' stage without 'upload' first")
+
+    upload_objects(run, keys)
+    for chunk in pending:
+        chunk["uploaded"] = True
+    run.uploaded = True
+    write_manifest(run)
+    publish_manifest(run)
+
+def make_chunk_events(base_event, chunks, batch_size):
+    # Per-object chunks travel as key ranges; container chunks as (container, position) ranges
+    in_container = ["object" in chunk for chunk in chunks]
+    if not any(in_container):
+        return lambda_batch.make_batch_events(base_event, HE_PAYLOAD_PREFIX, HE_PAYLOAD_SUFFIX, len(chunks), batch_size)
+    keys = [chunk["key"] for chunk in chunks]
+    if all(in_container):
+        return lambda_batch.make_container_events(base_event, keys, batch_size)
+    # A dataset that switched layout between ingests: explicit key lists
+    return [dict(base_event, encrypted_payload_keys=keys[i:i + batch_size]) for i in range(0, len(keys), batch_size)]
+
+def upload_evaluation_context(run):
+    # Public context with relin keys and Galois keys for just the rotations ANALYTICS_OPERATIONS
+    # use; cached locally per context and step set, and content-addressed in S3
+    from analytics import analysis_runner
+    from key_management import key_gen
+
+    steps = analysis_runner.rotation_steps(ANALYTICS_OPERATIONS, SLOT_COUNT)
+    with run.tracer.span("keygen_galois", steps=len(steps)) as keygen_span:
+        eval_bytes, cache_hit = key_gen.load_or_create_evaluation_context(run.context, steps)
+        keygen_span["bytes"] = len(eval_bytes)
+        keygen_span["attrs"]["cache_hit"] = cache_hit
+    with run.tracer.span("upload_s3_eval_context", bytes_processed=len(eval_bytes)):
+        eval_key, uploaded = aws_upload.upload_if_absent(
+            S3_BUCKET, eval_bytes, prefix="contexts/", suffix=".bin"
+        )
+    print(f"[i] Evaluation context size (bytes): {len(eval_bytes)} with Galois keys for rotation steps {steps}")
+    run.stats["galois_keys"] = {
+        "mode": GALOIS_KEYS,
+        "steps": steps,
+        "cache_hit": cache_hit,
+        "keygen_s": result_logger.span_seconds(keygen_span),
+        "eval_context_bytes": len(eval_bytes),
+        "eval_context_key": eval_key,
+        "eval_context_uploaded": uploaded
+    }
+    return eval_key
+
+def stage_lambda(run):
+    import numpy as np
+    import tenseal as ts
+    from analytics import accuracy
+    from seal_backend import context_store, param_planner
+
+    tracer = run.tracer
+    context = ensure_context(run)
+    chunks = ensure_chunks(run)
+    mimic_data = ensure_mimic_data(run)
+    lambda_client = storage.get_client("lambda")
+
+    eval_context_key = None
+    if ANALYTICS_OPERATIONS:
+        # Rotation (sum) and relinearization (variance, dot) keys are only built when analytics run
+        context_store.ensure_relin_keys(context, CKKS_PARAMS)
+        if GALOIS_KEYS == "all":
+            context_store.ensure_galois_keys(context, CKKS_PARAMS)
+        else:
+            eval_context_key = upload_evaluation_context(run)
+
+    # ✅ Upload serialized context to S3 under a content-addressed key (skipped if unchanged)
+    context_bytes = context.serialize(save_secret_key=UPLOAD_SECRET_KEY,
+                                      save_galois_keys=GALOIS_KEYS == "all")
+    with tracer.span("upload_s3_context", bytes_processed=len(context_bytes)):
+        context_key, context_uploaded = aws_upload.upload_if_absent(
+            S3_BUCKET, context_bytes, prefix="contexts/", suffix=".bin"
+        )
+    print(f"[i] Context size (bytes): {len(context_bytes)}")
+    run.stats["context_bytes"] = len(context_bytes)
+    run.stats["context_key"] = context_key
+    run.stats["context_uploaded"] = context_uploaded
+
+    # ✅ Invoke Lambda for HE decryption in batches of chunk keys (S3 reference pattern)
+    base_event = {
+        "s3_bucket": S3_BUCKET,
+        "seal_context_key": context_key,
+        "payload_format": WIRE_FORMAT,
+        "run_id": tracer.run_id
+    }
+    decrypt_event = dict(base_event, return_values=LAMBDA_RETURN_VALUES, values_format="f64")
+    batch_events = make_chunk_events(decrypt_event, chunks, LAMBDA_BATCH_SIZE)
+
+    with tracer.span("lambda_invoke") as invoke_span:
+        lambda_responses = lambda_batch.invoke_batches(
+            lambda_client, LAMBDA_FUNCTION_NAME, batch_events, LAMBDA_CONCURRENCY
+        )
+    print(f"[i] Invoked Lambda with {len(batch_events)} batch(es) of up to {LAMBDA_BATCH_SIZE} chunk(s)")
+
+    # Robust Lambda response handling
+    item_results = []
+    for lambda_response, seconds in lambda_responses:
+        lambda_result = read_lambda_response(run, lambda_response, invoke_span)
+        item_results.extend(lambda_result.get("results", []))
+
+    # Check the values each item returned against the matching slice of the input, a chunk at a time
+    chunk_by_key = {chunk["key"]: chunk for chunk in chunks}
+    plain = np.asarray(mimic_data, dtype=np.float64)
+    validator = accuracy.AccuracyValidator(ACCURACY_TOLERANCE, expected_chunks=len(chunks))
+    run.decrypted_he_result = []
+    with tracer.span("validate_decryption"):
+        # Chunks with a Lambda error or no result at all count as unverified, failing the check
+        returned = {item["key"] for item in item_results}
+        for chunk in chunks:
+            if chunk["key"] not in returned:
+                validator.mark_failed(chunk["key"], "no result returned by Lambda", chunk["offset"])
+        for item in sorted(item_results, key=lambda item: chunk_by_key[item["key"]]["offset"]):
+            chunk = chunk_by_key[item["key"]]
+            if "error" in item:
+                print(f"[❌] Lambda failed on '{item['key']}': {item['error']}")
+                validator.mark_failed(item["key"], item["error"], chunk["offset"])
+                continue
+            if "decrypted_f64" in item:
+                values = accuracy.decode_values(item["decrypted_f64"])
+            else:
+                values = np.asarray(item["decrypted_result"], dtype=np.float64)
+            values = values[:chunk["length"]]
+            validator.update(plain[chunk["offset"]:chunk["offset"] + len(values)], values,
+                             key=item["key"], offset=chunk["offset"])
+            if len(run.decrypted_he_result) < DECRYPTED_SAMPLE_SIZE:
+                run.decrypted_he_result.extend(values[:DECRYPTED_SAMPLE_SIZE - len(run.decrypted_he_result)].tolist())
+        run.stats["accuracy"] = validator.summary()
+    print(f"[✓] HE decrypted results for {len(item_results)} chunk(s) from Lambda")
+    print(" - First 10 values:", run.decrypted_he_result[:10])
+
+    # Encrypted aggregations in Lambda; only one result ciphertext per operation comes back
+    # An aggregation whose intermediates exceed the parameters' integer bits would decrypt to garbage
+    operations = []
+    max_abs = max((float(np.abs(block).max(initial=0.0)) for block in plain_blocks(plain)), default=0.0)
+    for operation in ANALYTICS_OPERATIONS:
+        try:
+            param_planner.check_magnitude(CKKS_PARAMS, operation, max_abs, len(mimic_data))
+            operations.append(operation)
+        except ValueError as e:
+            print(f"[❌] Skipping encrypted {operation}: {e}")
+            run.stats.setdefault("aggregations_rejected", {})[operation] = str(e)
+    if operations:
+        aggregation_base = dict(base_event, eval_context_key=eval_context_key) if eval_context_key else base_event
+        aggregation_events = [
+            make_chunk_events(dict(aggregation_base, operation=operation, count=len(mimic_data)), chunks, len(chunks))[0]
+            for operation in operations
+        ]
+        with tracer.span("lambda_aggregate") as aggregate_span:
+            aggregation_responses = lambda_batch.invoke_batches(
+                lambda_client, LAMBDA_FUNCTION_NAME, aggregation_events, LAMBDA_CONCURRENCY
+            )
+
+        expected = plain_moments(plain)
+        for operation, (lambda_response, seconds) in zip(operations, aggregation_responses):
+            encrypted_result = read_lambda_response(run, lambda_response, aggregate_span).get("encrypted_result")
+            if not encrypted_result:
+                continue
+            result_bytes = base64.b64decode(encrypted_result)
+            value = ts.ckks_vector_from(context, result_bytes).decrypt()[0]
+            run.stats[f"he_{operation}"] = value
+            print(f"[✓] Encrypted {operation}: {value:.4f} (plaintext {expected[operation]:.4f}, result ciphertext {len(result_bytes)} bytes)")
+
+def plain_json(values):
+    # The column as json.dumps(list) bytes, generated a block at a time from the (possibly
+    # memory-mapped) values
+    yield b"["
+    separator = b""
+    for block in plain_blocks(values):
+        if len(block):
+            yield separator + json.dumps(list(map(float, block)))[1:-1].encode('utf-8')
+            separator = b", "
+    yield b"]"
+
+def plain_json_reader(values):
+    from analytics import comparator
+    return io.BufferedReader(comparator.IterReader(plain_json(values)), AES_CHUNK_BYTES)
+
+def stage_aes(run):
+    import tempfile
+    from analytics import comparator
+
+    tracer = run.tracer
+    mimic_data = ensure_mimic_data(run)
+
+    # AES Encryption for Comparison (chunked AES-256-GCM on a thread pool). The JSON payload
+    # is generated, encrypted and verified a chunk at a time; only the ciphertext touches disk
+    print("\n[🔍] Now comparing with AES-style encryption...\n")
+    aes_key = comparator.new_key()
+    os.makedirs(run.spool_dir, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=run.spool_dir, prefix="aes-", suffix=".bin", delete=False) as f:
+        aes_path = f.name
+    try:
+        with open(aes_path, "wb") as out, tracer.span("aes_encrypt") as encrypt_span:
+            totals = comparator.encrypt_stream(aes_key, plain_json_reader(mimic_data), out,
+                                               AES_CHUNK_BYTES, AES_WORKERS)
+            encrypt_span["bytes"] = totals["plaintext_bytes"]
+
+        with open(aes_path, "rb") as encrypted, tracer.span("aes_decrypt", bytes_processed=totals["ciphertext_bytes"]):
+            matches, _ = comparator.verify_stream(aes_key, encrypted, plain_json_reader(mimic_data), AES_WORKERS)
+        run.stats["aes"] = {"cipher": "AES-256-GCM", "chunk_bytes": AES_CHUNK_BYTES, "workers": AES_WORKERS,
+                            "plaintext_bytes": totals["plaintext_bytes"],
+                            "ciphertext_bytes": totals["ciphertext_bytes"], "verified": matches}
+
+        print("[✓] AES encrypted length:", totals["ciphertext_bytes"], f"({totals['chunks']} chunk(s))")
+        print("[✓] AES decrypted output", "matches the input" if matches else "does NOT match the input (MISMATCH)")
+
+        # Upload the AES ciphertext, streamed from the spool file
+        with tracer.span("upload_s3_AES", bytes_processed=totals["ciphertext_bytes"]):
+            result = storage.upload_to_all({"s3": ("s3", S3_BUCKET)}, "encrypted_data_AES.json", aes_path)[0]["s3"]
+        if not result["ok"]:
+            raise RuntimeError(f"[❌] AES upload failed: {result['error']}")
+    finally:
+        os.remove(aes_path)
+
+    # Envelope-encrypt AES key (reuses the run's cached data key when still valid)
+    keys = ensure_keys(run)
+    with tracer.span("kms_encrypt_key"):
+        kms_encrypted_key = keys.seal(aes_key)
+    print("[✓] AES key encrypted with KMS data key")
+
+def stage_report(run):
+    from analytics import accuracy
+
+    # Save metrics (latest-run snapshot) and append the span tree to the history
+    run.metrics.update(run.tracer.durations())
+    if run.metrics:
+        with open(METRICS_PATH, "w") as f:
+            json.dump(run.metrics, f, indent=2)
+        print(f"[✓] Metrics exported to {METRICS_PATH}")
+
+        with open(STATS_PATH, "w") as f:
+            json.dump(run.stats, f, indent=2)
+        run.tracer.append_history(stats=run.stats, stages=run.stages)
+    elif os.path.exists(METRICS_PATH):
+        # Report-only: chart the last saved run
+        with open(METRICS_PATH) as f:
+            run.metrics = json.load(f)
+        print(f"[i] Reporting on saved metrics in {METRICS_PATH}")
+    else:
+        print(f"[i] No metrics in this run and no {METRICS_PATH} to report on")
+        return
+
+    generate_metric_charts(run.metrics)
+
+    for name in ("accuracy_local", "accuracy"):
+        if name in run.stats:
+            accuracy.print_summary(run.stats[name])
+
+STAGE_FUNCTIONS = {
+    "encrypt": stage_encrypt,
+    "upload": stage_upload,
+    "lambda": stage_lambda,
+    "aes": stage_aes,
+    "report": stage_report
+}
+
+# --- Checkpoints (see pipeline/checkpoint.py) ---
+def context_fingerprint(run):
+    # Public part only: galois/relin keys are added later without changing existing ciphertexts
+    context = ensure_context(run)
+    public = context.serialize(save_public_key=True, save_secret_key=False,
+                               save_galois_keys=False, save_relin_keys=False)
+    return hashlib.sha256(public).hexdigest()
+
+def data_digest(run):
+    check_input(run)
+    return checkpoint.file_digest(run.file_path)
+
+def prior_ingest(run):
+    # An incremental run depends on how far the dataset manifest has already got
+    if not run.incremental:
+        return None
+    manifest = ingest.load_manifest(run.dataset)
+    return [manifest["rows_read"], len(manifest["chunks"])] if manifest else None
+
+def chunk_summary(run):
+    return [(chunk["key"], chunk["offset"], chunk["length"], chunk["payload_bytes"]) for chunk in ensure_chunks(run)]
+
+# What each stage reads; a change to any of it gives a new checkpoint key.
+# "report" is cheap and always runs.
+CHECKPOINT_INPUTS = {
+    "encrypt": lambda run: {
+        "data": data_digest(run),
+        "ingest": prior_ingest(run),
+        "params": CKKS_PARAMS,
+        "context": context_fingerprint(run),
+        "slot_count": SLOT_COUNT,
+        "validate_local": VALIDATE_LOCAL,
+        "wire": [WIRE_FORMAT, WIRE_CODEC],
+        "layout": [HE_LAYOUT, HE_CONTAINER_PREFIX if HE_LAYOUT == "container" else HE_PAYLOAD_PREFIX + HE_PAYLOAD_SUFFIX],
+        "targets": HE_UPLOAD_TARGETS if "upload" in run.stages else "spool"
+    },
+    "upload": lambda run: {
+        "chunks": chunk_summary(run),
+        "encrypt": run.outputs.get("encrypt"),
+        "targets": HE_UPLOAD_TARGETS
+    },
+    "lambda": lambda run: {
+        "chunks": chunk_summary(run),
+        "encrypt": run.outputs.get("encrypt"),
+        "upload": run.outputs.get("upload"),
+        "data": data_digest(run),
+        "context": context_fingerprint(run),
+        "secret_key": UPLOAD_SECRET_KEY,
+        "function": [LAMBDA_FUNCTION_NAME, S3_BUCKET, LAMBDA_BATCH_SIZE],
+        "validation": [LAMBDA_RETURN_VALUES, ACCURACY_TOLERANCE],
+        "operations": ANALYTICS_OPERATIONS,
+        "galois_keys": GALOIS_KEYS
+    },
+    "aes": lambda run: {
+        "data": data_digest(run),
+        "bucket": S3_BUCKET,
+        "kms_key": KMS_KEY_ID,
+        "cipher": ["AES-256-GCM", AES_CHUNK_BYTES]
+    }
+}
+
+# PipelineRun attributes each stage hands downstream
+CHECKPOINT_STATE = {
+    "encrypt": ("manifest",),
+    "upload": ("manifest",),
+    "lambda": ("decrypted_he_result",),
+    "aes": ()
+}
+
+def checkpoint_usable(run, name, output):
+    if name == "encrypt":
+        # Spooled chunks must still be on disk for a later upload
+        # (container chunks are "<container>#<position>" refs, so check the container file)
+        return all(os.path.exists(spool_path(run, chunk_object(chunk)))
+                   for chunk in output["state"]["manifest"]["chunks"] if not chunk.get("uploaded"))
+    return True
+
+def _changed(before, after):
+    return {k: v for k, v in after.items() if k not in before or before[k] != v}
+
+def run_checkpointed(run, store, name):
+    key = checkpoint.input_key(CHECKPOINT_INPUTS[name](run))
+    record = store.load(name, key)
+    if record is not None and checkpoint_usable(run, name, record["output"]):
+        output = record["output"]
+        for attr, value in output["state"].items():
+            setattr(run, attr, value)
+        run.outputs[name] = record["output_id"]
+        run.metrics.update(output["metrics"])
+        run.stats.update(output["stats"])
+        run.stats.setdefault("checkpoints", {})[name] = "hit"
+        if run.manifest is not None:
+            adopt_manifest(run, run.manifest)
+            write_manifest(run)
+        print(f"[↺] Stage '{name}' inputs unchanged, restored checkpoint {key[:12]}")
+        return
+
+    metrics_before, stats_before = dict(run.metrics), dict(run.stats)
+    durations_before = run.tracer.durations()
+    run.outputs[name] = checkpoint.new_output_id()
+    STAGE_FUNCTIONS[name](run)
+
+    # Top-level span times go with the checkpoint so a restored run still reports them
+    durations = {
+        span_name: round(seconds - durations_before.get(span_name, 0), 4)
+        for span_name, seconds in run.tracer.durations().items()
+        if seconds != durations_before.get(span_name)
+    }
+    output = {
+        "state": {attr: getattr(run, attr) for attr in CHECKPOINT_STATE[name]},
+        "metrics": dict(durations, **_changed(metrics_before, run.metrics)),
+        "stats": _changed(stats_before, run.stats)
+    }
+    if run.manifest is not None:
+        write_manifest(run)
+    store.save(name, key, run.outputs[name], output)
+    run.stats.setdefault("checkpoints", {})[name] = "miss"
+
+def run_pipeline(stages=STAGES, checkpoints=None, **kwargs):
+    # checkpoints: a checkpoint.CheckpointStore, or None to always run every stage
+    run = PipelineRun(stages, **kwargs)
+    for name in run.stages:
+        print(f"\n[▶] Stage: {name}")
+        if checkpoints is not None and name in CHECKPOINT_INPUTS:
+            run_checkpointed(run, checkpoints, name)
+        else:
+            STAGE_FUNCTIONS[name](run)
+    print("[🏁] Pipeline complete.")
+    return run
@@ -0,0 +1,172 @@
+# pipeline/streaming.py
+# Bounded-queue producer/consumer pipeline: source -> stage 1 -> ... -> stage N.
+# Each stage runs its own worker threads, so reading, encrypting and uploading overlap;
+# a full queue blocks the upstream stage (backpressure) instead of buffering everything.
+import queue
+import threading
+import time
+
+_DONE = object()
+_POLL_SECONDS = 0.1
+
+class Stage:
+    def __init__(self, name, fn, workers=1, queue_size=8):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue_size = queue_size
+        # Runtime counters
+        self.items = 0
+        self.busy_s = 0.0
+        self.blocked_s = 0.0  # time spent waiting on a full downstream queue
+        self.max_depth = 0
+        self.depth_sum = 0
+        self.depth_samples = 0
+        self._lock = threading.Lock()
+
+    def record(self, busy_s=0.0, blocked_s=0.0, items=0):
+        with self._lock:
+            self.busy_s += busy_s
+            self.blocked_s += blocked_s
+            self.items += items
+
+    def sample_depth(self, depth):
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+            self.depth_sum += depth
+            self.depth_samples += 1
+
+class StreamingPipeline:
+    def __init__(self, source, stages, source_name="read"):
+        self.source = source
+        self.source_stage = Stage(source_name, None, workers=1)
+        self.stages = stages
+        self.wall_s = 0.0
+        self._failed = threading.Event()
+        self._error = None
+        self._results = []
+        self._results_lock = threading.Lock()
+
+    # --- Queue helpers that give up once another stage has failed ---
+    def _put(self, q, item, stage):
+        start = time.perf_counter()
+        while not self._failed.is_set():
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        stage.record(blocked_s=time.perf_counter() - start)
+
+    def _get(self, q):
+        while not self._failed.is_set():
+            try:
+                return q.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, stage, error):
+        if not self._failed.is_set():
+            self._error = RuntimeError(f"Stage '{stage.name}' failed: {error}")
+            self._error.__cause__ = error
+            self._failed.set()
+
+    # --- Threads ---
+    def _run_source(self, out_queue, consumers):
+        stage = self.source_stage
+        try:
+            iterator = iter(self.source)
+            sequence = 0
+            while not self._failed.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stage.record(busy_s=time.perf_counter() - start, items=1)
+                self.stages[0].sample_depth(out_queue.qsize())
+                self._put(out_queue, (sequence, item), stage)
+                sequence += 1
+        except Exception as e:
+            self._fail(stage, e)
+        finally:
+            for _ in range(consumers):
+                self._put(out_queue, _DONE, stage)
+
+    def _run_worker(self, index, in_queue, out_queue, finished):
+        stage = self.stages[index]
+        try:
+            while True:
+                entry = self._get(in_queue)
+                if entry is _DONE:
+                    break
+                sequence, item = entry
+                start = time.perf_counter()
+                result = stage.fn(item)
+                stage.record(busy_s=time.perf_counter() - start, items=1)
+                if out_queue is None:
+                    with self._results_lock:
+                        self._results.append((sequence, result))
+                else:
+                    self.stages[index + 1].sample_depth(out_queue.qsize())
+                    self._put(out_queue, (sequence, result), stage)
+        except Exception as e:
+            self._fail(stage, e)
+        finally:
+            # The last worker of a stage to finish closes the downstream queue
+            with finished["lock"]:
+                finished["count"] += 1
+                last = finished["count"] == stage.workers
+            if last and out_queue is not None:
+                for _ in range(self.stages[index + 1].workers):
+                    self._put(out_queue, _DONE, stage)
+
+    def run(self):
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        threads = [threading.Thread(
+            target=self._run_source, args=(queues[0], self.stages[0].workers), daemon=True
+        )]
+        for index, stage in enumerate(self.stages):
+            out_queue = queues[index + 1] if index + 1 < len(self.stages) else None
+            finished = {"count": 0, "lock": threading.Lock()}
+            for _ in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._run_worker, args=(index, queues[index], out_queue, finished), daemon=True
+                ))
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.wall_s = time.perf_counter() - start
+
+        if self._error is not None:
+            raise self._error
+        # Restore source order; stages with several workers may finish out of order
+        return [result for _, result in sorted(self._results, key=lambda entry: entry[0])]
+
+    # --- Reporting ---
+    def stats(self):
+        report = {"wall_s": round(self.wall_s, 4), "stages": {}}
+        for stage in [self.source_stage] + self.stages:
+            capacity = stage.workers * self.wall_s
+            report["stages"][stage.name] = {
+                "workers": stage.workers,
+                "items": stage.items,
+                "busy_s": round(stage.busy_s, 4),
+                "blocked_s": round(stage.blocked_s, 4),
+                "utilization": round(stage.busy_s / capacity, 3) if capacity > 0 else 0.0,
+                "max_queue_depth": stage.max_depth,
+                "mean_queue_depth": round(stage.depth_sum / stage.depth_samples, 2) if stage.depth_samples else 0.0
+            }
+        return report
+
+    def print_report(self):
+        report = self.stats()
+        print(f"[i] Pipeline wall time {report['wall_s']}s")
+        for name, s in report["stages"].items():
+            print(f"   {name:<10} workers={s['workers']:<3} items={s['items']:<6} busy={s['busy_s']}s "
+                  f"util={s['utilization']:.0%} blocked={s['blocked_s']}s queue max/mean={s['max_queue_depth']}/{s['mean_queue_depth']}")
+        return report
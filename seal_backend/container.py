@@ -0,0 +1,202 @@
+# seal_backend/container.py
+# Indexed binary container for serialized ciphertext chunks ("HEC1").
+#
+#   header   64 bytes   magic, version, chunk count, meta length, index offset,
+#                       total length, sha256 of the context's public part
+#   meta     JSON       params, scheme, slot count, codec, caller metadata
+#   records  per chunk  u64 length + u32 crc32, then the raw SEAL bytes
+#   index    24 B/chunk u64 record offset, u64 length, u32 value count, u32 crc32
+#
+# Any chunk is reachable with three small reads (header, meta + index, record), so the
+# same layout works over mmap (zero-copy) and over ranged S3/Blob GETs.
+import json
+import mmap
+import struct
+import zlib
+
+MAGIC = b"HEC1"
+VERSION = 1
+HEADER = struct.Struct(">4sB3xIIQQ32s")
+RECORD = struct.Struct(">QI")
+INDEX_ENTRY = struct.Struct(">QQII")
+SUFFIX = ".hec"
+
+class ContainerError(ValueError):
+    pass
+
+# --- Writing ---
+class ContainerWriter:
+    # Streams records to a seekable file object; the index and header are written on close.
+    # add() is not thread-safe; callers that write from several threads must serialize it.
+    def __init__(self, fileobj, context_hash, params, metadata=None):
+        self.fileobj = fileobj
+        self.context_hash = bytes.fromhex(context_hash) if isinstance(context_hash, str) else context_hash
+        meta = {"params": params, "codec": "seal"}
+        meta.update(metadata or {})
+        self.meta_bytes = json.dumps(meta, sort_keys=True).encode("utf-8")
+        self.entries = {}  # position -> index entry
+        self.fileobj.write(b"\0" * HEADER.size)  # patched in close()
+        self.fileobj.write(self.meta_bytes)
+        self.offset = HEADER.size + len(self.meta_bytes)
+
+    def add(self, ciphertext, value_count, position=None):
+        position = len(self.entries) if position is None else position
+        if position in self.entries:
+            raise ContainerError(f"Chunk position {position} written twice")
+        checksum = zlib.crc32(ciphertext)
+        self.fileobj.write(RECORD.pack(len(ciphertext), checksum))
+        self.fileobj.write(ciphertext)
+        self.entries[position] = (self.offset, len(ciphertext), value_count, checksum)
+        self.offset += RECORD.size + len(ciphertext)
+        return position
+
+    def close(self):
+        if sorted(self.entries) != list(range(len(self.entries))):
+            raise ContainerError("Chunk positions must be contiguous from 0")
+        index_offset = self.offset
+        for position in range(len(self.entries)):
+            self.fileobj.write(INDEX_ENTRY.pack(*self.entries[position]))
+        total_length = index_offset + INDEX_ENTRY.size * len(self.entries)
+        self.fileobj.seek(0)
+        self.fileobj.write(HEADER.pack(
+            MAGIC, VERSION, len(self.entries), len(self.meta_bytes), index_offset, total_length, self.context_hash
+        ))
+        self.fileobj.seek(total_length)
+        self.fileobj.flush()
+        return total_length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+def write_container(path, chunks, context_hash, params, metadata=None):
+    # chunks: iterable of (ciphertext bytes, value count)
+    with open(path, "w+b") as f:
+        writer = ContainerWriter(f, context_hash, params, metadata)
+        for ciphertext, value_count in chunks:
+            writer.add(ciphertext, value_count)
+        return writer.close()
+
+# --- Reading ---
+class _Reader:
+    # Subclasses provide _read(offset, length) -> bytes-like
+    def _load_layout(self):
+        header = self._read(0, HEADER.size)
+        if len(header) < HEADER.size:
+            raise ContainerError("Truncated container header")
+        magic, version, count, meta_len, index_offset, total_length, context_hash = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ContainerError(f"Not an HE container (magic {bytes(magic)!r})")
+        if version != VERSION:
+            raise ContainerError(f"Unsupported container version {version}")
+        self.total_length = total_length
+        self.context_hash = context_hash.hex()
+        self.meta = json.loads(bytes(self._read(HEADER.size, meta_len)))
+        index = self._read(index_offset, INDEX_ENTRY.size * count)
+        self.index = [INDEX_ENTRY.unpack_from(index, i * INDEX_ENTRY.size) for i in range(count)]
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def value_counts(self):
+        return [entry[2] for entry in self.index]
+
+    def _check(self, position, record, payload):
+        length, checksum = RECORD.unpack_from(record)
+        _, expected_length, _, expected_checksum = self.index[position]
+        if length != expected_length or checksum != expected_checksum or zlib.crc32(payload) != checksum:
+            raise ContainerError(f"Checksum mismatch in chunk {position}")
+
+    def chunk(self, position, verify=True):
+        record_offset, length, _, _ = self.index[position]
+        data = self._read(record_offset, RECORD.size + length)
+        record, payload = data[:RECORD.size], data[RECORD.size:]
+        if verify:
+            self._check(position, record, payload)
+        return payload
+
+    def chunks(self, positions, verify=True):
+        # Contiguous positions are fetched as one range; yields (position, payload) in order
+        positions = sorted(positions)
+        run = []
+        for position in positions + [None]:
+            if run and (position is None or position != run[-1] + 1):
+                first_offset = self.index[run[0]][0]
+                last_offset, last_length, _, _ = self.index[run[-1]]
+                data = self._read(first_offset, last_offset + RECORD.size + last_length - first_offset)
+                for p in run:
+                    start = self.index[p][0] - first_offset
+                    record = data[start:start + RECORD.size]
+                    payload = data[start + RECORD.size:start + RECORD.size + self.index[p][1]]
+                    if verify:
+                        self._check(p, record, payload)
+                    yield p, payload
+                run = []
+            if position is not None:
+                run.append(position)
+
+class ContainerReader(_Reader):
+    # Over bytes, bytearray or mmap; chunk() returns zero-copy memoryview slices
+    def __init__(self, buffer):
+        self.buffer = memoryview(buffer)
+        self._load_layout()
+        if len(self.buffer) < self.total_length:
+            raise ContainerError("Truncated container")
+
+    def _read(self, offset, length):
+        return self.buffer[offset:offset + length]
+
+class MappedContainer(ContainerReader):
+    # Payload views point into the mapping; copy them (bytes(...)) if they outlive close()
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        super().__init__(self._mmap)
+
+    def close(self):
+        self.buffer.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class RangedContainerReader(_Reader):
+    # fetch(offset, length) -> bytes, e.g. an HTTP Range GET against S3 or Blob storage
+    def __init__(self, fetch):
+        self._fetch = fetch
+        self._load_layout()
+
+    def _read(self, offset, length):
+        if length == 0:
+            return b""
+        return self._fetch(offset, length)
+
+def s3_range_fetcher(s3, bucket, key):
+    def fetch(offset, length):
+        response = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={offset}-{offset + length - 1}")
+        return response["Body"].read()
+    return fetch
+
+def blob_range_fetcher(blob_client):
+    def fetch(offset, length):
+        return blob_client.download_blob(offset=offset, length=length).readall()
+    return fetch
+
+# --- Chunk references ---
+# "<container key>#<position>" names one chunk wherever a payload key is accepted
+def chunk_ref(container_key, position):
+    return f"{container_key}#{position}"
+
+def parse_chunk_ref(ref):
+    container_key, separator, position = ref.rpartition("#")
+    if separator and container_key.endswith(SUFFIX) and position.isdigit():
+        return container_key, int(position)
+    return None
@@ -0,0 +1,74 @@
+# context_store.py
+
+import hashlib
+import json
+import os
+
+import tenseal as ts
+
+# Cached contexts include the secret key, so this directory must stay local
+CACHE_DIR = os.environ.get("HE_CONTEXT_CACHE", os.path.join(".he_cache", "contexts"))
+
+def params_hash(params):
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def context_path(params, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"{params_hash(params)}.ctx")
+
+def build_context(params):
+    if params["scheme"] == "CKKS":
+        context = ts.context(
+            ts.SCHEME_TYPE.CKKS,
+            poly_modulus_degree=params["poly_modulus_degree"],
+            coeff_mod_bit_sizes=params["coeff_mod_bit_sizes"]
+        )
+        context.global_scale = params["global_scale"]
+    elif params["scheme"] == "BFV":
+        context = ts.context(
+            ts.SCHEME_TYPE.BFV,
+            poly_modulus_degree=params["poly_modulus_degree"],
+            plain_modulus=params["plain_modulus"]
+        )
+    else:
+        raise ValueError(f"Unsupported scheme: {params['scheme']}")
+    return context
+
+def save_context(context, params, cache_dir=CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = context_path(params, cache_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(context.serialize(save_secret_key=True))
+    os.replace(tmp_path, path)
+    return path
+
+def load_or_create_context(params, cache_dir=CACHE_DIR):
+    # Returns (context, cache_hit); keys are generated lazily via ensure_*_keys
+    path = context_path(params, cache_dir)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            context = ts.context_from(f.read())
+        if "global_scale" in params:
+            context.global_scale = params["global_scale"]
+        return context, True
+
+    context = build_context(params)
+    save_context(context, params, cache_dir)
+    return context, False
+
+def ensure_galois_keys(context, params=None, cache_dir=CACHE_DIR):
+    if context.has_galois_keys():
+        return False
+    context.generate_galois_keys()
+    if params is not None:
+        save_context(context, params, cache_dir)
+    return True
+
+def ensure_relin_keys(context, params=None, cache_dir=CACHE_DIR):
+    if context.has_relin_keys():
+        return False
+    context.generate_relin_keys()
+    if params is not None:
+        save_context(context, params, cache_dir)
+    return True
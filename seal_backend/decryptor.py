@@ -1,8 +1,28 @@
+from functools import partial
+
+import numpy as np
 import tenseal as ts
 
-def decrypt_data(context, encrypted_serialized_list):
-    decrypted = []
-    for serialized in encrypted_serialized_list:
-        enc_vec = ts.bfv_vector_from(context, serialized)
-        decrypted.append(enc_vec.decrypt()[0])
-    return decrypted
+from seal_backend import worker_pool
+
+VECTOR_LOADERS = {"bfv": ts.bfv_vector_from, "ckks": ts.ckks_vector_from}
+SCHEME_DTYPES = {"bfv": np.int64, "ckks": np.float64}
+
+def _decrypt_one(scheme, serialized, context=None):
+    if context is None:
+        context = worker_pool.worker_context()
+    vec = VECTOR_LOADERS[scheme](context, serialized)
+    return np.asarray(vec.decrypt(), dtype=SCHEME_DTYPES[scheme])
+
+def decrypt_data(context, encrypted_serialized_list, scheme="bfv", workers=1):
+    # Each serialized vector packs many values; returns every slot as one flat NumPy array
+    workers = worker_pool.resolve_workers(workers, len(encrypted_serialized_list))
+    if workers <= 1:
+        parts = [_decrypt_one(scheme, serialized, context) for serialized in encrypted_serialized_list]
+    else:
+        with worker_pool.make_pool(context, workers, save_secret_key=True) as pool:
+            parts = list(pool.map(partial(_decrypt_one, scheme), encrypted_serialized_list))
+
+    if not parts:
+        return np.empty(0, dtype=SCHEME_DTYPES[scheme])
+    return np.concatenate(parts)
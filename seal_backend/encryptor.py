@@ -1,9 +1,48 @@
 # encryptor.py
 
+from functools import partial
+
+import numpy as np
 import tenseal as ts
 
-def encrypt_data(context, data):
-    # Ensure data is a list of floats or integers
-    flat_data = [float(x) for x in data[:100]]  # Optionally limit
-    enc_vec = ts.ckks_vector(context, flat_data)
-    return enc_vec
+from seal_backend import worker_pool
+
+# CKKS packs poly_modulus_degree / 2 values per ciphertext (8192 -> 4096 slots);
+# BFV batching packs poly_modulus_degree integers (4096 -> 4096 slots)
+DEFAULT_SLOT_COUNT = 4096
+
+VECTOR_BUILDERS = {"ckks": ts.ckks_vector, "bfv": ts.bfv_vector}
+SCHEME_DTYPES = {"ckks": np.float64, "bfv": np.int64}
+
+# --- Chunked, slot-packed encryption ---
+def _encrypt_chunk(scheme, values):
+    return VECTOR_BUILDERS[scheme](worker_pool.worker_context(), values).serialize()
+
+def encrypt_block(pool, values, scheme="ckks"):
+    # One slot-sized block through an existing pool (used by the streaming pipeline)
+    values = np.asarray(values, dtype=SCHEME_DTYPES[scheme]).tolist()
+    return pool.submit(_encrypt_chunk, scheme, values).result()
+
+def split_into_chunks(data, slot_count=DEFAULT_SLOT_COUNT, scheme="ckks"):
+    values = np.asarray(data, dtype=SCHEME_DTYPES[scheme])
+    return [
+        (offset, values[offset:offset + slot_count].tolist())
+        for offset in range(0, len(values), slot_count)
+    ]
+
+def encrypt_chunked(context, data, slot_count=DEFAULT_SLOT_COUNT, workers=None, scheme="ckks"):
+    chunks = split_into_chunks(data, slot_count, scheme)
+    workers = worker_pool.resolve_workers(workers, len(chunks))
+
+    if workers <= 1:
+        build = VECTOR_BUILDERS[scheme]
+        ciphertexts = [build(context, values).serialize() for _, values in chunks]
+    else:
+        with worker_pool.make_pool(context, workers) as pool:
+            ciphertexts = list(pool.map(partial(_encrypt_chunk, scheme), [values for _, values in chunks]))
+
+    # Ordered collection: chunk i holds data[offset:offset + length]
+    return [
+        {"index": i, "offset": offset, "length": len(values), "ciphertext": ciphertext}
+        for i, ((offset, values), ciphertext) in enumerate(zip(chunks, ciphertexts))
+    ]
@@ -1,9 +1,22 @@
+from functools import partial
+
 import tenseal as ts
+from seal_backend import context_store, worker_pool
+
+VECTOR_LOADERS = {"bfv": ts.bfv_vector_from, "ckks": ts.ckks_vector_from}
+
+def _square_one(scheme, serialized, context=None):
+    if context is None:
+        context = worker_pool.worker_context()
+    vec = VECTOR_LOADERS[scheme](context, serialized)
+    squared = vec * vec
+    return squared.serialize()
 
-def square_encrypted_vector(context, encrypted_serialized_list):
-    result_serialized = []
-    for serialized in encrypted_serialized_list:
-        vec = ts.bfv_vector_from(context, serialized)
-        squared = vec * vec
-        result_serialized.append(squared.serialize())
-    return result_serialized
+def square_encrypted_vector(context, encrypted_serialized_list, scheme="bfv", workers=1):
+    # Squares every slot of each packed vector; one ciphertext in, one ciphertext out
+    context_store.ensure_relin_keys(context)
+    workers = worker_pool.resolve_workers(workers, len(encrypted_serialized_list))
+    if workers <= 1:
+        return [_square_one(scheme, serialized, context) for serialized in encrypted_serialized_list]
+    with worker_pool.make_pool(context, workers, save_relin_keys=True) as pool:
+        return list(pool.map(partial(_square_one, scheme), encrypted_serialized_list))
@@ -0,0 +1,302 @@
+# seal_backend/param_planner.py
+# Picks the smallest secure CKKS parameter set for a computation instead of one fixed set
+# for every workload. Run from the repo root:
+#   python -m seal_backend.param_planner --operations sum mean variance --length 100000
+#   python -m seal_backend.param_planner --depth 3 --precision-bits 25 --security 192 --measure
+#
+# Coefficient modulus chain for multiplicative depth d:
+#   [q0] + [scale] * d + [special]
+#   scale    precision bits + error bits of the computation: fresh-encryption noise (~ sqrt(N))
+#            grown by how the computation accumulates it (OPERATION_ERROR)
+#   q0       scale + integer bits of the largest intermediate value + 1 sign bit
+#   special  key-switching prime, at least as large as any data prime
+# The ring degree is the smallest N whose total bits fit the security level's budget.
+import argparse
+import json
+import math
+import sys
+
+# Largest total coeff_modulus bit count per ring degree (HomomorphicEncryption.org
+# standard, classical security; SEAL's CoeffModulus::MaxBitCount)
+MAX_COEFF_BITS = {
+    128: {1024: 27, 2048: 54, 4096: 109, 8192: 218, 16384: 438, 32768: 881},
+    192: {1024: 19, 2048: 37, 4096: 75, 8192: 152, 16384: 305, 32768: 611},
+    256: {1024: 14, 2048: 29, 4096: 58, 8192: 118, 16384: 237, 32768: 476}
+}
+MAX_PRIME_BITS = 60  # SEAL limit per prime
+MIN_PRIME_BITS = 20  # below this, too few NTT-friendly primes exist for the larger rings
+SERIALIZATION_OVERHEAD = 128  # SEAL/TenSEAL headers per ciphertext, roughly
+# Error of a computation ~ error_magnitude * 2**(noise_bits + RESCALE_ERROR_BITS - scale_bits).
+# Calibrated with TenSEAL at N=8192: sum, mean and variance over 20000-200000 values up to
+# 99-999 stay 0.5-6 bits under it at scales 2**32-2**40, as do x * 0.5, x**2 and x**4.
+# Relinearization noise grows with the ring, so each doubling past 8192 adds RING_ERROR_BITS
+# (measured: +1.3 for the aggregations, +3.4 for a square)
+RESCALE_ERROR_BITS = 5
+RING_ERROR_BITS = 4
+
+def noise_bits(poly_modulus_degree):
+    # Fresh encryption and each rescale add noise of roughly sqrt(N) * a small constant
+    return math.ceil(math.log2(poly_modulus_degree) / 2) + 5
+
+def error_bits(poly_modulus_degree, error_magnitude):
+    # Bits of absolute error a computation leaves at scale 2**0 (see OPERATION_ERROR)
+    ring_doublings = max(int(math.log2(poly_modulus_degree)) - 13, 0)
+    return (noise_bits(poly_modulus_degree) + RESCALE_ERROR_BITS + RING_ERROR_BITS * ring_doublings
+            + math.ceil(math.log2(max(error_magnitude, 1))))
+
+def coeff_chain(poly_modulus_degree, depth, precision_bits, integer_bits, error_magnitude=1):
+    scale_bits = max(precision_bits + error_bits(poly_modulus_degree, error_magnitude), MIN_PRIME_BITS)
+    first_bits = scale_bits + integer_bits + 1
+    chain = [first_bits] + [scale_bits] * depth
+    return chain + [max(chain)], scale_bits
+
+def _first_fit(depth, precision_bits, integer_bits, error_magnitude, security):
+    # Smallest ring degree whose chain fits; returns (degree, chain, scale_bits, rejected)
+    rejected = []
+    for poly_modulus_degree, max_bits in sorted(MAX_COEFF_BITS[security].items()):
+        chain, scale_bits = coeff_chain(poly_modulus_degree, depth, precision_bits, integer_bits, error_magnitude)
+        if max(chain) > MAX_PRIME_BITS:
+            reason = f"needs a {max(chain)}-bit prime (max {MAX_PRIME_BITS}); lower precision or magnitude"
+        elif sum(chain) > max_bits:
+            reason = f"needs {sum(chain)} modulus bits, {security}-bit security allows {max_bits}"
+        else:
+            return poly_modulus_degree, chain, scale_bits, rejected
+        rejected.append({"poly_modulus_degree": poly_modulus_degree, "reason": reason})
+    return None, None, None, rejected
+
+def estimate_ciphertext_bytes(poly_modulus_degree, coeff_mod_bit_sizes):
+    # Two polynomials over the data primes (the special prime is not part of ciphertexts);
+    # SEAL's compressed serialization stores close to each prime's bit width per coefficient
+    data_bits = sum(coeff_mod_bit_sizes[:-1])
+    return 2 * poly_modulus_degree * data_bits // 8 + SERIALIZATION_OVERHEAD
+
+def plan(depth, rotations=False, precision_bits=20, max_magnitude=2**10, length=1, security=128,
+         error_magnitude=None):
+    # Returns the smallest secure parameter set as a dict with "params" (CKKS_PARAMS shape),
+    # the sizing inputs, size estimates and the ring degrees that were rejected and why.
+    # precision_bits are fractional bits of the results (None: the most any ring allows);
+    # error_magnitude scales their error (see error_bits); by default each ciphertext
+    # product errs by about 4 * max_magnitude
+    if security not in MAX_COEFF_BITS:
+        raise ValueError(f"Unsupported security level {security}; choose from {sorted(MAX_COEFF_BITS)}")
+    # Bits to hold max_magnitude itself (2**k needs k + 1), so it passes check_magnitude()
+    integer_bits = math.floor(math.log2(max(max_magnitude, 1))) + 1
+    if error_magnitude is None:
+        error_magnitude = max_magnitude * 4 ** depth
+    if precision_bits is None:
+        precision_bits = next((bits for bits in range(MAX_PRIME_BITS, -1, -1)
+                               if _first_fit(depth, bits, integer_bits, error_magnitude, security)[0]), 0)
+    poly_modulus_degree, chain, scale_bits, rejected = _first_fit(
+        depth, precision_bits, integer_bits, error_magnitude, security)
+    if poly_modulus_degree is None:
+        reachable = next((bits for bits in range(precision_bits - 1, -1, -1)
+                          if _first_fit(depth, bits, integer_bits, error_magnitude, security)[0]), None)
+        hint = (f"at most {reachable} bit(s) are reachable" if reachable is not None
+                else "no precision is reachable at this magnitude")
+        raise ValueError(f"No {security}-bit secure CKKS parameters for depth {depth} at {precision_bits} bits of precision "
+                         f"({hint}): " + "; ".join(f"N={r['poly_modulus_degree']}: {r['reason']}" for r in rejected))
+
+    slot_count = poly_modulus_degree // 2
+    chunks = math.ceil(length / slot_count)
+    ciphertext_bytes = estimate_ciphertext_bytes(poly_modulus_degree, chain)
+    return {
+        "params": {
+            "scheme": "CKKS",
+            "poly_modulus_degree": poly_modulus_degree,
+            "coeff_mod_bit_sizes": chain,
+            "global_scale": 2 ** scale_bits
+        },
+        "security": security,
+        "depth": depth,
+        "rotations": rotations,
+        "precision_bits": precision_bits,
+        "integer_bits": integer_bits,
+        "error_bits": error_bits(poly_modulus_degree, error_magnitude),
+        "slot_count": slot_count,
+        "modulus_bits": sum(chain),
+        "max_modulus_bits": MAX_COEFF_BITS[security][poly_modulus_degree],
+        "estimates": {
+            "ciphertext_bytes": ciphertext_bytes,
+            "chunks": chunks,
+            "dataset_bytes": ciphertext_bytes * chunks
+        },
+        "rejected": rejected
+    }
+
+def magnitude_bits(params, depth):
+    # Integer bits a value may use after `depth` rescales: the data primes left at that
+    # level, less the scale and a sign bit
+    data_primes = params["coeff_mod_bit_sizes"][:-1]
+    return sum(data_primes[:len(data_primes) - depth]) - math.log2(params["global_scale"]) - 1
+
+def check_magnitude(params, operation, max_abs, count):
+    # Raises ValueError if the operation's largest intermediate cannot fit the parameters
+    from analytics import analysis_runner
+    depth = analysis_runner.OPERATION_DEPTH[operation]
+    magnitude = analysis_runner.OPERATION_MAGNITUDE[operation](max_abs, count)
+    budget = magnitude_bits(params, depth)
+    if magnitude > 0 and math.log2(magnitude) >= budget:
+        raise ValueError(f"'{operation}' over {count} value(s) up to {max_abs:g} reaches {magnitude:.3g}, "
+                         f"past the {budget:.0f} integer bits these parameters leave at depth {depth}; "
+                         f"plan parameters for this magnitude (HE_PLAN_PARAMS=1)")
+
+def operations_magnitude(operations, max_value, count):
+    # Largest value the deepest level has to hold. Shallower operations keep one extra
+    # prime (at least MIN_PRIME_BITS) per level, so their magnitudes are discounted by that
+    from analytics import analysis_runner
+    depth = max(analysis_runner.OPERATION_DEPTH[op] for op in operations)
+    return max(
+        analysis_runner.OPERATION_MAGNITUDE[op](max_value, count)
+        / 2 ** (MIN_PRIME_BITS * (depth - analysis_runner.OPERATION_DEPTH[op]))
+        for op in operations
+    )
+
+def plan_for_operations(operations, max_value=None, count=None, **kwargs):
+    # Sizes the parameters for the deepest of the named analyses (analytics/analysis_runner.py).
+    # Given the data's largest absolute value and count, max_magnitude and error_magnitude
+    # are derived from them
+    from analytics import analysis_runner
+    unknown = set(operations) - set(analysis_runner.OPERATION_DEPTH)
+    if unknown:
+        raise ValueError(f"Unknown operation(s): {sorted(unknown)}")
+    depth = max((analysis_runner.OPERATION_DEPTH[op] for op in operations), default=0)
+    rotations = any(op in analysis_runner.ROTATING_OPERATIONS for op in operations)
+    if max_value is not None and count and operations:
+        kwargs["max_magnitude"] = operations_magnitude(operations, max_value, count)
+        kwargs["error_magnitude"] = max(analysis_runner.OPERATION_ERROR[op](max_value, count) for op in operations)
+    result = plan(depth, rotations=rotations, **kwargs)
+    result.update(operations=list(operations), max_value=max_value, count=count)
+    return result
+
+def _precision(error):
+    return round(-math.log2(error), 1) if error > 0 else None
+
+def measure_errors(result, context, values):
+    # Absolute error of each planned computation against NumPy on the same values: the named
+    # aggregations, or for a depth-only plan the primitives it implies (rotate-and-sum,
+    # plaintext multiply, squaring to full depth)
+    import numpy as np
+    import tenseal as ts
+    from analytics import analysis_runner
+
+    slot_count = result["slot_count"]
+    vectors = [ts.ckks_vector(context, values[i:i + slot_count].tolist()) for i in range(0, len(values), slot_count)]
+    weights = np.linspace(-1, 1, len(values))
+    expected = {
+        "decrypt": None,
+        "sum": values.sum(),
+        "mean": values.mean(),
+        "variance": values.var(),
+        "weighted_sum": np.dot(values, weights),
+        "dot": np.dot(values, values)
+    }
+    actual = {}
+    for operation in result.get("operations") or []:
+        if operation == "decrypt":
+            continue
+        actual[operation] = analysis_runner.run_aggregation(
+            operation, vectors, count=len(values), other_vectors=vectors,
+            weights=[weights[i:i + slot_count].tolist() for i in range(0, len(values), slot_count)]
+        ).decrypt()[0]
+    if not result.get("operations"):
+        vec = vectors[0]
+        head = values[:slot_count]
+        if result["rotations"]:
+            actual["sum"] = vec.sum().decrypt()[0]
+        if result["depth"] > 0:
+            expected["mul_plain"] = head * 0.5
+            actual["mul_plain"] = (vec * 0.5).decrypt()
+            squared, expected["square"] = vec, head
+            for _ in range(result["depth"]):
+                squared, expected["square"] = squared.square(), expected["square"] ** 2
+            actual["square"] = squared.decrypt()
+
+    errors = {"decrypt": float(np.abs(np.asarray(vectors[0].decrypt()) - values[:slot_count]).max())}
+    for name, value in actual.items():
+        errors[name] = float(np.abs(np.asarray(value) - expected[name]).max())
+    return {name: {"abs_error": error, "precision_bits": _precision(error)} for name, error in errors.items()}
+
+def measure_plan(result, warmup=2, iterations=10):
+    # Builds the planned context and times the operations the workload uses; also measures
+    # the real serialized ciphertext size and, on values of the planned size, the error of
+    # each planned computation, which must meet the requested precision_bits
+    import numpy as np
+    import tenseal as ts
+    from benchmarks import harness
+    from seal_backend import context_store
+
+    params = result["params"]
+    context = context_store.build_context(params)
+    if result["depth"] > 0:
+        context_store.ensure_relin_keys(context)
+    if result["rotations"]:
+        context_store.ensure_galois_keys(context)
+
+    rng = np.random.default_rng(0)
+    if result.get("max_value") is not None and result.get("count"):
+        values = rng.uniform(0, result["max_value"], result["count"])
+    else:
+        # Depth-only plan: inputs whose largest intermediate (x ** 2**depth) is max_magnitude
+        limit = (2 ** (result["integer_bits"] - 1)) ** (1 / 2 ** result["depth"])
+        values = rng.uniform(-limit, limit, result["slot_count"])
+    vec = ts.ckks_vector(context, values[:result["slot_count"]].tolist())
+    measure = lambda fn: harness.measure_safely(fn, warmup, iterations)
+    ops = {
+        "encrypt": measure(lambda: ts.ckks_vector(context, values[:result["slot_count"]].tolist())),
+        "add": measure(lambda: vec + vec),
+        "decrypt": measure(vec.decrypt)
+    }
+    if result["depth"] > 0:
+        ops["mul"] = measure(lambda: vec * vec)
+        ops["mul_plain"] = measure(lambda: vec * 0.5)
+        ops["square"] = measure(vec.square)
+    if result["rotations"]:
+        ops["rotate_sum"] = measure(vec.sum)
+
+    errors = measure_errors(result, context, values)
+    worst = max((e["abs_error"] for e in errors.values()), default=0.0)
+    return {
+        "ops": ops,
+        "ciphertext_bytes": len(vec.serialize()),
+        "context_bytes": len(context.serialize(save_secret_key=False)),
+        "errors": errors,
+        "precision_bits": _precision(worst),
+        "meets_precision": worst <= 2.0 ** -result["precision_bits"]
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Choose the smallest secure CKKS parameters for a computation")
+    parser.add_argument("--operations", nargs="+", help="analyses to support (overrides --depth/--rotations)")
+    parser.add_argument("--depth", type=int, default=0, help="multiplicative depth")
+    parser.add_argument("--rotations", action="store_true", help="the computation rotates (e.g. sum())")
+    parser.add_argument("--precision-bits", type=int, default=20, help="fractional bits of precision needed")
+    parser.add_argument("--max-magnitude", type=float, default=2**10, help="largest absolute intermediate value")
+    parser.add_argument("--max-value", type=float, help="largest absolute input value; with --operations, "
+                        "derives --max-magnitude from it and --length")
+    parser.add_argument("--length", type=int, default=1, help="values to encrypt")
+    parser.add_argument("--security", type=int, default=128, choices=sorted(MAX_COEFF_BITS))
+    parser.add_argument("--measure", action="store_true", help="build the context and time its operations")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizing = {"precision_bits": args.precision_bits, "max_magnitude": args.max_magnitude,
+              "length": args.length, "security": args.security}
+    try:
+        if args.operations:
+            result = plan_for_operations(args.operations, max_value=args.max_value, count=args.length, **sizing)
+        else:
+            result = plan(args.depth, rotations=args.rotations, **sizing)
+    except ValueError as e:
+        print(f"[✗] {e}")
+        return 1
+    if args.measure:
+        result["measured"] = measure_plan(result)
+    print(json.dumps(result, indent=2))
+    if args.measure and not result["measured"]["meets_precision"]:
+        print(f"[✗] Measured precision {result['measured']['precision_bits']} bit(s) is below the planned {result['precision_bits']}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
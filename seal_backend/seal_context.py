@@ -1,11 +1,12 @@
-import tenseal as ts
+from seal_backend import context_store
 
-def create_context():
-    context = ts.context(
-        ts.SCHEME_TYPE.BFV,
-        poly_modulus_degree=4096,
-        plain_modulus=1032193
-    )
-    context.generate_galois_keys()
-    context.generate_relin_keys()
+BFV_PARAMS = {
+    "scheme": "BFV",
+    "poly_modulus_degree": 4096,
+    "plain_modulus": 1032193
+}
+
+def create_context(params=BFV_PARAMS):
+    # Galois and relin keys are generated on first use (context_store.ensure_*_keys)
+    context, _ = context_store.load_or_create_context(params)
     return context
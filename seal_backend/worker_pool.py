@@ -0,0 +1,32 @@
+# worker_pool.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import tenseal as ts
+
+# Each worker process deserializes the context once and reuses it for every task
+_worker_context = None
+
+def _init_worker(context_bytes):
+    global _worker_context
+    _worker_context = ts.context_from(context_bytes)
+
+def worker_context():
+    return _worker_context
+
+def resolve_workers(workers, task_count):
+    return min(workers or os.cpu_count() or 1, task_count)
+
+def make_pool(context, workers, save_secret_key=False, save_relin_keys=False, save_galois_keys=False):
+    # TenSEAL contexts are not picklable, so ship only the key material the tasks need
+    context_bytes = context.serialize(
+        save_secret_key=save_secret_key,
+        save_galois_keys=save_galois_keys,
+        save_relin_keys=save_relin_keys
+    )
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(context_bytes,)
+    )